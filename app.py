@@ -1,72 +1,31 @@
 from flask import Flask, request, jsonify
-from azure.core.credentials import AzureKeyCredential
-from azure.ai.formrecognizer import DocumentAnalysisClient
 import os
 from dotenv import load_dotenv
-from openai import OpenAI
+from extraction import DocumentContext
+from extraction.clients import get_document_analysis_client
+from extraction.document_types import BANK_CHEQUE
+from extraction.pipeline import extract_details
+from extraction.registry import get_document_type
 
 load_dotenv()
 
 app = Flask(__name__)
 
-# Get the endpoint and key from environment variables
-endpoint = os.getenv("ENDPOINT")
-key = os.getenv("KEY")
+# The Form Recognizer endpoint and key are read by extraction.clients; only the OpenAI key is needed here
 api_key = os.getenv("OPENAI_API_KEY")
 
-client = OpenAI(api_key=api_key)
-
-def analyze_read_and_return(document_url):
-    document_analysis_client = DocumentAnalysisClient(
-        endpoint=endpoint, credential=AzureKeyCredential(key)
-    )
-    
-    poller = document_analysis_client.begin_analyze_document_from_url(
-            "prebuilt-read", document_url)
-    result = poller.result()
-
-    # Extracted text
-    extracted_text = result.content
-
-    return extracted_text
-
-def get_completion(prompt, model="gpt-3.5-turbo"):
-    messages = [{"role": "user", "content": prompt}]
-    completion = client.chat.completions.create(
-        model=model,
-        messages=messages,
-        temperature=0, # this is the degree of randomness of the model's output
-    )
-    return completion.choices[0].message
-
 @app.route('/process_document', methods=['POST'])
 def process_document():
     # Get the form URL from the request
     document_url = request.json.get('document_url')
 
-    # Analyze the document and extract text
-    extracted_text = analyze_read_and_return(document_url)
-
-    # Define the completion prompt
-    details1 = f"""
-    You will be provided with the cheque details in triple quotes.
-
-    extract below details
-
-    - Bank Name
-    - Branch Name
-    - IFSC Code / IFSCCode
-    - Account Number
+    # prebuilt-read, field rules and the registered cheque prompt / model ladder, as in app1.py
+    document = DocumentContext(document_url, get_document_analysis_client())
+    bank_details = extract_details(document, get_document_type(BANK_CHEQUE), api_key)
 
-    '''{extracted_text}'''
-    """
+    print(bank_details)
 
-    # Get completion using OpenAI
-    bank_details = get_completion(details1)
-    
-    print(bank_details.content)
-    
-    return jsonify({'bank_details': bank_details.content})
+    return jsonify({'bank_details': bank_details})
 
 if __name__ == "__main__":
     app.run(debug=True)
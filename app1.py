@@ -1,39 +1,76 @@
 import os
 import json
-import urllib.parse
-import base64
-import requests
+import logging
+import math
+from contextlib import ExitStack
+from functools import partial
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from dotenv import load_dotenv
-from azure.ai.formrecognizer import DocumentAnalysisClient
-from azure.core.credentials import AzureKeyCredential
-from flask import Flask, request, jsonify
-from openai import OpenAI
+from extraction import DocumentContext, get_result_cache
+from extraction.classification import AUTO, CLASSIFICATION_MODES
+from extraction.clients import get_document_analysis_client
+from extraction.job_queue import JobWorkerPool, callback_allowed, get_job_queue
+from extraction.metrics import METRICS_CONTENT_TYPE, render_metrics
+# Classification and extraction, shared with main1.py, dispatch through extraction.registry
+from extraction.pipeline import analyze_document, analyze_document_context
+from extraction.rate_limits import FairAdmission, Overloaded, tenant_key
+from extraction.records import record_to_dict
+from extraction.streaming import DOWNLOAD_CHUNK_SIZE, MAX_DOCUMENT_BYTES, DocumentTooLarge, read_capped
+from flask import Flask, Response, request, jsonify, stream_with_context
 
 app = Flask(__name__)
 
 # Load environment variables from .env file
 load_dotenv()
 
-# Get the endpoint and key from environment variables
-endpoint = os.getenv("ENDPOINT")
-key = os.getenv("KEY")
-api_key = os.getenv("OPENAI_API_KEY")
+# Per-document JSON lines from extraction.tracing go to stderr
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"), format="%(message)s")
+
+# Worker pool shared by all batch requests, bounding the documents processed at once
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "8"))
+batch_executor = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix="batch")
+# Documents of one batch on that pool at once, so a batch of thousands shares it with the others
+BATCH_WINDOW = int(os.getenv("BATCH_WINDOW", "4"))
+# Limits on one multipart batch; uploads stay spooled by Werkzeug and are only read once submitted
+MAX_BATCH_FILES = int(os.getenv("MAX_BATCH_FILES", "100"))
+MAX_BATCH_BYTES = int(os.getenv("MAX_BATCH_BYTES", str(100 * 1024 * 1024)))
+# Durable queue behind /jobs, worked by JOB_WORKERS threads (none unless set) started at the bottom of this module
+job_queue = get_job_queue()
+# Bounds the documents the HTTP endpoints analyse at once (MAX_IN_FLIGHT), queueing the rest fairly per tenant
+admission = FairAdmission()
+
+
+def request_tenant():
+    # X-Tenant-ID when the gateway sets one, else the caller's API key
+    return tenant_key(request.headers.get('X-Tenant-ID'), request.headers.get('X-API-Key'))
+
+
+@app.errorhandler(Overloaded)
+def overloaded_response(exc):
+    # Fast 503 rather than a request that queues until it times out
+    response = jsonify({'error': str(exc)})
+    response.headers['Retry-After'] = str(math.ceil(exc.retry_after))
+    return response, 503
 
-# Initialize Document Analysis Client
-document_analysis_client = DocumentAnalysisClient(
-    endpoint=endpoint, credential=AzureKeyCredential(key)
-)
 
 @app.route('/document_details', methods=['POST'])
 def analyze_document_api():
     # Get document URL from request data
     data = request.get_json()
     document_url = data.get('document_url')
+    # "cheque" when the caller knows it is sending a cheque: prebuilt-read is the only Azure call
+    mode = data.get('mode', AUTO)
 
     if not document_url:
         return jsonify({'error': 'Document URL is required'}), 400
-
-    document_type, document_details = analyze_document(document_url)
+    if mode not in CLASSIFICATION_MODES:
+        return jsonify({'error': f'mode must be one of {", ".join(CLASSIFICATION_MODES)}'}), 400
+
+    try:
+        with admission.admit(request_tenant()):
+            document_type, document_details = analyze_document(document_url, mode)
+    except DocumentTooLarge as exc:
+        return jsonify({'error': str(exc)}), 413
     # document_details = document_details.replace('\n', ',')
     
     return jsonify({'document_type': document_type, 'document_details': document_details})
@@ -41,231 +78,158 @@ def analyze_document_api():
     # return f"""DOCUMENT TYPE: {document_type}\n\n{document_details}"""
 
 
-def analyze_document(document_url):
-    # Decode the URL to handle special characters
-    document_url_decoded = urllib.parse.unquote(document_url)
-    
-    # Initialize variables
-    new_ration_card_number = None
-    old_ration_card_number = None
-    ration_card_detected = False
-    bank_cheque_detected = False
-    document_type = None
-
-    # Analyze document for Ration Card and Bank Cheque
-    poller_ration = document_analysis_client.begin_analyze_document_from_url("prebuilt-document", document_url_decoded)
-    result_ration = poller_ration.result()
-
-    for kv_pair in result_ration.key_value_pairs:
-        if kv_pair.key and kv_pair.value:
-            if "New Ration Card No" in kv_pair.key.content:
-                new_ration_card_number = kv_pair.value.content
-                ration_card_detected = True
-            elif "Old RationCard No" in kv_pair.key.content or "Old RCNo" in kv_pair.key.content:
-                old_ration_card_number = kv_pair.value.content
-                ration_card_detected = True
-            elif any(term in kv_pair.key.content for term in ["A/C No","A/c No.", "A/C. No.", "A/c. No.", "Pay","PAY","BEARER", "Bearer", "account No", "IFSCCode", "IFSC Code", "IFS Code"]):
-                document_type = "Bank Cheque"
-                bank_cheque_detected = True
+def upload_size(upload):
+    # Werkzeug spools uploads to memory or a temporary file; either can be measured without reading
+    upload.stream.seek(0, os.SEEK_END)
+    size = upload.stream.tell()
+    upload.stream.seek(0)
+    return size
+
+
+def upload_document(upload):
+    content = read_capped(iter(lambda: upload.stream.read(DOWNLOAD_CHUNK_SIZE), b''))
+    return DocumentContext(None, get_document_analysis_client(), content=content)
+
+
+def url_document(document_url):
+    return DocumentContext(document_url, get_document_analysis_client())
+
+
+def analyze_batch_document(load_document, mode):
+    # Runs on the batch pool, so an upload is only read into memory once its document is submitted
+    return analyze_document_context(load_document(), mode)
+
+
+@app.route('/document_details/batch', methods=['POST'])
+def analyze_document_batch_api():
+    # Either {"document_urls": [...]} or a multipart upload with one or more "files"
+    if request.content_length is not None and request.content_length > MAX_BATCH_BYTES:
+        return jsonify({'error': f'batch is {request.content_length} bytes, limit is {MAX_BATCH_BYTES}'}), 413
+    documents = []
+    mode = AUTO
+    if request.files:
+        mode = request.form.get('mode', AUTO)
+        uploads = request.files.getlist('files')
+        if len(uploads) > MAX_BATCH_FILES:
+            return jsonify({'error': f'batch has {len(uploads)} files, limit is {MAX_BATCH_FILES}'}), 413
+        total = 0
+        for upload in uploads:
+            size = upload_size(upload)
+            if size > MAX_DOCUMENT_BYTES:
+                return jsonify({'error': f'{upload.filename}: document exceeds {MAX_DOCUMENT_BYTES} bytes'}), 413
+            total += size
+            documents.append(({'filename': upload.filename}, partial(upload_document, upload)))
+        if total > MAX_BATCH_BYTES:
+            return jsonify({'error': f'batch exceeds {MAX_BATCH_BYTES} bytes'}), 413
+    else:
+        data = request.get_json(silent=True) or {}
+        mode = data.get('mode', AUTO)
+        for document_url in data.get('document_urls') or []:
+            documents.append(({'document_url': document_url}, partial(url_document, document_url)))
+
+    if not documents:
+        return jsonify({'error': 'document_urls or files are required'}), 400
+    if mode not in CLASSIFICATION_MODES:
+        return jsonify({'error': f'mode must be one of {", ".join(CLASSIFICATION_MODES)}'}), 400
+
+    # A batch holds one slot until its last line is sent; BATCH_WINDOW bounds the documents inside it
+    admission_slot = ExitStack()
+    admission_slot.enter_context(admission.admit(request_tenant()))
+    pending = iter(enumerate(documents))
+    in_flight = {}
+
+    def generate():
+        # One NDJSON line per document, in completion order; the next document is only
+        # submitted once one of this batch's finishes
+        while True:
+            for index, (source, load_document) in pending:
+                in_flight[batch_executor.submit(analyze_batch_document, load_document, mode)] = (index, source)
+                if len(in_flight) >= BATCH_WINDOW:
+                    break
+            if not in_flight:
                 break
+            done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+            for future in done:
+                index, source = in_flight.pop(future)
+                line = {'index': index, **source}
+                try:
+                    line['document_type'], line['document_details'] = future.result()
+                except Exception as exc:
+                    line['error'] = str(exc)
+                yield json.dumps(line, default=record_to_dict) + '\n'
+
+    def close_batch():
+        # Also runs when the client disconnects: queued documents are dropped rather than billed
+        for future in list(in_flight):
+            future.cancel()
+        admission_slot.close()
+
+    response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    response.call_on_close(close_batch)
+    return response
+
+
+@app.route('/jobs', methods=['POST'])
+def submit_job_api():
+    # Queue the document and answer straight away; poll /jobs/<job_id> or pass a callback_url
+    data = request.get_json(silent=True) or {}
+    document_url = data.get('document_url')
 
-    if ration_card_detected:
-        print("Given document is a Ration Card")
-        document_details = extract_rationcard_details(document_url)
-        return "Ration Card", document_details
-
-    if not bank_cheque_detected:
-        # Analyze document for Aadhar or PAN card
-        poller_id = document_analysis_client.begin_analyze_document_from_url("prebuilt-idDocument", document_url_decoded)
-        id_documents = poller_id.result()
-
-        for idx, id_document in enumerate(id_documents.documents):
-            document_number = id_document.fields.get("DocumentNumber")
-            if document_number:
-                doc_number = document_number.value.replace(" ", "")  # Remove spaces for processing
-                if len(doc_number) == 12 and doc_number.isdigit():
-                    document_type = "Aadhar card"
-                    break
-                elif len(doc_number) == 10 and doc_number[:5].isalpha() and doc_number[5:9].isdigit() and doc_number[-1].isalpha():
-                    document_type = "PAN card"
-                    break
+    if not document_url:
+        return jsonify({'error': 'Document URL is required'}), 400
+
+    callback_url = data.get('callback_url')
+    if callback_url and not callback_allowed(callback_url):
+        return jsonify({'error': 'callback_url must use an allowed scheme and host, see JOB_CALLBACK_HOSTS'}), 400
+
+    job_id = job_queue.submit(document_url, callback_url)
+    return jsonify({'job_id': job_id, 'status': 'queued', 'status_url': f'/jobs/{job_id}'}), 202
 
-    document_details = None
-    if document_type == "Aadhar card":
-        print("Given document is an Aadhar card")
-        document_details = extract_aadhar_pan_details(document_url)
-    elif document_type == "PAN card":
-        print("Given document is a PAN card")
-        document_details = extract_aadhar_pan_details(document_url)
-    elif ration_card_detected:
-        print("Given document is a Ration Card")
-        document_details = extract_rationcard_details(document_url)
-    elif bank_cheque_detected:
-        print("Given document is a Bank Cheque")
-        document_details = extract_bank_cheque_details(document_url)
-        
-    else:
-        print("Document type is unknown")
-        document_type = identify_document_type(document_url_decoded)
-        if document_type == "Aadhar card":
-            print("Given document is an Aadhar card")
-            document_details = extract_aadhar_pan_details(document_url)
-        else:
-            document_details = {
-                "Name": "",
-                "Aadhar Number": "",
-                "Pan Number": "",
-                "Fathers Name": "",
-                "DateOfBirth": "",
-                "Ration_card_details": "",
-                "Bank_Cheque_details": ""
-            }
-            # print("Document type is unknown")
-            # print("Name: ", document_details["Name"])
-            # print("Aadhar Number: ", document_details["Aadhar Number"])
-            # print("Pan Number: ", document_details["Pan Number"])
-            # print("Fathers Name: ", document_details["Fathers Name"])
-            # print("DateOfBirth: ", document_details["DateOfBirth"])
-            # print("Ration_card_details:", document_details["Ration_card_details"])
-
-    return document_type, document_details
-
-def identify_document_type(document_url):
-    poller = document_analysis_client.begin_analyze_document_from_url("prebuilt-document", document_url)
-    result = poller.result()
-
-    for kv_pair in result.key_value_pairs:
-        if kv_pair.key and kv_pair.value and kv_pair.key.content == "Your Aadhaar No. :":
-            return "Aadhar card"
-    return "Unknown"
-
-def encode_image_from_url(image_url):
-    image_data = requests.get(image_url).content
-    return base64.b64encode(image_data).decode('utf-8')
-
-def extract_aadhar_pan_details(document_url):
- # Get the base64 string from the document URL
-    base64_image = encode_image_from_url(document_url)
-
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {api_key}"
-    }
-
-    payload = {
-        "model": "gpt-4o",
-        "messages": [
-            {
-                "role": "user",
-                "content": [
-                    {
-                        "type": "text",
-                        "text": "Please extract only Name, Aadhar number, Pan Number, DateofBirth, Fathers Name and address in key-value pairs from the image. Do not keep,Sure, here are the extracted details in key-value pairs in the beginig."
-                    },
-                    {
-                        "type": "image_url",
-                        "image_url": {
-                            "url": f"data:image/jpeg;base64,{base64_image}"
-                        }
-                    }
-                ]
-            }
-        ],
-        "max_tokens": 500
-    }
-
-    response = requests.post("https://api.openai.com/v1/chat/completions", headers=headers, json=payload)
-    response_data = json.loads(response.content)
-
-    # Extract relevant details
-    message_content = response_data['choices'][0]['message']['content']
-    # message_content = message_content.replace("\n-", "\n\t")
-    return message_content
-
-
-def extract_rationcard_details(document_url):
-    # Get the base64 string from the document URL
-    base64_image = encode_image_from_url(document_url)
-
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {api_key}"
-    }
-
-    payload = {
-        "model": "gpt-4o",
-        "messages": [
-            {
-                "role": "user",
-                "content": [
-                    {
-                        "type": "text",
-                        "text": "Extract data from the image in key value pairs for New Ration Card No,FSC Reference No,Consumer No, Card Type, FPSHOP No., Ratio Card members details. Do not keep, Here are the extracted data from the image in key-value pairs, in the begining"
-                    },
-                    {
-                        "type": "image_url",
-                        "image_url": {
-                            "url": f"data:image/jpeg;base64,{base64_image}"
-                        }
-                    }
-                ]
-            }
-        ],
-        "max_tokens": 300
-    }
-
-    response = requests.post("https://api.openai.com/v1/chat/completions", headers=headers, json=payload)
-    # print(response.content)
-    response_data = json.loads(response.content)
-
-    # Extract relevant details
-    message_content = response_data['choices'][0]['message']['content']
-    
-    # Print relevant details
-    
-    # message_content = message_content.replace('\n', '')
 
-    print(message_content)
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status_api(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job id'}), 404
+    return jsonify(job)
 
-    return message_content
 
+@app.route('/jobs/stats', methods=['GET'])
+def job_stats_api():
+    # Queue depth per status, the signal to scale worker.py processes on
+    return jsonify(job_queue.stats())
 
-def extract_bank_cheque_details(document_url):
-    # Analyze document to extract text
-    poller = document_analysis_client.begin_analyze_document_from_url("prebuilt-read", document_url)
-    result = poller.result()
 
-    # Extracted text
-    extracted_text = result.content
+@app.route('/metrics', methods=['GET'])
+def metrics_api():
+    # Stage timings, Azure calls and LLM tokens per document type, for Prometheus to scrape;
+    # under gunicorn these add up every worker, see METRICS_DIR
+    return Response(render_metrics(), content_type=METRICS_CONTENT_TYPE)
 
-    def get_completion(prompt, model="gpt-4o"):
-        messages = [{"role": "user", "content": prompt}]
-        response = requests.post(
-            "https://api.openai.com/v1/chat/completions",
-            headers={"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"},
-            json={"model": model, "messages": messages}
-        )
-        response_data = response.json()
 
-        return response_data['choices'][0]['message']['content']
+@app.route('/cache_stats', methods=['GET'])
+def cache_stats_api():
+    # Hit/miss counters of the Form Recognizer / LLM result cache since this worker started;
+    # extraction_result_cache_lookups_total on /metrics covers every worker
+    return jsonify({**get_result_cache().stats(), 'worker': os.getpid()})
 
-    details_prompt = f"""
-    You will be provided with the cheque details in triple quotes.
 
-    Extract the following details:
-    - Bank Name
-    - Branch Name
-    - IFSC Code / IFSCCode
-    - Account Number
+@app.route('/admission_stats', methods=['GET'])
+def admission_stats_api():
+    # Requests running and queued per tenant in the worker that answers; admission is per worker
+    return jsonify({**admission.stats(), 'worker': os.getpid()})
 
-    Dot not add, Based on the provided cheque details, here's the extracted information in the begining of the response also remove "\n" in between.
 
-    '''{extracted_text}'''
-    """
+def run_job(document_url):
+    document_type, document_details = analyze_document(document_url)
+    return {'document_type': document_type, 'document_details': document_details}
+
 
-    bank_details = get_completion(details_prompt)
-    print(bank_details)
-    return bank_details
+# Web processes leave the queue to worker.py unless JOB_WORKERS is set. wsgi.py defers the
+# start to each forked worker, so no threads are running in the preloading master
+job_workers = JobWorkerPool(job_queue, run_job)
+if os.getenv("DEFER_JOB_WORKERS") != "1":
+    job_workers.start()
 
 if __name__ == "__main__":
 
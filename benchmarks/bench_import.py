@@ -0,0 +1,68 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# (name, python code) run in a fresh interpreter each time
+TARGETS = [
+    ("interpreter", "pass"),
+    ("import extraction", "import extraction"),
+    ("import extraction.pipeline", "import extraction.pipeline"),
+    ("CLI --help", "import sys; sys.argv = ['extraction', '--help']\n"
+                   "try:\n    import runpy; runpy.run_module('extraction', run_name='__main__')\n"
+                   "except SystemExit:\n    pass"),
+    ("pipeline + Azure client", "import extraction.pipeline\n"
+                                "from extraction.clients import get_document_analysis_client\n"
+                                "get_document_analysis_client()"),
+    ("import app1", "import app1"),
+]
+
+# Clients need settings to be constructed, never to be reached
+DUMMY_ENV = {
+    "ENDPOINT": "https://example.cognitiveservices.azure.com",
+    "KEY": "import-benchmark",
+    "OPENAI_API_KEY": "import-benchmark",
+    "JOB_WORKERS": "0",
+}
+
+
+def cold_start(code, env):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", code], env=env, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def heaviest_imports(code, env, count):
+    # -X importtime reports cumulative microseconds per module on stderr
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line[len("import time:"):].split("|")
+        rows.append((int(cumulative), module.rstrip()))
+    return sorted(rows, reverse=True)[:count]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cold-start wall time of the package, CLI and apps")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=0, help="also list the N heaviest imports of each target")
+    args = parser.parse_args()
+
+    env = {**os.environ, **DUMMY_ENV}
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [os.getcwd(), env.get("PYTHONPATH")]))
+
+    baseline = None
+    print(f"{'target':32} {'median':>9} {'min':>9} {'over bare python':>17}")
+    for name, code in TARGETS:
+        samples = [cold_start(code, env) for _ in range(args.repeat)]
+        median = statistics.median(samples)
+        baseline = median if baseline is None else baseline
+        print(f"{name:32} {median * 1000:7.0f}ms {min(samples) * 1000:7.0f}ms {(median - baseline) * 1000:15.0f}ms")
+        for cumulative, module in heaviest_imports(code, env, args.top):
+            print(f"    {cumulative / 1000:8.1f}ms {module}")
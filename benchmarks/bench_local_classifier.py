@@ -0,0 +1,55 @@
+import argparse
+import time
+
+from benchmarks.fixtures import DEFAULT_CORPUS, load_corpus, make_synthetic_corpus
+from extraction.document_types import AADHAR_CARD, PAN_CARD
+from extraction.local_classifier import LOCAL_CONFIDENCE_THRESHOLD, pre_classify
+
+# Remote calls identify_document_type makes for a type when it has no local guess
+REMOTE_CLASSIFICATION_CALLS = {AADHAR_CARD: 2, PAN_CARD: 2}
+
+
+def run(corpus_dir, threshold):
+    documents = load_corpus(corpus_dir)
+    if not documents:
+        raise SystemExit(f"No fixtures found under {corpus_dir}; run with --synthetic to generate some")
+
+    correct = confident = confident_correct = saved_calls = 0
+    elapsed = 0.0
+    for label, path in documents:
+        with open(path, "rb") as document_file:
+            content = document_file.read()
+        start = time.perf_counter()
+        guess, confidence = pre_classify(content)
+        elapsed += time.perf_counter() - start
+
+        correct += guess == label
+        if guess is not None and confidence >= threshold:
+            confident += 1
+            if guess == label:
+                confident_correct += 1
+                saved_calls += REMOTE_CLASSIFICATION_CALLS.get(label, 1)
+
+    total = len(documents)
+    print(f"documents:             {total}")
+    print(f"top-1 accuracy:        {correct / total:.1%}")
+    print(f"confident (>= {threshold:.2f}):  {confident} ({confident / total:.1%})")
+    if confident:
+        print(f"confident accuracy:    {confident_correct / confident:.1%}")
+    print(f"saved remote calls:    {saved_calls}")
+    print(f"mean classifier time:  {elapsed / total * 1000:.1f} ms")
+    # A threshold nothing reaches only adds the cost of decoding every image
+    if not saved_calls:
+        raise SystemExit(f"No document reached the {threshold:.2f} threshold; the local classifier saves nothing")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Accuracy and saved Azure calls of the offline pre-classifier")
+    parser.add_argument("corpus", nargs="?", default=DEFAULT_CORPUS)
+    parser.add_argument("--threshold", type=float, default=LOCAL_CONFIDENCE_THRESHOLD)
+    parser.add_argument("--synthetic", action="store_true", help="generate the synthetic corpus first")
+    args = parser.parse_args()
+    if args.synthetic:
+        # Images need tesseract to be confident; the born-digital PDFs show the text layer path
+        make_synthetic_corpus(args.corpus, text_pdfs=3)
+    run(args.corpus, args.threshold)
@@ -0,0 +1,204 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import resource
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.fixtures import CORPUS_LABELS, DEFAULT_CORPUS, load_corpus, make_synthetic_corpus
+from benchmarks.standins import StandinConfig, StandinServer
+
+MODES = ("function", "flask", "async")
+
+
+def point_at_standins(server, workdir):
+    # Must run before anything from extraction or app1 is imported: endpoints are read at import
+    os.environ.update({
+        "ENDPOINT": server.url,
+        "KEY": "offline-benchmark",
+        "OPENAI_API_KEY": "offline-benchmark",
+        "OPENAI_BASE_URL": f"{server.url}/v1",
+        # A fresh cache per run, so every document really reaches the stand-ins
+        "RESULT_CACHE_PATH": os.path.join(workdir, "results.sqlite3"),
+        "JOB_QUEUE_PATH": os.path.join(workdir, "jobs.sqlite3"),
+        "RATE_LIMIT_PATH": os.path.join(workdir, "rate_limits.sqlite3"),
+        "JOB_WORKERS": "0",
+        "LOG_LEVEL": "WARNING",
+    })
+
+
+def register_corpus(server, documents):
+    from extraction.image_preprocess import preprocess_image
+
+    urls = []
+    for index, (label, path) in enumerate(documents):
+        with open(path, "rb") as document_file:
+            content = document_file.read()
+        # The stand-in recognises a document by the exact bytes uploaded to Azure
+        url = server.register_document(f"{index}-{os.path.basename(path)}", content, label,
+                                       uploaded=preprocess_image(content, "azure"))
+        urls.append((label, url))
+    return urls
+
+
+def run_threaded(analyze, urls, concurrency):
+    results = []
+    lock = threading.Lock()
+
+    def timed(label, url):
+        start = time.perf_counter()
+        try:
+            document_type, error = analyze(url), None
+        except Exception as exc:
+            document_type, error = None, exc
+        with lock:
+            results.append((label, document_type, time.perf_counter() - start, error))
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for label, url in urls:
+            executor.submit(timed, label, url)
+    return results
+
+
+def run_function(urls, concurrency, classification):
+    import app1
+    return run_threaded(lambda url: app1.analyze_document(url, classification)[0], urls, concurrency)
+
+
+def run_flask(urls, concurrency, classification):
+    import app1
+
+    def analyze(url):
+        response = app1.app.test_client().post('/document_details',
+                                               json={'document_url': url, 'mode': classification})
+        if response.status_code != 200:
+            raise RuntimeError(f"HTTP {response.status_code}: {response.get_data(as_text=True)[:200]}")
+        return response.get_json()['document_type']
+
+    return run_threaded(analyze, urls, concurrency)
+
+
+def run_async(urls, concurrency, classification):
+    from extraction.async_engine import AsyncExtractionEngine
+
+    async def main():
+        results = []
+        async with AsyncExtractionEngine(azure_concurrency=concurrency, openai_concurrency=concurrency,
+                                         download_concurrency=concurrency) as engine:
+            async def timed(label, url):
+                start = time.perf_counter()
+                try:
+                    document_type, error = (await engine.analyze_document(url, classification))[0], None
+                except Exception as exc:
+                    document_type, error = None, exc
+                results.append((label, document_type, time.perf_counter() - start, error))
+
+            await asyncio.gather(*(timed(label, url) for label, url in urls))
+        return results
+
+    return asyncio.run(main())
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def report(mode, results, counts, elapsed):
+    total = len(results)
+    latencies = [seconds for _, _, seconds, _ in results]
+    errors = [error for _, _, _, error in results if error is not None]
+    correct = sum(label == document_type for label, document_type, _, _ in results)
+    # ru_maxrss is in KiB on Linux
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    print(f"mode:                  {mode}")
+    print(f"documents:             {total} ({len(errors)} failed)")
+    print(f"throughput:            {total / elapsed:.2f} documents/s")
+    print(f"latency p50/p95/p99:   {percentile(latencies, 0.5):.3f} / {percentile(latencies, 0.95):.3f}"
+          f" / {percentile(latencies, 0.99):.3f} s")
+    print(f"classified correctly:  {correct / total:.1%}")
+    print(f"peak RSS:              {peak_rss:.0f} MiB")
+    print("backend calls per document:")
+    for name in sorted(counts):
+        if not name.startswith("azure_for:"):
+            print(f"  {name:32} {counts[name] / total:.2f}")
+    print("Azure analyze calls per document and p50 latency, by type:")
+    for label in sorted({label for label, _, _, _ in results}):
+        latencies = [seconds for result_label, _, seconds, _ in results if result_label == label]
+        print(f"  {label:32} {counts.get(f'azure_for:{label}', 0) / len(latencies):.2f}"
+              f" {percentile(latencies, 0.5):8.3f} s")
+    for error in errors[:5]:
+        print(f"error: {error!r}")
+
+
+def azure_calls_per_document(counts, total):
+    return sum(count for name, count in counts.items()
+               if name.startswith("azure:")) / max(1, total)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Throughput, latency and backend calls of the full pipeline against local stand-ins"
+    )
+    parser.add_argument("corpus", nargs="?", default=DEFAULT_CORPUS)
+    parser.add_argument("--mode", choices=MODES, default="function",
+                        help="app1.analyze_document, the Flask endpoint or the async engine")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--classification", choices=("auto", "cheque", "full"), default="auto",
+                        help="classification mode passed to the pipeline; full is the two-model path")
+    parser.add_argument("--only", help="benchmark only the documents of this corpus folder, e.g. cheque")
+    parser.add_argument("--synthetic", action="store_true", help="generate the synthetic corpus first")
+    parser.add_argument("--recordings", help="directory of recorded analyzeResult JSON, '<type>.<model>.json'")
+    parser.add_argument("--azure-latency", type=float, default=1.0, help="seconds until an analysis succeeds")
+    parser.add_argument("--azure-submit-latency", type=float, default=0.05)
+    parser.add_argument("--poll-interval", type=float, default=0.25, help="Retry-After sent while running, 0 for none")
+    parser.add_argument("--openai-latency", type=float, default=1.5)
+    parser.add_argument("--azure-error-rate", type=float, default=0.0, help="share of analyze calls answered 503")
+    parser.add_argument("--openai-error-rate", type=float, default=0.0, help="share of completions answered 429")
+    parser.add_argument("--azure-quota", type=int, default=0,
+                        help="analyze calls per second the stand-in accepts before answering 429, 0 for no limit")
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument("--max-azure-calls", type=float,
+                        help="exit non-zero when Azure analyze calls per document exceed this")
+    parser.add_argument("--verbose", action="store_true", help="keep the pipeline's own output")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        make_synthetic_corpus(args.corpus)
+    documents = load_corpus(args.corpus)
+    if args.only:
+        documents = [(label, path) for label, path in documents if label == CORPUS_LABELS.get(args.only, args.only)]
+    if not documents:
+        raise SystemExit(f"No fixtures found under {args.corpus}; run with --synthetic to generate some")
+
+    config = StandinConfig(
+        azure_submit_latency=args.azure_submit_latency, azure_latency=args.azure_latency,
+        poll_interval=args.poll_interval, openai_latency=args.openai_latency,
+        azure_error_rate=args.azure_error_rate, openai_error_rate=args.openai_error_rate, jitter=args.jitter,
+        azure_quota=args.azure_quota,
+    )
+    server = StandinServer(config, args.recordings).start()
+    with tempfile.TemporaryDirectory() as workdir:
+        point_at_standins(server, workdir)
+        urls = register_corpus(server, documents)
+        runner = {"function": run_function, "flask": run_flask, "async": run_async}[args.mode]
+
+        # app1 prints a line per document; keep the report readable
+        output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+        with output:
+            start = time.perf_counter()
+            results = runner(urls, args.concurrency, args.classification)
+            elapsed = time.perf_counter() - start
+    server.stop()
+
+    report(args.mode, results, dict(server.counts), elapsed)
+    azure_calls = azure_calls_per_document(server.counts, len(results))
+    if args.max_azure_calls is not None and azure_calls > args.max_azure_calls:
+        raise SystemExit(f"{azure_calls:.2f} Azure analyze calls per document, budget is {args.max_azure_calls}")
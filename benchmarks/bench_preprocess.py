@@ -0,0 +1,69 @@
+import argparse
+import difflib
+import io
+import time
+
+from PIL import Image
+
+from benchmarks.fixtures import DEFAULT_CORPUS, load_corpus, make_synthetic_corpus
+from extraction.field_rules import extract_cheque_fields, extract_id_numbers
+from extraction.image_preprocess import TARGETS, preprocess_image
+from extraction.local_classifier import pre_classify
+
+try:
+    import pytesseract
+except ImportError:  # OCR agreement is only reported when tesseract is available
+    pytesseract = None
+
+
+def ocr(content):
+    return pytesseract.image_to_string(Image.open(io.BytesIO(content)))
+
+
+def run(corpus_dir):
+    documents = load_corpus(corpus_dir)
+    if not documents:
+        raise SystemExit(f"No fixtures found under {corpus_dir}; run with --synthetic to generate some")
+
+    for target in TARGETS:
+        original_bytes = processed_bytes = 0
+        elapsed = 0.0
+        same_guess = same_fields = 0
+        similarity = []
+        for label, path in documents:
+            with open(path, "rb") as document_file:
+                content = document_file.read()
+            start = time.perf_counter()
+            processed = preprocess_image(content, target)
+            elapsed += time.perf_counter() - start
+            original_bytes += len(content)
+            processed_bytes += len(processed)
+
+            same_guess += pre_classify(content)[0] == pre_classify(processed)[0]
+            if pytesseract is not None and not content.startswith(b"%PDF"):
+                before, after = ocr(content), ocr(processed)
+                similarity.append(difflib.SequenceMatcher(None, before, after).ratio())
+                same_fields += ({**extract_cheque_fields(before), **extract_id_numbers(before)} ==
+                                {**extract_cheque_fields(after), **extract_id_numbers(after)})
+
+        total = len(documents)
+        print(f"[{target}]")
+        print(f"  bytes:                {original_bytes} -> {processed_bytes} "
+              f"({1 - processed_bytes / original_bytes:.1%} saved)")
+        print(f"  mean preprocess time: {elapsed / total * 1000:.1f} ms")
+        print(f"  same local class:     {same_guess / total:.1%}")
+        if pytesseract is not None:
+            print(f"  OCR text similarity:  {sum(similarity) / total:.1%}")
+            print(f"  same rule fields:     {same_fields / total:.1%}")
+        else:
+            print("  OCR agreement:        n/a (install pytesseract and tesseract)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bytes saved and accuracy retained by image preprocessing")
+    parser.add_argument("corpus", nargs="?", default=DEFAULT_CORPUS)
+    parser.add_argument("--synthetic", action="store_true", help="generate the synthetic corpus first")
+    args = parser.parse_args()
+    if args.synthetic:
+        make_synthetic_corpus(args.corpus)
+    run(args.corpus)
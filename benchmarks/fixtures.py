@@ -0,0 +1,155 @@
+import os
+import random
+
+from PIL import Image, ImageDraw
+
+from extraction.field_rules import verhoeff_valid
+
+# Folder name under the corpus root -> document type label
+CORPUS_LABELS = {
+    "cheque": "Bank Cheque",
+    "aadhaar": "Aadhar card",
+    "pan": "PAN card",
+    "ration_card": "Ration Card",
+}
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def load_corpus(corpus_dir=DEFAULT_CORPUS):
+    """Return ``(label, path)`` for every file in ``<corpus_dir>/<label folder>/``."""
+    documents = []
+    for folder, label in CORPUS_LABELS.items():
+        folder_path = os.path.join(corpus_dir, folder)
+        if not os.path.isdir(folder_path):
+            continue
+        for name in sorted(os.listdir(folder_path)):
+            if not name.startswith("."):
+                documents.append((label, os.path.join(folder_path, name)))
+    return documents
+
+
+def _lines(draw, lines, x, y, step):
+    for line in lines:
+        draw.text((x, y), line, fill=(20, 20, 20))
+        y += step
+
+
+def cheque_lines(rng):
+    ifsc = "SBIN0" + "".join(rng.choice("0123456789") for _ in range(6))
+    return ["STATE BANK OF INDIA", "MG ROAD BRANCH", f"IFSC {ifsc}", "Pay ______________________ or Bearer",
+            "Rupees ____________________", f"A/c No. {rng.randrange(10**10, 10**11)}", "Please sign above"]
+
+
+def synthetic_cheque(rng):
+    image = Image.new("RGB", (1320, 600), (226, 236, 246))
+    draw = ImageDraw.Draw(image)
+    _lines(draw, cheque_lines(rng), 40, 40, 55)
+    # White MICR clear band with one row of glyphs
+    draw.rectangle((0, 520, 1320, 600), fill=(255, 255, 255))
+    draw.text((300, 550), f"|{rng.randrange(10**5, 10**6)}| {rng.randrange(10**8, 10**9)}| 000010| 31",
+              fill=(0, 0, 0))
+    return image
+
+
+def aadhaar_lines(rng):
+    # A made-up number that still passes the Verhoeff check, like a real one would
+    digits = str(rng.randrange(2 * 10**10, 10**11))
+    digits += next(check for check in "0123456789" if verhoeff_valid(digits + check))
+    number = " ".join(digits[start:start + 4] for start in range(0, 12, 4))
+    return ["Government of India", "Name: Test Person", "DOB: 01/01/1990", number,
+            "Aadhaar - Aam Aadmi ka Adhikar"]
+
+
+def synthetic_aadhaar(rng):
+    image = Image.new("RGB", (1010, 640), (250, 250, 250))
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((0, 0, 1010, 60), fill=(240, 140, 40))
+    _lines(draw, aadhaar_lines(rng), 60, 100, 70)
+    return image
+
+
+def pan_lines(rng):
+    letters = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    # The fourth letter is the holder type, P for an individual
+    pan = "".join(rng.choice(letters) for _ in range(3)) + "P" + rng.choice(letters) + \
+        str(rng.randrange(1000, 10000)) + rng.choice(letters)
+    return ["INCOME TAX DEPARTMENT", "GOVT. OF INDIA", "Permanent Account Number", pan, "TEST PERSON"]
+
+
+def synthetic_pan(rng):
+    image = Image.new("RGB", (1010, 640), (170, 200, 235))
+    draw = ImageDraw.Draw(image)
+    _lines(draw, pan_lines(rng), 60, 60, 80)
+    return image
+
+
+def ration_card_lines(rng):
+    return ["Civil Supplies Department", "Ration Card", f"New Ration Card No {rng.randrange(10**9, 10**10)}",
+            f"Consumer No {rng.randrange(10**5, 10**6)}", "FP SHOP No. 12", "Card Type: WAP"]
+
+
+def synthetic_ration_card(rng):
+    image = Image.new("RGB", (900, 1270), (252, 248, 235))
+    draw = ImageDraw.Draw(image)
+    _lines(draw, ration_card_lines(rng), 60, 80, 80)
+    return image
+
+
+def text_pdf(lines):
+    """A one-page born-digital PDF (Helvetica text layer, no image) holding ``lines``."""
+    escaped = [line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") for line in lines]
+    stream = "BT /F1 14 Tf 18 TL 50 780 Td " + " ".join(f"({line}) Tj T*" for line in escaped) + " ET"
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Contents 4 0 R"
+        " /Resources << /Font << /F1 5 0 R >> >> >>",
+        f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(output)
+    output += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    output += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode("latin-1")
+    output += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+    return bytes(output)
+
+
+SYNTHETIC_GENERATORS = {
+    "cheque": synthetic_cheque,
+    "aadhaar": synthetic_aadhaar,
+    "pan": synthetic_pan,
+    "ration_card": synthetic_ration_card,
+}
+# Text of the born-digital PDF stand-ins (e-Aadhaar, e-PAN, ...)
+SYNTHETIC_LINES = {
+    "cheque": cheque_lines,
+    "aadhaar": aadhaar_lines,
+    "pan": pan_lines,
+    "ration_card": ration_card_lines,
+}
+
+
+def make_synthetic_corpus(corpus_dir=DEFAULT_CORPUS, per_type=10, seed=7, text_pdfs=0):
+    """Write a small PII-free corpus of JPEG stand-ins for each document type.
+
+    ``text_pdfs`` adds that many born-digital PDFs per type, whose text layer
+    the local classifier reads without OCR.
+    """
+    rng = random.Random(seed)
+    for folder, generator in SYNTHETIC_GENERATORS.items():
+        os.makedirs(os.path.join(corpus_dir, folder), exist_ok=True)
+        for index in range(per_type):
+            generator(rng).save(os.path.join(corpus_dir, folder, f"synthetic_{index:03d}.jpg"), quality=85)
+        for index in range(text_pdfs):
+            with open(os.path.join(corpus_dir, folder, f"synthetic_text_{index:03d}.pdf"), "wb") as output:
+                output.write(text_pdf(SYNTHETIC_LINES[folder](rng)))
+
+
+if __name__ == "__main__":
+    make_synthetic_corpus()
@@ -0,0 +1,298 @@
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.fixtures import CORPUS_LABELS
+
+# Deliberately no extraction imports: the harness has to point the package at this
+# server through the environment before anything in it is imported
+BANK_CHEQUE, AADHAR_CARD, PAN_CARD, RATION_CARD = (
+    CORPUS_LABELS[folder] for folder in ("cheque", "aadhaar", "pan", "ration_card")
+)
+
+# What each prebuilt model "reads" off a document of each type. Values are kept
+# short; they only need to drive classification and the cheque rules.
+CHEQUE_TEXT = ("STATE BANK OF INDIA\nMG ROAD BRANCH\nIFSC SBIN0001234\nPay ____ or Bearer\n"
+               "A/c No. 12345678901\nPlease sign above\n⑈123456⑈ 400002001⑆ 000010⑈ 31")
+CANNED_TEXT = {
+    BANK_CHEQUE: CHEQUE_TEXT,
+    AADHAR_CARD: "Government of India\nName: Test Person\nDOB: 01/01/1990\n2345 6789 0124",
+    PAN_CARD: "INCOME TAX DEPARTMENT\nPermanent Account Number\nABCPE1234F",
+    RATION_CARD: "New Ration Card No 123456789\nConsumer No 42\nCard Type AAY",
+}
+CANNED_KEY_VALUES = {
+    BANK_CHEQUE: [("IFSC Code", "SBIN0001234"), ("A/c No.", "12345678901")],
+    AADHAR_CARD: [("DOB", "01/01/1990")],
+    PAN_CARD: [("Name", "TEST PERSON")],
+    RATION_CARD: [("New Ration Card No", "123456789"), ("Consumer No", "42")],
+}
+CANNED_ID_NUMBERS = {AADHAR_CARD: "2345 6789 0124", PAN_CARD: "ABCPE1234F"}
+
+ANALYZE_PATH = re.compile(r"^/formrecognizer/documentModels/([^/:]+):analyze$")
+RESULT_PATH = re.compile(r"^/formrecognizer/documentModels/([^/]+)/analyzeResults/([0-9a-f]+)$")
+
+
+def _span(offset, length):
+    return [{"offset": offset, "length": length}]
+
+
+def analyze_result(model_id, document_type):
+    """REST-shaped analyzeResult for ``model_id`` on a document of ``document_type``."""
+    content = CANNED_TEXT.get(document_type, "")
+    lines = [{"content": line, "polygon": [], "spans": _span(0, len(line))} for line in content.splitlines()]
+    words = [{"content": word, "polygon": [], "span": {"offset": 0, "length": len(word)}, "confidence": 0.99}
+             for word in content.split()]
+    result = {
+        "apiVersion": "2023-07-31",
+        "modelId": model_id,
+        "stringIndexType": "unicodeCodePoint",
+        "content": content,
+        "pages": [{"pageNumber": 1, "angle": 0, "width": 8.5, "height": 11, "unit": "inch",
+                   "spans": _span(0, len(content)), "words": words, "lines": lines}],
+        "styles": [],
+    }
+    if model_id == "prebuilt-document":
+        result["keyValuePairs"] = [
+            {"key": {"content": key, "boundingRegions": [], "spans": _span(0, len(key))},
+             "value": {"content": value, "boundingRegions": [], "spans": _span(0, len(value))},
+             "confidence": 0.9}
+            for key, value in CANNED_KEY_VALUES.get(document_type, [])
+        ]
+    if model_id == "prebuilt-idDocument":
+        number = CANNED_ID_NUMBERS.get(document_type)
+        fields = {}
+        if number:
+            fields["DocumentNumber"] = {"type": "string", "valueString": number, "content": number,
+                                        "confidence": 0.9}
+        result["documents"] = [{"docType": "idDocument.nationalIdentityCard", "fields": fields,
+                                "confidence": 0.9, "spans": _span(0, len(content))}] if fields else []
+    return result
+
+
+def schema_sample(schema):
+    # The cheapest value that satisfies a strict json_schema: nulls and empty arrays
+    if schema.get("type") == "object":
+        return {name: schema_sample(child) for name, child in schema.get("properties", {}).items()}
+    if schema.get("type") == "array":
+        return []
+    return None
+
+
+class StandinConfig:
+    """Latency (seconds) and failure rates of the stand-in backends."""
+
+    def __init__(self, azure_submit_latency=0.05, azure_latency=1.0, poll_interval=0.25,
+                 openai_latency=1.5, azure_error_rate=0.0, openai_error_rate=0.0, jitter=0.2, seed=0,
+                 azure_quota=0):
+        self.azure_submit_latency = azure_submit_latency
+        self.azure_latency = azure_latency
+        self.poll_interval = poll_interval
+        self.openai_latency = openai_latency
+        self.azure_error_rate = azure_error_rate
+        self.openai_error_rate = openai_error_rate
+        self.jitter = jitter
+        # Analyze calls accepted per second, 429 beyond that like a real resource; 0 for no limit
+        self.azure_quota = azure_quota
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def delay(self, seconds):
+        with self.lock:
+            factor = 1 + self.random.uniform(-self.jitter, self.jitter)
+        return max(0.0, seconds * factor)
+
+    def fails(self, rate):
+        with self.lock:
+            return self.random.random() < rate
+
+
+class StandinServer:
+    """One HTTP server playing Form Recognizer, OpenAI and the document host.
+
+    It speaks just enough of each wire protocol for the SDK clients and
+    extraction.chat to run unmodified: analyze requests get a 202 and an
+    Operation-Location that reports "running" until the configured latency
+    has passed, and chat completions get a schema-shaped JSON answer with a
+    usage block. Every call is counted in ``counts``.
+
+    ``register_document(name, content, label, uploaded)`` serves ``content``
+    at ``/documents/<name>`` and makes analyses of ``uploaded`` (the bytes
+    the pipeline actually sends to Azure) answer as ``label``.
+    """
+
+    def __init__(self, config=None, recordings_dir=None):
+        self.config = config or StandinConfig()
+        self.recordings_dir = recordings_dir
+        self.documents = {}
+        self.labels = {}
+        self.operations = {}
+        self.counts = {}
+        self._lock = threading.Lock()
+        self._quota_window = (0, 0)
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def register_document(self, name, content, label, uploaded=None):
+        self.documents[name] = content
+        for data in (content, uploaded):
+            if data is not None:
+                self.labels[hashlib.sha256(data).hexdigest()] = label
+        return f"{self.url}/documents/{name}"
+
+    def count(self, name):
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+    def over_quota(self):
+        # Fixed one-second windows, which is how Form Recognizer counts its TPS limit
+        if not self.config.azure_quota:
+            return False
+        with self._lock:
+            window, calls = self._quota_window
+            current = int(time.monotonic())
+            calls = calls + 1 if window == current else 1
+            self._quota_window = (current, calls)
+            return calls > self.config.azure_quota
+
+    def reset_counts(self):
+        with self._lock:
+            self.counts = {}
+
+    def recorded_result(self, model_id, label):
+        # A real analyzeResult captured for this type, if one was saved next to the corpus
+        if self.recordings_dir:
+            path = os.path.join(self.recordings_dir, f"{label}.{model_id}.json")
+            if os.path.exists(path):
+                with open(path, encoding="utf-8") as recording:
+                    return json.load(recording)
+        return analyze_result(model_id, label)
+
+    def _handler(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body=b"", headers=None, content_type="application/json"):
+                if isinstance(body, (dict, list)):
+                    body = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _body(self):
+                return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+            def do_GET(self):
+                path = self.path.split("?", 1)[0]
+                if path.startswith("/documents/"):
+                    content = standin.documents.get(path[len("/documents/"):])
+                    standin.count("download")
+                    if content is None:
+                        return self._send(404, {"error": "no such document"})
+                    return self._send(200, content, content_type="application/octet-stream")
+
+                match = RESULT_PATH.match(path)
+                if match:
+                    standin.count(f"azure_poll:{match.group(1)}")
+                    operation = standin.operations.get(match.group(2))
+                    if operation is None:
+                        return self._send(404, {"error": {"code": "NotFound", "message": "no such operation"}})
+                    model_id, label, ready_at, created = operation
+                    now = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+                    if time.monotonic() < ready_at:
+                        # poll_interval 0 sends no Retry-After, leaving the cadence to the client
+                        retry_after = standin.config.poll_interval
+                        return self._send(200, {"status": "running", "createdDateTime": created,
+                                                "lastUpdatedDateTime": now},
+                                          headers={"Retry-After": str(retry_after)} if retry_after > 0 else None)
+                    return self._send(200, {"status": "succeeded", "createdDateTime": created,
+                                            "lastUpdatedDateTime": now,
+                                            "analyzeResult": standin.recorded_result(model_id, label)})
+                return self._send(404, {"error": "not found"})
+
+            def do_POST(self):
+                path = self.path.split("?", 1)[0]
+                body = self._body()
+                match = ANALYZE_PATH.match(path)
+                if match:
+                    return self._analyze(match.group(1), body)
+                if path.endswith("/chat/completions"):
+                    return self._chat(body)
+                return self._send(404, {"error": "not found"})
+
+            def _analyze(self, model_id, body):
+                config = standin.config
+                label = standin.labels.get(hashlib.sha256(body).hexdigest())
+                standin.count(f"azure:{model_id}")
+                standin.count(f"azure_for:{label}")
+                time.sleep(config.delay(config.azure_submit_latency))
+                if standin.over_quota():
+                    standin.count("azure_throttled")
+                    return self._send(429, {"error": {"code": "429", "message": "Rate limit exceeded"}},
+                                      headers={"Retry-After": "1"})
+                if config.fails(config.azure_error_rate):
+                    standin.count("azure_error")
+                    return self._send(503, {"error": {"code": "ServiceUnavailable", "message": "injected"}})
+                operation_id = uuid.uuid4().hex
+                created = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+                standin.operations[operation_id] = (
+                    model_id, label, time.monotonic() + config.delay(config.azure_latency), created,
+                )
+                location = (f"{standin.url}/formrecognizer/documentModels/{model_id}"
+                            f"/analyzeResults/{operation_id}?api-version=2023-07-31")
+                return self._send(202, headers={"Operation-Location": location})
+
+            def _chat(self, body):
+                config = standin.config
+                payload = json.loads(body)
+                standin.count(f"openai:{payload.get('model')}")
+                time.sleep(config.delay(config.openai_latency))
+                if config.fails(config.openai_error_rate):
+                    standin.count("openai_error")
+                    return self._send(429, {"error": {"message": "injected"}}, headers={"Retry-After": "0"})
+                response_format = payload.get("response_format") or {}
+                if response_format.get("type") == "json_schema":
+                    content = json.dumps(schema_sample(response_format["json_schema"]["schema"]))
+                else:
+                    content = "Bank Name: STATE BANK OF INDIA"
+                completion_tokens = min(payload.get("max_tokens") or 200, len(content) // 4 + 1)
+                return self._send(200, {
+                    "id": f"chatcmpl-{uuid.uuid4().hex}",
+                    "object": "chat.completion",
+                    "model": payload.get("model"),
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": content}}],
+                    # Roughly 4 bytes a token, images included, is enough to compare runs
+                    "usage": {"prompt_tokens": len(body) // 4, "completion_tokens": completion_tokens,
+                              "total_tokens": len(body) // 4 + completion_tokens},
+                })
+
+        return Handler
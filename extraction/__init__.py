@@ -0,0 +1,29 @@
+# Shared building blocks for the cheque / KYC document extraction scripts.
+# Names are imported on first access, so "import extraction" stays cheap for CLIs and serverless handlers.
+import importlib
+
+_EXPORTS = {
+    "DocumentContext": ".document_context",
+    "get_chat_completion": ".chat",
+    "ResultCache": ".result_cache",
+    "get_result_cache": ".result_cache",
+    "identify_document_type": ".classification",
+    "pre_classify": ".local_classifier",
+    "register_local_classifier": ".local_classifier",
+    "DOCUMENT_TYPES": ".registry",
+    "DocumentTypeSpec": ".registry",
+    "get_document_type": ".registry",
+    "register_document_type": ".registry",
+    "Overloaded": ".rate_limits",
+    "RateLimited": ".rate_limits",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
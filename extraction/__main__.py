@@ -0,0 +1,105 @@
+import argparse
+import contextlib
+import json
+import sys
+
+# Each subcommand imports what it needs when it runs, so `--help`, `classify` and `ifsc`
+# never load the Azure / OpenAI SDKs
+
+
+def analyze(args):
+    from dotenv import load_dotenv
+
+    # Before the extraction modules read their settings from the environment
+    load_dotenv()
+    from .pipeline import analyze_document
+    from .records import record_to_dict
+
+    failed = False
+    for document_url in args.document_urls:
+        try:
+            # stdout carries one JSON line per document; the pipeline's progress prints go to stderr
+            with contextlib.redirect_stdout(sys.stderr):
+                document_type, document_details = analyze_document(document_url, args.mode)
+            line = {"document_url": document_url, "document_type": document_type,
+                    "document_details": document_details}
+        except Exception as exc:
+            failed = True
+            line = {"document_url": document_url, "error": str(exc)}
+        print(json.dumps(line, default=record_to_dict), flush=True)
+    return 1 if failed else 0
+
+
+def ingest(args):
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    from .ingest import ingest as run_ingest
+
+    # Unset sizes fall back to INGEST_WORKERS / INGEST_CHUNK_SIZE
+    sizes = {name: value for name, value in (("workers", args.workers), ("chunk_size", args.chunk_size))
+             if value is not None}
+    try:
+        progress = run_ingest(args.source, args.output, processes=args.processes, retry_failed=args.retry_failed,
+                              limit=args.limit, quiet=not args.verbose, **sizes)
+    except KeyboardInterrupt:
+        print("Interrupted; rerun the same command to resume", file=sys.stderr)
+        return 130
+    return 1 if progress.failed else 0
+
+
+def classify(args):
+    from .local_classifier import LOCAL_CONFIDENCE_THRESHOLD, pre_classify
+
+    for path in args.paths:
+        with open(path, "rb") as document_file:
+            document_type, confidence = pre_classify(document_file.read())
+        verdict = "confident" if confidence >= LOCAL_CONFIDENCE_THRESHOLD else "needs Azure"
+        print(f"{path}\t{document_type}\t{confidence:.2f}\t{verdict}")
+    return 0
+
+
+def ifsc(args):
+    from .ifsc_index import get_ifsc_index
+
+    index = get_ifsc_index()
+    if index is None:
+        print("No IFSC index built; see python -m extraction.ifsc_index build", file=sys.stderr)
+        return 1
+    for code in args.codes:
+        print(f"{code}\t{index.lookup(code)}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m extraction", description="Cheque / KYC document extraction")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    analyze_parser = subcommands.add_parser("analyze", help="classify and extract documents, one JSON line each")
+    analyze_parser.add_argument("document_urls", nargs="+")
+    # extraction.classification.CLASSIFICATION_MODES, spelled out so --help imports nothing
+    analyze_parser.add_argument("--mode", choices=("auto", "cheque", "full"), default="auto",
+                                help="cheque: classify from prebuilt-read alone; full: no prebuilt-read probe (default auto)")
+    analyze_parser.set_defaults(handler=analyze)
+    ingest_parser = subcommands.add_parser(
+        "ingest", help="analyse a directory or manifest of URLs / paths into JSON Lines or Parquet, resumably")
+    ingest_parser.add_argument("source", help="directory to walk, or a manifest file with one URL or path per line")
+    ingest_parser.add_argument("output", help="results.jsonl, or a directory for Parquet part files")
+    ingest_parser.add_argument("--workers", type=int, default=None)
+    ingest_parser.add_argument("--processes", action="store_true", help="process pool instead of threads")
+    ingest_parser.add_argument("--chunk-size", type=int, default=None, help="rows per write / Parquet part")
+    ingest_parser.add_argument("--retry-failed", action="store_true", help="redo documents that failed last run")
+    ingest_parser.add_argument("--limit", type=int, help="only the first N documents of the source")
+    ingest_parser.add_argument("--verbose", action="store_true", help="keep the pipeline's per-document output")
+    ingest_parser.set_defaults(handler=ingest)
+    classify_parser = subcommands.add_parser("classify", help="offline pre-classification of local files, no Azure")
+    classify_parser.add_argument("paths", nargs="+")
+    classify_parser.set_defaults(handler=classify)
+    ifsc_parser = subcommands.add_parser("ifsc", help="bank and branch for IFSC codes from the offline index")
+    ifsc_parser.add_argument("codes", nargs="+")
+    ifsc_parser.set_defaults(handler=ifsc)
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,340 @@
+import asyncio
+import contextlib
+import os
+
+import httpx
+
+from .chat import CHAT_COMPLETIONS_URL, chat_cache_key, chat_headers
+from .classification import (
+    AUTO, CHEQUE_MODE, CHEQUE_READ_THRESHOLD, cheque_read_score, classify_id_document, classify_key_value_pairs,
+    should_probe_cheque,
+)
+from .clients import HTTP2_AVAILABLE, HTTP_BACKOFF, HTTP_RETRIES, RETRY_STATUSES, retry_delay
+from .document_context import DocumentContext
+from .document_types import BANK_CHEQUE, UNKNOWN
+from .field_rules import missing_cheque_fields, resolve_cheque_fields
+from .local_classifier import LOCAL_CONFIDENCE_THRESHOLD, pre_classify
+from .metrics import SPECULATIVE_TASKS
+from .pdf_pages import merge_page_results, page_documents
+from .polling import polling_options
+from .rate_limits import athrottle_azure, athrottle_openai, refund_openai, settle_openai
+from .records import cheque_record, parse_record
+from .registry import CHEQUE_TEXT, UNKNOWN_DOCUMENT_DETAILS, cheque_prompt, get_document_type, vision_prompt
+from .routing import aroute
+from .streaming import StreamingJSONBody, adownload_document
+from .tracing import record_azure_call, record_usage, request_trace, set_document_type, span
+
+# In-flight calls allowed per backend, per process
+AZURE_CONCURRENCY = int(os.getenv("ASYNC_AZURE_CONCURRENCY", "16"))
+OPENAI_CONCURRENCY = int(os.getenv("ASYNC_OPENAI_CONCURRENCY", "16"))
+DOWNLOAD_CONCURRENCY = int(os.getenv("ASYNC_DOWNLOAD_CONCURRENCY", "32"))
+
+# Run prebuilt-document, prebuilt-idDocument and the likely extractor concurrently
+SPECULATIVE_EXECUTION = os.getenv("SPECULATIVE_EXECUTION", "0") == "1"
+# Local pre-classifier confidence that is strong enough to start an extractor early
+SPECULATION_THRESHOLD = float(os.getenv("SPECULATION_THRESHOLD", "0.5"))
+
+# Seconds before a single backend call is cancelled
+AZURE_TIMEOUT = float(os.getenv("ASYNC_AZURE_TIMEOUT", "120"))
+OPENAI_TIMEOUT = float(os.getenv("ASYNC_OPENAI_TIMEOUT", "120"))
+DOWNLOAD_TIMEOUT = float(os.getenv("ASYNC_DOWNLOAD_TIMEOUT", "60"))
+
+# Marks a classification result that has not arrived yet
+PENDING = object()
+
+
+def cached_completion(document, payload, prompt):
+    # Runs in a worker thread: the key hashes the whole document
+    key = chat_cache_key(document, payload, prompt)
+    return key, document.cache.get(key)
+
+
+@contextlib.asynccontextmanager
+async def queued(semaphore, stage, model=""):
+    # Time spent waiting for a backend slot is traced apart from the call itself
+    with span(f"{stage}_queue", model):
+        await semaphore.acquire()
+    try:
+        yield
+    finally:
+        semaphore.release()
+
+
+class AsyncExtractionEngine:
+    """asyncio counterpart of ``app1.analyze_document``.
+
+    Downloads, Azure analyses and chat completions each go through their own
+    semaphore and timeout, so one process can keep hundreds of documents in
+    flight without exceeding what either backend will accept. Use it as an
+    async context manager so the underlying clients are closed::
+
+        async with AsyncExtractionEngine() as engine:
+            document_type, details = await engine.analyze_document(url)
+    """
+
+    def __init__(self, endpoint=None, key=None, api_key=None,
+                 azure_concurrency=AZURE_CONCURRENCY, openai_concurrency=OPENAI_CONCURRENCY,
+                 download_concurrency=DOWNLOAD_CONCURRENCY, speculative=SPECULATIVE_EXECUTION):
+        self.endpoint = endpoint or os.getenv("ENDPOINT")
+        self.key = key or os.getenv("KEY")
+        self.api_key = api_key or os.getenv("OPENAI_API_KEY")
+        self._azure_semaphore = asyncio.Semaphore(azure_concurrency)
+        self._openai_semaphore = asyncio.Semaphore(openai_concurrency)
+        self._download_semaphore = asyncio.Semaphore(download_concurrency)
+        self._limits = httpx.Limits(max_connections=openai_concurrency + download_concurrency)
+        self._azure_client = None
+        self._http_client = None
+        self.speculative = speculative
+        # Backend calls started ahead of the classification decision, and how they ended up
+        self.speculation_stats = {"started": 0, "useful": 0, "wasted": 0}
+
+    async def __aenter__(self):
+        # The aio client sends its requests through azure-core's default aiohttp transport
+        from azure.ai.formrecognizer.aio import DocumentAnalysisClient
+        from azure.core.credentials import AzureKeyCredential
+
+        self._azure_client = DocumentAnalysisClient(
+            endpoint=self.endpoint, credential=AzureKeyCredential(self.key),
+            retry_total=HTTP_RETRIES, retry_backoff_factor=HTTP_BACKOFF,
+        )
+        self._http_client = httpx.AsyncClient(limits=self._limits, http2=HTTP2_AVAILABLE)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self._azure_client.close()
+        await self._http_client.aclose()
+
+    async def fetch(self, document_url):
+        async with queued(self._download_semaphore, "download"):
+            with span("download"):
+                content = await adownload_document(self._http_client, document_url, DOWNLOAD_TIMEOUT)
+        return DocumentContext(document_url, None, content=content)
+
+    async def _analyze_remote(self, model_id, content):
+        record_azure_call(model_id)
+        with span("azure_submit", model_id):
+            poller = await self._azure_client.begin_analyze_document(
+                model_id, content, **polling_options(model_id, content, asynchronous=True)
+            )
+        with span("azure_poll", model_id):
+            return await poller.result()
+
+    async def analyze(self, document, model_id):
+        # Hashing the document, SQLite and (de)serialising big results stay off the event loop
+        result = await asyncio.to_thread(document.cached_result, model_id)
+        if result is None:
+            content = await asyncio.to_thread(document.prepared, "azure")
+            await athrottle_azure(model_id)
+            async with queued(self._azure_semaphore, "azure", model_id):
+                result = await asyncio.wait_for(self._analyze_remote(model_id, content), AZURE_TIMEOUT)
+            await asyncio.to_thread(document.remember_result, model_id, result)
+        return result
+
+    async def chat_completion(self, payload, document, prompt):
+        key, cached = await asyncio.to_thread(cached_completion, document, payload, prompt)
+        if cached is not None:
+            return cached
+
+        body = StreamingJSONBody(payload)
+        for attempt in range(HTTP_RETRIES + 1):
+            # Every attempt counts against the quota, retries included
+            reserved = await athrottle_openai(payload)
+            async with queued(self._openai_semaphore, "llm", payload["model"]):
+                with span("llm", payload["model"]):
+                    response = await self._http_client.post(
+                        CHAT_COMPLETIONS_URL, headers=chat_headers(self.api_key, body), content=body.aiter(),
+                        timeout=OPENAI_TIMEOUT,
+                    )
+            if response.status_code not in RETRY_STATUSES or attempt == HTTP_RETRIES:
+                break
+            # The next attempt reserves afresh, so this one's tokens go back to the shared bucket
+            await asyncio.to_thread(refund_openai, payload, reserved)
+            # Back off outside the semaphore so the slot goes to another document
+            await asyncio.sleep(retry_delay(response, attempt))
+        if response.is_error:
+            await asyncio.to_thread(refund_openai, payload, reserved)
+            response.raise_for_status()
+        response_data = response.json()
+        record_usage(payload["model"], response_data.get("usage"))
+        await asyncio.to_thread(settle_openai, payload, reserved, response_data.get("usage"))
+        message_content = response_data['choices'][0]['message']['content']
+        await asyncio.to_thread(document.cache.set, key, message_content)
+        return message_content
+
+    async def local_classify(self, document, mode):
+        if mode == CHEQUE_MODE:
+            return None, 0.0
+        with span("local_classify"):
+            return await asyncio.to_thread(pre_classify, document.content)
+
+    async def probe_cheque(self, document, mode, local_type, confidence):
+        # extraction.classification.identify_document_type's prebuilt-read probe
+        if not should_probe_cheque(mode, local_type, confidence):
+            return False
+        return cheque_read_score(await self.analyze(document, "prebuilt-read")) >= CHEQUE_READ_THRESHOLD
+
+    async def identify_document_type(self, document, mode=AUTO):
+        # Same escalation as extraction.classification.identify_document_type
+        document_type, confidence = await self.local_classify(document, mode)
+        if document_type is not None and confidence >= LOCAL_CONFIDENCE_THRESHOLD:
+            return document_type
+        if await self.probe_cheque(document, mode, document_type, confidence):
+            return BANK_CHEQUE
+
+        document_type = classify_key_value_pairs(await self.analyze(document, "prebuilt-document"))
+        if document_type is None:
+            document_type = classify_id_document(await self.analyze(document, "prebuilt-idDocument"))
+        return document_type or UNKNOWN
+
+    async def extract(self, document, spec):
+        # asyncio counterpart of extraction.pipeline.extract_details
+        if spec.source == CHEQUE_TEXT:
+            return await self.extract_cheque(document, spec)
+        return await self.extract_from_image(document, spec)
+
+    async def extract_from_image(self, document, spec):
+        image_url = await asyncio.to_thread(document.data_url)
+        prompt = spec.render_prompt()
+
+        async def attempt(rung):
+            payload = spec.payload(prompt, rung.model, image_url)
+            return parse_record(spec.record_type, await self.chat_completion(payload, document, prompt))
+
+        return await aroute(spec.task, spec.models, attempt, spec.accepted) or spec.record_type()
+
+    async def extract_cheque(self, document, spec):
+        extracted_text = (await self.analyze(document, "prebuilt-read")).content
+        fields = resolve_cheque_fields(extracted_text)
+        missing_fields = missing_cheque_fields(fields)
+        if not missing_fields:
+            return cheque_record(fields)
+
+        prompt = cheque_prompt(spec, extracted_text, fields, missing_fields)
+
+        async def attempt(rung):
+            if not rung.vision:
+                llm_details = await self.chat_completion(spec.payload(prompt, rung.model), document, prompt)
+            else:
+                try:
+                    image_url = await asyncio.to_thread(document.data_url)
+                except ValueError:  # text-only PDF page
+                    return None
+                llm_details = await self.chat_completion(spec.payload(vision_prompt(prompt), rung.model, image_url),
+                                                         document, vision_prompt(prompt))
+            return cheque_record(fields, parse_record(spec.record_type, llm_details))
+
+        return await aroute(spec.task, spec.models, attempt, spec.accepted) or cheque_record(fields)
+
+    async def _speculative_analyze(self, document, mode=AUTO):
+        """Classify and extract with the Azure calls racing instead of queued.
+
+        prebuilt-document and prebuilt-idDocument start together, and the
+        extractor for the first strong signal starts before the final
+        decision. The decision itself follows the sequential precedence, so
+        results match the sequential path; the losing calls are cancelled.
+        """
+        local_type, confidence = await self.local_classify(document, mode)
+        if local_type is not None and confidence >= LOCAL_CONFIDENCE_THRESHOLD:
+            set_document_type(local_type)
+            return local_type, await self.extract(document, get_document_type(local_type))
+        # A confirmed cheque needs nothing to race: its one prebuilt-read result is also its extraction input
+        if await self.probe_cheque(document, mode, local_type, confidence):
+            set_document_type(BANK_CHEQUE)
+            return BANK_CHEQUE, await self.extract(document, get_document_type(BANK_CHEQUE))
+
+        # Keyed by task: an Aadhaar and a PAN guess share one identity extraction
+        extractions = {}
+        speculative = []
+
+        def speculate(document_type):
+            spec = get_document_type(document_type)
+            if spec is not None and spec.task not in extractions:
+                extractions[spec.task] = asyncio.create_task(self.extract(document, spec))
+                speculative.append(extractions[spec.task])
+
+        key_value_task = asyncio.create_task(self.analyze(document, "prebuilt-document"))
+        id_task = asyncio.create_task(self.analyze(document, "prebuilt-idDocument"))
+        speculative.append(id_task)
+        if local_type is not None and confidence >= SPECULATION_THRESHOLD:
+            speculate(local_type)
+
+        pending = {key_value_task, id_task}
+        key_value_type = id_type = PENDING
+        document_type = None
+        try:
+            while document_type is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                if key_value_task in done:
+                    key_value_type = classify_key_value_pairs(key_value_task.result())
+                    if key_value_type is not None:
+                        speculate(key_value_type)
+                # A failed idDocument call (a 429, say) only matters once prebuilt-document has no answer
+                if id_task in done and id_task.exception() is None:
+                    id_type = classify_id_document(id_task.result())
+                    if id_type is not None:
+                        speculate(id_type)
+
+                if key_value_type not in (PENDING, None):
+                    document_type = key_value_type
+                elif key_value_type is None and id_task.done():
+                    if id_type is PENDING:
+                        id_task.result()  # re-raises the idDocument failure
+                    document_type = id_type or UNKNOWN
+
+            set_document_type(document_type)
+            spec = get_document_type(document_type)
+            if spec is not None and spec.task not in extractions:
+                extractions[spec.task] = asyncio.create_task(self.extract(document, spec))
+            winner = extractions.get(spec.task) if spec is not None else None
+            used = {winner} if document_type == key_value_type else {winner, id_task}
+
+            # Cancel the losers before waiting on the winner
+            for task in speculative:
+                if task not in used:
+                    task.cancel()
+            document_details = await winner if winner is not None else dict(UNKNOWN_DOCUMENT_DETAILS)
+        finally:
+            for task in [key_value_task, id_task, *extractions.values()]:
+                if not task.done():
+                    task.cancel()
+
+        self.speculation_stats["started"] += len(speculative)
+        for task in speculative:
+            outcome = "useful" if task in used else "wasted"
+            self.speculation_stats[outcome] += 1
+            SPECULATIVE_TASKS.inc(outcome=outcome)
+            if outcome == "wasted" and task.done() and not task.cancelled():
+                task.exception()  # a failed loser is not worth a warning
+        return document_type, document_details
+
+    async def analyze_document(self, document_url, mode=AUTO):
+        with request_trace(document_url) as trace:
+            document = await self.fetch(document_url)
+            pages = await asyncio.to_thread(page_documents, document)
+            if len(pages) == 1:
+                document_type, document_details = await self.analyze_page(pages[0], mode)
+            else:
+                # Pages share the backend semaphores with every other document in flight
+                page_results = await asyncio.gather(*(self.analyze_page(page, mode) for page in pages),
+                                                    return_exceptions=True)
+                document_type, document_details = merge_page_results(page_results)
+            trace.document_type = document_type
+        return document_type, document_details
+
+    async def analyze_page(self, document, mode=AUTO):
+        if self.speculative:
+            return await self._speculative_analyze(document, mode)
+
+        document_type = await self.identify_document_type(document, mode)
+        set_document_type(document_type)
+        spec = get_document_type(document_type)
+        if spec is None:
+            return document_type, dict(UNKNOWN_DOCUMENT_DETAILS)
+        return document_type, await self.extract(document, spec)
+
+    async def analyze_documents(self, document_urls, mode=AUTO):
+        # Failures are returned in place so one bad URL does not cancel the batch
+        return await asyncio.gather(
+            *(self.analyze_document(document_url, mode) for document_url in document_urls),
+            return_exceptions=True,
+        )
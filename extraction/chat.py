@@ -0,0 +1,60 @@
+import json
+import os
+
+from .clients import get_http_session
+from .rate_limits import refund_openai, settle_openai, throttle_openai
+from .result_cache import cache_key
+from .streaming import StreamingJSONBody
+from .tracing import record_usage, span
+
+# Same variable the openai SDK reads, so both clients can be pointed at a proxy or stand-in
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1").rstrip("/")
+CHAT_COMPLETIONS_URL = f"{OPENAI_BASE_URL}/chat/completions"
+# (connect, read) seconds for a chat completion, so a hung call cannot hold a worker thread forever
+OPENAI_TIMEOUT = (float(os.getenv("OPENAI_CONNECT_TIMEOUT", "10")), float(os.getenv("OPENAI_READ_TIMEOUT", "120")))
+
+
+def chat_cache_key(document, payload, prompt):
+    # Cached by document hash, model, prompt text and output schema rather than the (huge) payload
+    output_format = json.dumps(payload.get("response_format"), sort_keys=True)
+    return cache_key(document.sha256, payload["model"], f"{prompt}\0{payload.get('max_tokens')}\0{output_format}")
+
+
+def chat_headers(api_key, body=None):
+    headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
+    if body is not None:
+        headers["Content-Length"] = str(len(body))
+    return headers
+
+
+def get_chat_completion(payload, api_key, document, prompt):
+    """Send a chat completions payload and return the message content.
+
+    Completions are cached by document hash, model and prompt text, so a
+    re-uploaded scan skips the LLM call entirely.
+    """
+    key = chat_cache_key(document, payload, prompt)
+    cached = document.cache.get(key)
+    if cached is not None:
+        return cached
+
+    # Image payloads are base64-encoded straight onto the socket
+    body = StreamingJSONBody(payload)
+    reserved = throttle_openai(payload)
+    try:
+        with span("llm", payload["model"]):
+            response = get_http_session().post(CHAT_COMPLETIONS_URL, headers=chat_headers(api_key, body), data=body,
+                                               timeout=OPENAI_TIMEOUT)
+        # The session stops retrying 429 / 5xx without raising; an error body has no choices
+        response.raise_for_status()
+        response_data = response.json()
+    except Exception:
+        # A failed call spent no tokens, so its reservation goes back to the shared bucket
+        refund_openai(payload, reserved)
+        raise
+    record_usage(payload["model"], response_data.get("usage"))
+    settle_openai(payload, reserved, response_data.get("usage"))
+    message_content = response_data['choices'][0]['message']['content']
+
+    document.cache.set(key, message_content)
+    return message_content
@@ -0,0 +1,102 @@
+import os
+
+from .document_types import BANK_CHEQUE, UNKNOWN
+from .field_rules import parse_micr_line
+from .local_classifier import LOCAL_CONFIDENCE_THRESHOLD, best_guess, classify_text, combine_scores, pre_classify
+from .registry import DOCUMENT_TYPES
+from .tracing import span
+
+# How a document is classified: AUTO probes likely cheques with prebuilt-read alone, CHEQUE
+# probes every document that way (the caller says it is a cheque) and FULL always goes
+# through prebuilt-document / prebuilt-idDocument
+AUTO, CHEQUE_MODE, FULL = "auto", "cheque", "full"
+CLASSIFICATION_MODES = (AUTO, CHEQUE_MODE, FULL)
+
+# Local cheque guesses at or above this confidence are probed with prebuilt-read first
+CHEQUE_PROBE_THRESHOLD = float(os.getenv("CHEQUE_PROBE_THRESHOLD", "0.3"))
+# Cheque score the prebuilt-read text needs for prebuilt-document to be skipped
+CHEQUE_READ_THRESHOLD = float(os.getenv("CHEQUE_READ_THRESHOLD", "0.6"))
+
+
+def classify_key_value_pairs(result):
+    """Classify a prebuilt-document result in a single pass over its key-value pairs.
+
+    Returns None when none of the keys is conclusive, so the caller can decide
+    whether a prebuilt-idDocument pass is worth paying for.
+    """
+    # Each key counts for the first type whose signals it contains, then registry order decides
+    detected = set()
+    for kv_pair in result.key_value_pairs:
+        if not (kv_pair.key and kv_pair.value):
+            continue
+        key_content = kv_pair.key.content
+        for spec in DOCUMENT_TYPES.values():
+            if any(term in key_content for term in spec.key_signals):
+                detected.add(spec.name)
+                break
+
+    for name in DOCUMENT_TYPES:
+        if name in detected:
+            return name
+    return None
+
+
+def classify_id_document(result):
+    # The DocumentNumber shape tells the ID types apart, see DocumentTypeSpec.id_number
+    for id_document in result.documents:
+        document_number = id_document.fields.get("DocumentNumber")
+        if document_number and document_number.value:
+            doc_number = document_number.value.replace(" ", "")  # Remove spaces for processing
+            for spec in DOCUMENT_TYPES.values():
+                if spec.id_number_pattern is not None and spec.id_number_pattern.fullmatch(doc_number):
+                    return spec.name
+    return None
+
+
+def cheque_read_score(result):
+    """Cheque score of a prebuilt-read result, 0.0 when another type scores higher.
+
+    Uses the registry's cheque text signals on the content and words, plus a
+    legible MICR band.
+    """
+    # Words rejoined with spaces, as line breaks in content can split phrases such as "or bearer"
+    words = " ".join(word.content for page in result.pages for word in page.words or ())
+    text = f"{result.content}\n{words}"
+    scores = classify_text(text)
+    if parse_micr_line(text):
+        scores[BANK_CHEQUE] = combine_scores(scores.get(BANK_CHEQUE, 0.0), 0.5)
+    document_type, score = best_guess(scores)
+    return score if document_type == BANK_CHEQUE else 0.0
+
+
+def should_probe_cheque(mode, local_type, confidence):
+    return mode == CHEQUE_MODE or (
+        mode == AUTO and local_type == BANK_CHEQUE and confidence >= CHEQUE_PROBE_THRESHOLD
+    )
+
+
+def identify_document_type(document, mode=AUTO):
+    """Pick the document type from as few Azure analyses as possible.
+
+    A confident offline guess skips Azure entirely. A likely cheque (any
+    document in CHEQUE mode) is probed with prebuilt-read, which its
+    extraction needs anyway. Otherwise the prebuilt-document result is
+    inspected once and prebuilt-idDocument is only requested when its
+    key-value pairs are inconclusive.
+    """
+    document_type, confidence = None, 0.0
+    if mode != CHEQUE_MODE:
+        with span("local_classify"):
+            document_type, confidence = pre_classify(document.content)
+        if document_type is not None and confidence >= LOCAL_CONFIDENCE_THRESHOLD:
+            return document_type
+
+    # extract_cheque reuses this result, so a confirmed cheque costs one Azure call in all
+    if should_probe_cheque(mode, document_type, confidence):
+        if cheque_read_score(document.analyze("prebuilt-read")) >= CHEQUE_READ_THRESHOLD:
+            return BANK_CHEQUE
+
+    document_type = classify_key_value_pairs(document.analyze("prebuilt-document"))
+    if document_type is None:
+        document_type = classify_id_document(document.analyze("prebuilt-idDocument"))
+    return document_type or UNKNOWN
@@ -0,0 +1,93 @@
+import importlib.util
+import os
+import threading
+
+# The SDKs and HTTP libraries are imported inside the get_* functions: importing them costs
+# more than a small batch job or a serverless invocation spends on everything else
+# Keep-alive connections per host, shared by every extractor in the process
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "32"))
+# Retries on connection errors, 429 and 5xx, with exponential backoff
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "3"))
+HTTP_BACKOFF = float(os.getenv("HTTP_BACKOFF", "0.5"))
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# httpx (the async engine's client) only speaks HTTP/2 when h2 is installed, as httpx[http2] does
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+_lock = threading.Lock()
+_http_session = None
+_azure_session = None
+_document_analysis_client = None
+
+
+def _make_session(retries):
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    session = requests.Session()
+    retry = Retry(
+        total=retries,
+        backoff_factor=HTTP_BACKOFF,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=None,  # chat completions are POSTs, retry them too
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def retry_delay(response, attempt):
+    # Honour Retry-After from 429s, otherwise back off exponentially
+    retry_after = response.headers.get("retry-after")
+    if retry_after and retry_after.replace(".", "", 1).isdigit():
+        return float(retry_after)
+    return HTTP_BACKOFF * (2 ** attempt)
+
+
+def get_http_session():
+    """Pooled ``requests`` session for document downloads and chat completions."""
+    global _http_session
+    with _lock:
+        if _http_session is None:
+            _http_session = _make_session(HTTP_RETRIES)
+    return _http_session
+
+
+def get_document_analysis_client():
+    """Process-wide Form Recognizer client on its own keep-alive pool.
+
+    The SDK applies its own retry policy, so its session does not retry a
+    second time underneath it.
+    """
+    global _azure_session, _document_analysis_client
+    with _lock:
+        if _document_analysis_client is None:
+            from azure.ai.formrecognizer import DocumentAnalysisClient
+            from azure.core.credentials import AzureKeyCredential
+            from azure.core.pipeline.transport import RequestsTransport
+
+            _azure_session = _make_session(0)
+            _document_analysis_client = DocumentAnalysisClient(
+                endpoint=os.getenv("ENDPOINT"),
+                credential=AzureKeyCredential(os.getenv("KEY")),
+                transport=RequestsTransport(session=_azure_session, session_owner=False),
+                retry_total=HTTP_RETRIES,
+                retry_backoff_factor=HTTP_BACKOFF,
+            )
+    return _document_analysis_client
+
+
+def reset_connections():
+    """Drop keep-alive connections inherited from a parent process.
+
+    Called in each worker after fork: the sessions stay usable and open
+    their own connections on next use.
+    """
+    with _lock:
+        for session in (_http_session, _azure_session):
+            if session is not None:
+                session.close()
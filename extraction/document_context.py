@@ -0,0 +1,93 @@
+import hashlib
+
+from .clients import get_http_session
+from .image_preprocess import image_mime_type, is_image, preprocess_image
+from .rate_limits import throttle_azure
+from .result_cache import cache_key, get_result_cache
+from .streaming import DataURL, download_document
+from .tracing import record_azure_call, span
+
+# Seconds to wait for the document host before giving up on the download
+DOWNLOAD_TIMEOUT = 60
+
+
+class DocumentContext:
+    """Request-scoped handle on a single document.
+
+    The document is fetched once and the same bytes are handed to every Azure
+    analyze call and to the base64 payload of the vision prompts, each after
+    being cropped and downscaled to what that backend needs. Analyze
+    results are kept per model id, so asking twice for ``prebuilt-document``
+    only costs one round trip, and are shared across requests through the
+    content-addressed result cache.
+    """
+
+    def __init__(self, document_url, document_analysis_client, content=None, cache=None):
+        self.url = document_url
+        self.client = document_analysis_client
+        self.cache = cache if cache is not None else get_result_cache()
+        self._content = content
+        self._sha256 = None
+        self._prepared = {}
+        self._results = {}
+
+    @property
+    def content(self):
+        if self._content is None:
+            with span("download"):
+                self._content = download_document(get_http_session(), self.url, DOWNLOAD_TIMEOUT)
+        return self._content
+
+    @property
+    def sha256(self):
+        if self._sha256 is None:
+            self._sha256 = hashlib.sha256(self.content).hexdigest()
+        return self._sha256
+
+    def prepared(self, target):
+        # Cache keys stay on the original bytes; these are only what gets uploaded
+        if target not in self._prepared:
+            content = self.content
+            with span("preprocess", target):
+                self._prepared[target] = preprocess_image(content, target)
+        return self._prepared[target]
+
+    def data_url(self):
+        image = self.prepared("vision")
+        if not is_image(image):
+            # Split PDFs with extraction.pdf_pages first; only scanned pages carry an image
+            raise ValueError("vision prompts need an image, got a PDF page without a scan")
+        return DataURL(image, image_mime_type(image))
+
+    def cached_result(self, model_id):
+        # Result from this request or the shared cache, None if Azure has to be asked
+        if model_id not in self._results:
+            cached = self.cache.get(cache_key(self.sha256, model_id))
+            if cached is None:
+                return None
+            from azure.ai.formrecognizer import AnalyzeResult
+
+            self._results[model_id] = AnalyzeResult.from_dict(cached)
+        return self._results[model_id]
+
+    def remember_result(self, model_id, result):
+        self._results[model_id] = result
+        self.cache.set(cache_key(self.sha256, model_id), result.to_dict())
+
+    def analyze(self, model_id):
+        result = self.cached_result(model_id)
+        if result is None:
+            # azure.core is only imported once a document actually goes to Azure
+            from .polling import polling_options
+
+            content = self.prepared("azure")
+            # Waits for the per-model quota rather than collecting a 429
+            throttle_azure(model_id)
+            record_azure_call(model_id)
+            # Upload and 202 vs waiting for the operation to finish
+            with span("azure_submit", model_id):
+                poller = self.client.begin_analyze_document(model_id, content, **polling_options(model_id, content))
+            with span("azure_poll", model_id):
+                result = poller.result()
+            self.remember_result(model_id, result)
+        return result
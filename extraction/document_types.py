@@ -0,0 +1,6 @@
+# Document type labels returned by the classifiers and the API
+RATION_CARD = "Ration Card"
+BANK_CHEQUE = "Bank Cheque"
+AADHAR_CARD = "Aadhar card"
+PAN_CARD = "PAN card"
+UNKNOWN = "Unknown"
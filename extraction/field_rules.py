@@ -0,0 +1,169 @@
+import re
+
+from .ifsc_index import get_ifsc_index
+
+# Cheque fields in the order the API has always reported them
+CHEQUE_FIELDS = ["Bank Name", "Branch Name", "IFSC Code", "Account Number"]
+
+# IFSC is AAAA0XXXXXX; OCR often reads the fifth character as the letter O
+IFSC_PATTERN = re.compile(r"\b([A-Z]{4})[0O]([A-Z0-9]{6})\b")
+# A code right after an "IFSC" / "IFS Code" label beats any other eleven character word
+LABELLED_IFSC_PATTERN = re.compile(r"\bIFSC?(?:\s*CODE)?\s*[:.\-]?\s*([A-Z]{4})[0O]([A-Z0-9]{6})\b")
+PAN_PATTERN = re.compile(r"\b[A-Z]{3}[ABCFGHLJPT][A-Z][0-9]{4}[A-Z]\b")
+AADHAR_PATTERN = re.compile(r"\b[2-9][0-9]{3}\s?[0-9]{4}\s?[0-9]{4}\b")
+# Account number labels, whole words only ("Indica", "DSCA" are not labels). The explicit
+# A/C No / Account No labels are tried before the bare SB / CA / CD scheme prefixes.
+# Separators are only allowed between regular groups of four, so a date or cheque
+# number printed after the account number on the same line is never swallowed
+ACCOUNT_NUMBER_VALUE = r"\.?\s*(?:No|Number)?\.?\s*[:.\-]?\s*([0-9]{4}(?:[ \-][0-9]{4})+(?![0-9])|[0-9]+)"
+ACCOUNT_LABEL_PATTERNS = [
+    re.compile(r"\b(?:A\s*/\s*C|Account)\b" + ACCOUNT_NUMBER_VALUE, re.I),
+    re.compile(r"\b(?:SB|CA|CD)\b" + ACCOUNT_NUMBER_VALUE, re.I),
+]
+UNLABELED_ACCOUNT_PATTERN = re.compile(r"(?<![0-9])[0-9]{11,18}(?![0-9])")
+# MICR band: cheque number, 9 digit MICR code (city/bank/branch), optional account id, transaction code
+MICR_LINE_PATTERN = re.compile(
+    r"(?<![0-9])([0-9]{6})[^0-9A-Za-z\n]{1,4}([0-9]{9})[^0-9A-Za-z\n]{1,4}(?:([0-9]{6})[^0-9A-Za-z\n]{1,4})?([0-9]{2})(?![0-9])"
+)
+
+# Verhoeff checksum tables (dihedral group D5)
+VERHOEFF_MULTIPLICATION = [
+    [0, 1, 2, 3, 4, 5, 6, 7, 8, 9],
+    [1, 2, 3, 4, 0, 6, 7, 8, 9, 5],
+    [2, 3, 4, 0, 1, 7, 8, 9, 5, 6],
+    [3, 4, 0, 1, 2, 8, 9, 5, 6, 7],
+    [4, 0, 1, 2, 3, 9, 5, 6, 7, 8],
+    [5, 9, 8, 7, 6, 0, 4, 3, 2, 1],
+    [6, 5, 9, 8, 7, 1, 0, 4, 3, 2],
+    [7, 6, 5, 9, 8, 2, 1, 0, 4, 3],
+    [8, 7, 6, 5, 9, 3, 2, 1, 0, 4],
+    [9, 8, 7, 6, 5, 4, 3, 2, 1, 0],
+]
+VERHOEFF_PERMUTATION = [
+    [0, 1, 2, 3, 4, 5, 6, 7, 8, 9],
+    [1, 5, 7, 6, 2, 8, 3, 0, 9, 4],
+    [5, 8, 0, 3, 7, 9, 6, 1, 4, 2],
+    [8, 9, 1, 6, 0, 4, 3, 5, 2, 7],
+    [9, 4, 5, 3, 1, 2, 6, 8, 7, 0],
+    [4, 2, 8, 6, 5, 7, 3, 9, 0, 1],
+    [2, 7, 9, 3, 8, 0, 6, 4, 1, 5],
+    [7, 0, 4, 6, 9, 1, 3, 2, 5, 8],
+]
+
+
+def verhoeff_valid(number):
+    check = 0
+    for position, digit in enumerate(reversed(number)):
+        check = VERHOEFF_MULTIPLICATION[check][VERHOEFF_PERMUTATION[position % 8][int(digit)]]
+    return check == 0
+
+
+def is_valid_aadhar(number):
+    number = number.replace(" ", "")
+    return len(number) == 12 and number.isdigit() and number[0] not in "01" and verhoeff_valid(number)
+
+
+def is_valid_pan(number):
+    return bool(PAN_PATTERN.fullmatch(number.replace(" ", "").upper()))
+
+
+def is_valid_ifsc(code):
+    return bool(re.fullmatch(r"[A-Z]{4}0[A-Z0-9]{6}", code))
+
+
+def ifsc_candidate(match):
+    # Words such as BANKOFINDIA fit the pattern too; an O read as 0 needs a digit in the branch part
+    if match.string[match.start(2) - 1] == "O" and not any(character.isdigit() for character in match.group(2)):
+        return None
+    return f"{match.group(1)}0{match.group(2)}"
+
+
+def find_ifsc(text):
+    text = text.upper()
+    for pattern in (LABELLED_IFSC_PATTERN, IFSC_PATTERN):
+        for match in pattern.finditer(text):
+            ifsc = ifsc_candidate(match)
+            if ifsc:
+                return ifsc
+    return None
+
+
+def parse_micr_line(text):
+    """Return cheque number, MICR code and transaction code from the MICR band, if legible."""
+    match = MICR_LINE_PATTERN.search(text)
+    if not match:
+        return {}
+    return {
+        "Cheque Number": match.group(1),
+        "MICR Code": match.group(2),
+        "Transaction Code": match.group(4),
+    }
+
+
+def find_account_number(text, micr=None):
+    excluded = set((micr or {}).values())
+    for pattern in ACCOUNT_LABEL_PATTERNS:
+        for match in pattern.finditer(text):
+            number = re.sub(r"[ \-]", "", match.group(1))
+            if 9 <= len(number) <= 18 and number not in excluded:
+                return number
+    # Without a label only accept one unambiguous long digit run
+    candidates = {number for number in UNLABELED_ACCOUNT_PATTERN.findall(text) if number not in excluded}
+    if len(candidates) == 1:
+        return candidates.pop()
+    return None
+
+
+def extract_cheque_fields(text):
+    """Deterministically pull cheque fields out of OCR text.
+
+    Fields that cannot be read with confidence are left out so the caller
+    only asks the LLM for those.
+    """
+    fields = {}
+    micr = parse_micr_line(text)
+    ifsc = find_ifsc(text)
+    if ifsc:
+        fields["IFSC Code"] = ifsc
+    account_number = find_account_number(text, micr)
+    if account_number:
+        fields["Account Number"] = account_number
+    fields.update(micr)
+    return fields
+
+
+def find_aadhar(text):
+    # First 12 digit number that passes the Verhoeff check, which random digit runs rarely do
+    for match in AADHAR_PATTERN.finditer(text):
+        if is_valid_aadhar(match.group(0)):
+            return match.group(0).replace(" ", "")
+    return None
+
+
+def extract_id_numbers(text):
+    # Only numbers that pass their checksum / format are trusted
+    fields = {}
+    aadhar = find_aadhar(text)
+    if aadhar:
+        fields["Aadhar Number"] = aadhar
+    match = PAN_PATTERN.search(text.upper())
+    if match:
+        fields["Pan Number"] = match.group(0)
+    return fields
+
+
+def missing_cheque_fields(fields):
+    return [field for field in CHEQUE_FIELDS if not fields.get(field)]
+
+
+def format_fields(fields, names):
+    return "\n".join(f"{name}: {fields[name]}" for name in names if fields.get(name))
+
+
+def resolve_cheque_fields(text):
+    # Rules first, then bank and branch names from the IFSC index when it is built
+    fields = extract_cheque_fields(text)
+    ifsc_index = get_ifsc_index()
+    if ifsc_index is not None and fields.get("IFSC Code"):
+        fields.update(ifsc_index.lookup(fields["IFSC Code"]) or {})
+    return fields
@@ -0,0 +1,144 @@
+import argparse
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+
+# Built from the RBI IFSC master with `python -m extraction.ifsc_index build <csv>`
+IFSC_INDEX_PATH = os.getenv("IFSC_INDEX_PATH", os.path.join("data", "ifsc.idx"))
+
+MAGIC = b"IFSCIDX1"
+# magic, slot count, bank count, offset of the bank table, offset of the branch heap
+HEADER = struct.Struct("<8sIIII")
+# IFSC code, branch heap offset (0 = empty slot), bank id
+SLOT = struct.Struct("<11sIH")
+LENGTH = struct.Struct("<H")
+
+
+def _slot_count(row_count):
+    # Power of two at twice the row count keeps linear probes short
+    slots = 1
+    while slots < row_count * 2:
+        slots <<= 1
+    return slots
+
+
+def _encode(text):
+    data = str(text).strip().encode("utf-8")[:0xFFFF]
+    return LENGTH.pack(len(data)) + data
+
+
+def write_index(rows, path):
+    """Write ``(ifsc, bank name, branch name)`` rows as an open-addressing hash file."""
+    rows = [(ifsc.strip().upper(), bank, branch) for ifsc, bank, branch in rows if len(ifsc.strip()) == 11]
+    slot_count = _slot_count(len(rows))
+    slots = bytearray(SLOT.size * slot_count)
+    banks = {}
+    heap = bytearray(b"\0")  # offset 0 marks an empty slot
+
+    for ifsc, bank, branch in rows:
+        bank_id = banks.setdefault(str(bank).strip(), len(banks))
+        branch_offset = len(heap)
+        heap += _encode(branch)
+        slot = zlib.crc32(ifsc.encode("ascii")) & (slot_count - 1)
+        while SLOT.unpack_from(slots, slot * SLOT.size)[1]:
+            if SLOT.unpack_from(slots, slot * SLOT.size)[0] == ifsc.encode("ascii"):
+                break  # duplicate code, last row wins
+            slot = (slot + 1) & (slot_count - 1)
+        SLOT.pack_into(slots, slot * SLOT.size, ifsc.encode("ascii"), branch_offset, bank_id)
+
+    bank_table = b"".join(_encode(name) for name in banks)
+    banks_offset = HEADER.size + len(slots)
+    heap_offset = banks_offset + len(bank_table)
+    tmp_path = f"{path}.tmp"
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(tmp_path, "wb") as index_file:
+        index_file.write(HEADER.pack(MAGIC, slot_count, len(banks), banks_offset, heap_offset))
+        index_file.write(slots)
+        index_file.write(bank_table)
+        index_file.write(heap)
+    os.replace(tmp_path, path)
+    return len(rows)
+
+
+def build_index(csv_path, path=IFSC_INDEX_PATH):
+    # pandas is only needed to build; loading the index must stay import-light
+    import pandas as pd
+
+    frame = pd.read_csv(csv_path, dtype=str, keep_default_na=False)
+    columns = {column.strip().upper(): column for column in frame.columns}
+    frame = frame[[columns["IFSC"], columns["BANK"], columns["BRANCH"]]]
+    return write_index(frame.itertuples(index=False, name=None), path)
+
+
+class IFSCIndex:
+    """Memory-mapped IFSC -> bank / branch lookup with O(1) probes."""
+
+    def __init__(self, path=IFSC_INDEX_PATH):
+        with open(path, "rb") as index_file:
+            self._map = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self._slot_count, bank_count, banks_offset, self._heap_offset = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not an IFSC index")
+        # The bank table is small (a few hundred names), decode it up front
+        self._banks = []
+        offset = banks_offset
+        for _ in range(bank_count):
+            name, offset = self._read_string(offset)
+            self._banks.append(name)
+
+    def _read_string(self, offset):
+        (length,) = LENGTH.unpack_from(self._map, offset)
+        start = offset + LENGTH.size
+        return self._map[start:start + length].decode("utf-8"), start + length
+
+    def lookup(self, ifsc):
+        code = ifsc.strip().upper().encode("ascii", "ignore")
+        mask = self._slot_count - 1
+        slot = zlib.crc32(code) & mask
+        while True:
+            slot_code, branch_offset, bank_id = SLOT.unpack_from(self._map, HEADER.size + slot * SLOT.size)
+            if not branch_offset:
+                return None
+            if slot_code == code:
+                branch, _ = self._read_string(self._heap_offset + branch_offset)
+                return {"Bank Name": self._banks[bank_id], "Branch Name": branch}
+            slot = (slot + 1) & mask
+
+
+_ifsc_index = None
+_ifsc_index_lock = threading.Lock()
+
+
+def get_ifsc_index():
+    # None when no index has been built, callers then fall back to the LLM
+    global _ifsc_index
+    with _ifsc_index_lock:
+        if _ifsc_index is None and os.path.exists(IFSC_INDEX_PATH):
+            _ifsc_index = IFSCIndex(IFSC_INDEX_PATH)
+    return _ifsc_index
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or query the offline IFSC index")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    build_parser = subcommands.add_parser("build", help="build the index from the RBI IFSC master CSV")
+    build_parser.add_argument("csv")
+    build_parser.add_argument("--output", default=IFSC_INDEX_PATH)
+    lookup_parser = subcommands.add_parser("lookup", help="look up one IFSC code")
+    lookup_parser.add_argument("ifsc")
+    lookup_parser.add_argument("--index", default=IFSC_INDEX_PATH)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        start = time.perf_counter()
+        row_count = build_index(args.csv, args.output)
+        print(f"Indexed {row_count} IFSC codes into {args.output} in {time.perf_counter() - start:.1f}s")
+    else:
+        start = time.perf_counter()
+        index = IFSCIndex(args.index)
+        details = index.lookup(args.ifsc)
+        print(f"{details} (load + lookup {(time.perf_counter() - start) * 1000:.2f} ms)")
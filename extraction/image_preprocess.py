@@ -0,0 +1,134 @@
+import io
+import os
+
+from PIL import Image, ImageChops, ImageOps
+
+# Set IMAGE_PREPROCESSING=0 to send the original bytes everywhere
+IMAGE_PREPROCESSING = os.getenv("IMAGE_PREPROCESSING", "1") == "1"
+
+# Resolution each backend can actually use, and the JPEG quality that keeps it legible.
+# Azure read needs roughly 12 px text height; GPT-4o rescales to 2048 px then 768 px on the
+# short side before tiling, so anything larger is only upload time and tokens.
+TARGETS = {
+    "azure": {"max_long_side": 2200, "max_short_side": None, "quality": 85},
+    "vision": {"max_long_side": 2048, "max_short_side": 768, "quality": 80},
+}
+
+# Thumbnail sizes used to find the document edges and the skew; skew needs legible text rows
+ANALYSIS_SIZE = 384
+SKEW_ANALYSIS_SIZE = 1024
+MAX_SKEW_DEGREES = 5
+# How much sharper the best row profile must be than the unrotated one before rotating
+MIN_SKEW_GAIN = 1.1
+
+
+def is_image(content):
+    return not content.startswith(b"%PDF")
+
+
+def image_mime_type(content):
+    # Preprocessing usually yields JPEG, but a PNG it could not shrink is passed through as is
+    try:
+        return Image.MIME.get(Image.open(io.BytesIO(content)).format, "image/jpeg")
+    except OSError:
+        return "image/jpeg"
+
+
+def estimate_skew(gray):
+    """Angle (degrees) that makes text rows most horizontal, by projection profile.
+
+    Returns 0 unless some angle beats the unrotated profile clearly, so
+    pages without enough text are left alone. The top and bottom fifth are
+    ignored: that is where a skewed crop leaves wedges of background.
+    """
+    width, height = gray.size
+    gray = gray.crop((int(width * 0.05), int(height * 0.2), int(width * 0.95), int(height * 0.8)))
+    binary = gray.point(lambda value: 255 if value < 128 else 0)
+    scores = {}
+    for angle in range(-MAX_SKEW_DEGREES, MAX_SKEW_DEGREES + 1):
+        rotated = binary.rotate(angle, fillcolor=0)
+        data = rotated.tobytes()
+        rows = [sum(data[row * rotated.width:(row + 1) * rotated.width]) for row in range(rotated.height)]
+        mean = sum(rows) / len(rows)
+        scores[angle] = sum((row - mean) ** 2 for row in rows)
+    best_angle = max(scores, key=scores.get)
+    if scores[best_angle] < scores[0] * MIN_SKEW_GAIN:
+        return 0
+    return best_angle
+
+
+def document_bbox(image):
+    """Bounding box of the document against the photo background, or None."""
+    thumbnail = ImageOps.grayscale(image)
+    thumbnail.thumbnail((ANALYSIS_SIZE, ANALYSIS_SIZE))
+    border = [thumbnail.getpixel((x, y)) for x in (0, thumbnail.width - 1) for y in (0, thumbnail.height - 1)]
+    background = sorted(border)[len(border) // 2]
+    difference = ImageChops.difference(thumbnail, Image.new("L", thumbnail.size, background))
+    mask = difference.point(lambda value: 255 if value > 40 else 0)
+    bbox = mask.getbbox()
+    if bbox is None:
+        return None
+    left, top, right, bottom = bbox
+    # A document photographed on a table fills its box; text on a plain scan does not
+    filled = mask.crop(bbox).histogram()[255] / ((right - left) * (bottom - top))
+    if filled < 0.5:
+        return None
+    # Ignore crops that would keep almost everything or suspiciously little
+    area = (right - left) * (bottom - top) / (thumbnail.width * thumbnail.height)
+    if not 0.3 <= area <= 0.95:
+        return None
+    scale = image.width / thumbnail.width
+    pad = int(0.02 * max(image.size))
+    return (max(0, int(left * scale) - pad), max(0, int(top * scale) - pad),
+            min(image.width, int(right * scale) + pad), min(image.height, int(bottom * scale) + pad))
+
+
+def _fit(image, max_long_side, max_short_side):
+    scale = 1.0
+    if max_long_side:
+        scale = min(scale, max_long_side / max(image.size))
+    if max_short_side:
+        scale = min(scale, max_short_side / min(image.size))
+    if scale < 1.0:
+        image = image.resize((max(1, round(image.width * scale)), max(1, round(image.height * scale))),
+                             Image.LANCZOS)
+    return image
+
+
+def preprocess_image(content, target):
+    """Auto-orient, crop, deskew, downscale and re-encode an image for one backend.
+
+    Returns the original bytes for PDFs, unreadable images, or when the
+    re-encoded image would not be smaller.
+    """
+    if not IMAGE_PREPROCESSING or not is_image(content):
+        return content
+    settings = TARGETS[target]
+    try:
+        image = Image.open(io.BytesIO(content))
+        # Let the JPEG decoder skip detail we are going to throw away anyway
+        image.draft("RGB", (settings["max_long_side"] * 2, settings["max_long_side"] * 2))
+        image = ImageOps.exif_transpose(image).convert("RGB")
+    except (OSError, Image.DecompressionBombError):
+        return content
+
+    # Work at twice the target size: enough to crop without losing the detail the backend needs
+    image = _fit(image, settings["max_long_side"] * 2, None)
+
+    # Measure the skew on the document alone, rotate the whole photo, then crop
+    bbox = document_bbox(image)
+    thumbnail = ImageOps.grayscale(image.crop(bbox) if bbox else image)
+    thumbnail.thumbnail((SKEW_ANALYSIS_SIZE, SKEW_ANALYSIS_SIZE))
+    angle = estimate_skew(thumbnail)
+    if angle:
+        background = image.getpixel((0, 0))
+        image = image.rotate(angle, resample=Image.BICUBIC, expand=True, fillcolor=background)
+        bbox = document_bbox(image)
+    if bbox is not None:
+        image = image.crop(bbox)
+    image = _fit(image, settings["max_long_side"], settings["max_short_side"])
+
+    output = io.BytesIO()
+    image.save(output, format="JPEG", quality=settings["quality"], optimize=True)
+    processed = output.getvalue()
+    return processed if len(processed) < len(content) or bbox or angle else content
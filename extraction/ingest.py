@@ -0,0 +1,277 @@
+import contextlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+import pandas as pd
+
+# Files picked up when a directory is ingested
+DOCUMENT_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff", ".pdf")
+# Rows buffered before they are written out; a crash loses at most this many (unbilled on rerun: the
+# result cache already holds their Azure and LLM answers)
+INGEST_CHUNK_SIZE = int(os.getenv("INGEST_CHUNK_SIZE", "100"))
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "8"))
+PROGRESS_INTERVAL = 10.0
+
+
+# Fixed column types, so a part whose rows have no errors still matches the others
+ROW_DTYPES = {"source": "string", "document_type": "string", "document_details": "string",
+              "error": "string", "seconds": "float64"}
+
+
+def rows_frame(rows):
+    return pd.DataFrame(rows, columns=list(ROW_DTYPES)).astype(ROW_DTYPES)
+
+
+def list_sources(source):
+    """Documents to ingest: the files under a directory, or the lines of a manifest.
+
+    A manifest holds one URL or local path per line; blank lines and lines
+    starting with # are skipped. Directories are walked in sorted order so
+    reruns see the same sequence.
+    """
+    if os.path.isdir(source):
+        paths = []
+        for directory, subdirectories, filenames in os.walk(source):
+            subdirectories.sort()
+            paths.extend(os.path.join(directory, filename) for filename in sorted(filenames)
+                         if filename.lower().endswith(DOCUMENT_EXTENSIONS))
+        return paths
+    with open(source, encoding="utf-8") as manifest:
+        return [line.strip() for line in manifest if line.strip() and not line.startswith("#")]
+
+
+def is_url(source):
+    return source.startswith(("http://", "https://"))
+
+
+def analyze_source(source):
+    """One output row for ``source``; runs in the pool, so failures come back as rows too."""
+    from .clients import get_document_analysis_client
+    from .document_context import DocumentContext
+    from .pipeline import analyze_document, analyze_document_context
+    from .records import record_to_dict
+
+    start = time.perf_counter()
+    row = {"source": source, "document_type": None, "document_details": None, "error": None}
+    try:
+        if is_url(source):
+            document_type, document_details = analyze_document(source)
+        else:
+            with open(source, "rb") as document_file:
+                document = DocumentContext(None, get_document_analysis_client(), content=document_file.read())
+            document_type, document_details = analyze_document_context(document)
+        row["document_type"] = document_type
+        # Nested records differ per type; one JSON column keeps the Parquet schema fixed
+        row["document_details"] = json.dumps(document_details, default=record_to_dict)
+    except Exception as exc:
+        row["error"] = f"{type(exc).__name__}: {exc}"
+    row["seconds"] = round(time.perf_counter() - start, 3)
+    return row
+
+
+def analyze_source_quietly(source):
+    # Process pool workers: the pipeline prints a line per document
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        return analyze_source(source)
+
+
+def latest_rows(frame):
+    # A source rerun with --retry-failed has a row per attempt; the last one is its result
+    return frame.drop_duplicates("source", keep="last").reset_index(drop=True)
+
+
+class JSONLinesOutput:
+    """Append-only JSON Lines file that doubles as the checkpoint."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def finished(self):
+        # Sources already written; a line cut off by a crash is dropped and its document redone
+        if not os.path.exists(self.path):
+            return {}
+        finished = {}
+        lines = {}
+        duplicated = False
+        with open(self.path, "rb+") as output:
+            valid_bytes = 0
+            for line in output:
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    break
+                duplicated |= lines.pop(row["source"], None) is not None
+                lines[row["source"]] = line
+                finished[row["source"]] = row.get("error")
+                valid_bytes += len(line)
+            output.truncate(valid_bytes)
+        if duplicated:
+            self._rewrite(lines.values())
+        return finished
+
+    def compact(self):
+        self.finished()
+
+    def _rewrite(self, lines):
+        # Keep only each source's last row, swapped into place so a crash leaves the old file intact
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "wb") as output:
+            output.writelines(lines)
+            output.flush()
+            os.fsync(output.fileno())
+        os.replace(temporary, self.path)
+
+    def read(self):
+        return latest_rows(pd.read_json(self.path, lines=True, dtype=False))
+
+    def write(self, rows):
+        text = rows_frame(rows).to_json(orient="records", lines=True, force_ascii=False)
+        with open(self.path, "a", encoding="utf-8") as output:
+            output.write(text if text.endswith("\n") else text + "\n")
+            output.flush()
+            os.fsync(output.fileno())
+
+
+class ParquetOutput:
+    """Directory of part files, each renamed into place once complete, which doubles as the checkpoint."""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._parts = len(self._part_files())
+
+    def _part_files(self):
+        return sorted(name for name in os.listdir(self.path) if name.startswith("part-") and name.endswith(".parquet"))
+
+    def finished(self):
+        finished = {}
+        for name in self._part_files():
+            frame = pd.read_parquet(os.path.join(self.path, name), columns=["source", "error"])
+            finished.update((source, None if pd.isna(error) else error)
+                            for source, error in zip(frame["source"], frame["error"]))
+        return finished
+
+    def compact(self):
+        # Part files are never rewritten; read() drops the rows a retry superseded
+        pass
+
+    def read(self):
+        frames = [pd.read_parquet(os.path.join(self.path, name)) for name in self._part_files()]
+        return latest_rows(pd.concat(frames, ignore_index=True) if frames else rows_frame([]))
+
+    def write(self, rows):
+        name = f"part-{self._parts:06d}.parquet"
+        temporary = os.path.join(self.path, f".{name}.tmp")
+        rows_frame(rows).to_parquet(temporary, index=False)
+        os.replace(temporary, os.path.join(self.path, name))
+        self._parts += 1
+
+
+def open_output(path):
+    # A .jsonl / .json path is a JSON Lines file, anything else a directory of Parquet parts
+    if path.endswith((".jsonl", ".json")):
+        return JSONLinesOutput(path)
+    return ParquetOutput(path)
+
+
+def read_results(path):
+    """Results written by ingest() to ``path``, one row per source (its latest attempt)."""
+    return open_output(path).read()
+
+
+class Progress:
+    """Throughput and ETA of this run, printed to stderr every PROGRESS_INTERVAL seconds."""
+
+    def __init__(self, total, skipped, stream=None, interval=PROGRESS_INTERVAL):
+        self.total = total
+        self.skipped = skipped
+        self.done = 0
+        self.failed = 0
+        self.stream = stream or sys.stderr
+        self.interval = interval
+        self.started = time.perf_counter()
+        self._last_report = self.started
+
+    def update(self, row):
+        self.done += 1
+        self.failed += row["error"] is not None
+        if time.perf_counter() - self._last_report >= self.interval:
+            self.report()
+
+    def report(self):
+        now = time.perf_counter()
+        self._last_report = now
+        rate = self.done / max(now - self.started, 1e-9)
+        remaining = self.total - self.skipped - self.done
+        eta = remaining / rate if rate else float("inf")
+        print(f"{self.skipped + self.done}/{self.total} documents ({self.skipped} from checkpoint, "
+              f"{self.failed} failed), {rate:.2f} documents/s, ETA {format_duration(eta)}",
+              file=self.stream, flush=True)
+
+
+def format_duration(seconds):
+    if seconds == float("inf"):
+        return "unknown"
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}"
+
+
+def ingest(source, output_path, workers=INGEST_WORKERS, processes=False, chunk_size=INGEST_CHUNK_SIZE,
+           retry_failed=False, limit=None, progress_interval=PROGRESS_INTERVAL, quiet=True):
+    """Analyse every document in ``source`` into ``output_path``, resuming where a previous run stopped.
+
+    Documents already in the output are skipped (failed ones too, unless
+    ``retry_failed``), so a crashed or interrupted backfill is rerun with the
+    same arguments. At most ``workers * 2`` documents are in flight.
+    Progress goes to stderr; with ``quiet`` the pipeline's own prints are dropped.
+    """
+    output = open_output(output_path)
+    finished = output.finished()
+    sources = list_sources(source)
+    if limit is not None:
+        sources = sources[:limit]
+    pending = [document for document in sources
+               if document not in finished or (retry_failed and finished[document] is not None)]
+    progress = Progress(len(sources), len(sources) - len(pending), interval=progress_interval)
+
+    if processes:
+        executor = ProcessPoolExecutor(max_workers=workers)
+        analyze = analyze_source_quietly if quiet else analyze_source
+    else:
+        executor = ThreadPoolExecutor(max_workers=workers)
+        analyze = analyze_source
+    rows = []
+    with contextlib.ExitStack() as quiet_output:
+        if quiet:
+            quiet_output.enter_context(contextlib.redirect_stdout(quiet_output.enter_context(open(os.devnull, "w"))))
+        try:
+            queue = iter(pending)
+            in_flight = set()
+            while True:
+                for document in queue:
+                    in_flight.add(executor.submit(analyze, document))
+                    if len(in_flight) >= workers * 2:
+                        break
+                if not in_flight:
+                    break
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    row = future.result()
+                    rows.append(row)
+                    progress.update(row)
+                if len(rows) >= chunk_size:
+                    output.write(rows)
+                    rows = []
+        finally:
+            # On Ctrl-C too: finish what is running, drop what is queued, keep every finished row
+            executor.shutdown(cancel_futures=True)
+            if rows:
+                output.write(rows)
+            if retry_failed:
+                output.compact()
+            progress.report()
+    return progress
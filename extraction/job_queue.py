@@ -0,0 +1,263 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from urllib.parse import urlsplit
+
+from .clients import get_http_session
+from .records import record_to_dict
+
+# Location of the on-disk queue and how it is worked, overridable from the .env file
+JOB_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", os.path.join(".cache", "jobs.sqlite3"))
+# Opt-in: web processes only work the queue when JOB_WORKERS is set; worker.py defaults it to 4
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "0"))
+# A running job whose worker died is handed out again once its lease runs out; a live worker
+# renews its lease every third of this, so a long job is never handed out twice
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "600"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# Seconds an idle worker sleeps before looking at the queue again
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "0.5"))
+WEBHOOK_TIMEOUT = float(os.getenv("WEBHOOK_TIMEOUT", "10"))
+# Hosts callback_url may point at ("hooks.example.com", or ".example.com" for its subdomains) and the
+# schemes allowed; with no hosts configured callbacks are refused, so callers cannot reach internal addresses
+JOB_CALLBACK_HOSTS = [host.strip().lower() for host in os.getenv("JOB_CALLBACK_HOSTS", "").split(",") if host.strip()]
+JOB_CALLBACK_SCHEMES = [scheme.strip() for scheme in os.getenv("JOB_CALLBACK_SCHEMES", "https").split(",")]
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class JobQueue:
+    """Durable SQLite queue of documents waiting to be analysed.
+
+    Jobs survive restarts: a job is claimed with a lease, and if the worker
+    holding it dies the lease expires and another worker picks it up, up to
+    ``max_attempts`` times. Several processes may share one queue file.
+    """
+
+    def __init__(self, path=JOB_QUEUE_PATH, lease_seconds=JOB_LEASE_SECONDS, max_attempts=JOB_MAX_ATTEMPTS):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._conn = self._connect()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY, status TEXT NOT NULL, document_url TEXT NOT NULL,"
+            " callback_url TEXT, result TEXT, error TEXT, attempts INTEGER NOT NULL DEFAULT 0,"
+            " created REAL NOT NULL, updated REAL NOT NULL, lease_expires REAL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created)")
+        return conn
+
+    def close(self):
+        # SQLite connections must not cross fork(): close before forking, reopen() in the child
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def reopen(self):
+        with self._lock:
+            if self._conn is None:
+                self._conn = self._connect()
+
+    def submit(self, document_url, callback_url=None):
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, document_url, callback_url, created, updated)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, QUEUED, document_url, callback_url, now, now),
+            )
+        return job_id
+
+    def claim(self):
+        """Lease the oldest waiting job, returning ``(id, document_url, callback_url)`` or None."""
+        now = time.time()
+        with self._lock:
+            # IMMEDIATE takes the write lock up front, so two processes never claim the same job
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Jobs that keep killing their worker stop being handed out
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, error = ?, updated = ?, lease_expires = NULL"
+                    " WHERE status = ? AND lease_expires < ? AND attempts >= ?",
+                    (FAILED, "lease expired", now, RUNNING, now, self.max_attempts),
+                )
+                row = self._conn.execute(
+                    "SELECT id, document_url, callback_url FROM jobs"
+                    " WHERE status = ? OR (status = ? AND lease_expires < ?)"
+                    " ORDER BY created LIMIT 1",
+                    (QUEUED, RUNNING, now),
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = ?, attempts = attempts + 1, updated = ?, lease_expires = ?"
+                        " WHERE id = ?",
+                        (RUNNING, now, now + self.lease_seconds, row[0]),
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return row
+
+    def renew(self, job_id):
+        # Heartbeat of a job still running: push its lease out again
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET lease_expires = ?, updated = ? WHERE id = ? AND status = ?",
+                (now + self.lease_seconds, now, job_id, RUNNING),
+            )
+
+    def complete(self, job_id, result):
+        self._finish(job_id, DONE, result=json.dumps(result, default=record_to_dict))
+
+    def fail(self, job_id, error):
+        # Retried while attempts remain, otherwise parked as failed
+        with self._lock:
+            attempts = self._conn.execute("SELECT attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()[0]
+        status = QUEUED if attempts < self.max_attempts else FAILED
+        self._finish(job_id, status, error=error)
+        return status
+
+    def _finish(self, job_id, status, result=None, error=None):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, updated = ?, lease_expires = NULL WHERE id = ?",
+                (status, result, error, time.time(), job_id),
+            )
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, status, document_url, result, error, attempts, created, updated FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        job = dict(zip(("job_id", "status", "document_url", "result", "error", "attempts", "created", "updated"), row))
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        return job
+
+    def stats(self):
+        # Queue depth is the number to autoscale workers on
+        with self._lock:
+            counts = dict(self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+            oldest = self._conn.execute(
+                "SELECT MIN(created) FROM jobs WHERE status = ?", (QUEUED,)
+            ).fetchone()[0]
+        stats = {status: counts.get(status, 0) for status in (QUEUED, RUNNING, DONE, FAILED)}
+        stats["depth"] = stats[QUEUED] + stats[RUNNING]
+        stats["oldest_queued_age"] = time.time() - oldest if oldest is not None else 0.0
+        return stats
+
+
+def callback_allowed(callback_url, hosts=None, schemes=None):
+    """True when ``callback_url`` uses an allowed scheme and points at an allowed host."""
+    hosts = JOB_CALLBACK_HOSTS if hosts is None else hosts
+    schemes = JOB_CALLBACK_SCHEMES if schemes is None else schemes
+    try:
+        parts = urlsplit(callback_url)
+    except ValueError:
+        return False
+    hostname = (parts.hostname or "").lower()
+    if parts.scheme not in schemes or not hostname:
+        return False
+    return any(hostname == host or (host.startswith(".") and hostname.endswith(host)) for host in hosts)
+
+
+def send_webhook(callback_url, job):
+    # Best effort: the result stays pollable whether or not the callback gets through
+    if not callback_allowed(callback_url):
+        print(f"Webhook to {callback_url} for job {job['job_id']} skipped: host not allowed")
+        return
+    try:
+        # No redirects: an allowed host must not bounce the POST to an internal address
+        response = get_http_session().post(callback_url, json=job, timeout=WEBHOOK_TIMEOUT, allow_redirects=False)
+        response.raise_for_status()
+    except Exception as exc:
+        print(f"Webhook to {callback_url} for job {job['job_id']} failed: {exc}")
+
+
+class JobWorkerPool:
+    """Threads that drain a JobQueue through ``handler(document_url)``.
+
+    The handler's return value is stored as the job result; an exception
+    fails the attempt. Jobs with a callback URL get the finished job POSTed
+    to it.
+    """
+
+    def __init__(self, queue, handler, workers=JOB_WORKERS, poll_interval=JOB_POLL_INTERVAL):
+        self.queue = queue
+        self.handler = handler
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._stopping = threading.Event()
+        self._threads = []
+
+    def start(self):
+        for number in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"job-worker-{number}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self, timeout=None):
+        self._stopping.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _run(self):
+        while not self._stopping.is_set():
+            job = self.queue.claim()
+            if job is None:
+                self._stopping.wait(self.poll_interval)
+                continue
+            self.run_job(*job)
+
+    def run_job(self, job_id, document_url, callback_url):
+        finished = threading.Event()
+        heartbeat = threading.Thread(target=self._renew_lease, args=(job_id, finished),
+                                     name=f"job-lease-{job_id[:8]}", daemon=True)
+        heartbeat.start()
+        try:
+            result = self.handler(document_url)
+        except Exception as exc:
+            if self.queue.fail(job_id, str(exc)) == QUEUED:
+                return
+        else:
+            self.queue.complete(job_id, result)
+        finally:
+            finished.set()
+            heartbeat.join()
+        if callback_url:
+            send_webhook(callback_url, self.queue.get(job_id))
+
+    def _renew_lease(self, job_id, finished):
+        while not finished.wait(self.queue.lease_seconds / 3):
+            self.queue.renew(job_id)
+
+
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+
+def get_job_queue():
+    # One queue connection per process, opened on first use
+    global _job_queue
+    with _job_queue_lock:
+        if _job_queue is None:
+            _job_queue = JobQueue()
+    return _job_queue
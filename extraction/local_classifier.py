@@ -0,0 +1,155 @@
+import io
+import os
+
+try:
+    import pytesseract
+except ImportError:  # local OCR is optional, the other signals still work without it
+    pytesseract = None
+
+from .document_types import AADHAR_CARD, BANK_CHEQUE, PAN_CARD
+from .registry import DOCUMENT_TYPES
+
+# Guesses at or above this confidence skip the remote classification calls. Only text evidence
+# reaches it: one valid IFSC code, PAN or Verhoeff-valid Aadhaar number (registry text_signals)
+LOCAL_CONFIDENCE_THRESHOLD = float(os.getenv("LOCAL_CLASSIFIER_THRESHOLD", "0.8"))
+
+# Strongest score pixel heuristics alone may give. Kept below the threshold: aspect ratio, a light
+# bottom band or a blue tint are only calibrated on synthetic fixtures, so they can steer the
+# cheque probe but never decide the document type without Azure
+LAYOUT_MAX_SCORE = 0.7
+
+# Width the image is reduced to before any pixel statistics or OCR
+ANALYSIS_WIDTH = 512
+
+# (document type, pattern or predicate, weight) hints looked for in local text, from the registry
+TEXT_SIGNALS = [
+    (spec.name, pattern, weight)
+    for spec in DOCUMENT_TYPES.values()
+    for pattern, weight in spec.text_signals
+]
+
+
+def combine_scores(*scores):
+    # Treat the signals as independent pieces of evidence
+    remaining = 1.0
+    for score in scores:
+        remaining *= 1.0 - score
+    return 1.0 - remaining
+
+
+def best_guess(scores):
+    if not scores:
+        return None, 0.0
+    document_type = max(scores, key=scores.get)
+    return document_type, scores[document_type]
+
+
+def classify_text(text):
+    """Score each document type from regex hits on locally available text."""
+    scores = {}
+    for document_type, pattern, weight in TEXT_SIGNALS:
+        if (pattern(text) if callable(pattern) else pattern.search(text)):
+            scores[document_type] = combine_scores(scores.get(document_type, 0.0), weight)
+    return scores
+
+
+def pdf_text_classifier(content):
+    # Born-digital PDFs carry their text, no OCR needed
+    if not content.startswith(b"%PDF"):
+        return {}
+    from PyPDF2 import PdfReader
+
+    try:
+        reader = PdfReader(io.BytesIO(content))
+        text = "\n".join(page.extract_text() or "" for page in reader.pages[:2])
+    except Exception:  # PyPDF2 raises all sorts on broken files; Azure may still read them
+        return {}
+    return classify_text(text)
+
+
+def load_analysis_image(content):
+    from PIL import Image, ImageOps
+
+    image = Image.open(io.BytesIO(content))
+    # JPEG can decode straight to a reduced size, which keeps this cheap on 12 MP photos
+    image.draft("RGB", (ANALYSIS_WIDTH, ANALYSIS_WIDTH))
+    image = ImageOps.exif_transpose(image).convert("RGB")
+    if image.width > ANALYSIS_WIDTH:
+        image = image.resize((ANALYSIS_WIDTH, max(1, image.height * ANALYSIS_WIDTH // image.width)))
+    return image
+
+
+def channel_mean(histogram):
+    return sum(value * count for value, count in enumerate(histogram)) / max(1, sum(histogram))
+
+
+def has_micr_band(gray):
+    # Cheques end in a light band carrying a single row of MICR glyphs. At ANALYSIS_WIDTH the
+    # glyphs are only a few pixels high and blur to grey, so any ink darker than the paper counts
+    width, height = gray.size
+    band = gray.crop((0, int(height * 0.85), width, height))
+    histogram = band.histogram()
+    pixels = sum(histogram)
+    ink = sum(histogram[:200]) / pixels
+    return 0.003 <= ink <= 0.25
+
+
+def has_saffron_header(image):
+    # Aadhaar cards are printed with a saffron band across the top
+    width, height = image.size
+    histogram = image.crop((0, 0, width, max(1, height // 10))).histogram()
+    return channel_mean(histogram[:256]) - channel_mean(histogram[512:]) > 60
+
+
+def image_layout_classifier(content):
+    if content.startswith(b"%PDF"):
+        return {}
+    # Pillow is only needed once an image is actually classified
+    from PIL import Image, ImageOps
+
+    try:
+        image = load_analysis_image(content)
+    except (OSError, Image.DecompressionBombError):
+        return {}
+
+    scores = {}
+    aspect_ratio = max(image.size) / min(image.size)
+    gray = ImageOps.grayscale(image)
+    if 2.05 <= aspect_ratio <= 2.6:
+        # CTS-2010 cheques are 202 x 92 mm
+        scores[BANK_CHEQUE] = LAYOUT_MAX_SCORE if has_micr_band(gray) else 0.3
+    elif 1.45 <= aspect_ratio <= 1.7:
+        # ID-1 cards (Aadhaar, PAN) are 85.6 x 54 mm; PAN cards are printed on a blue tint
+        histogram = image.histogram()
+        red, blue = channel_mean(histogram[:256]), channel_mean(histogram[512:])
+        if blue - red > 12:
+            scores[PAN_CARD] = LAYOUT_MAX_SCORE
+        else:
+            scores[AADHAR_CARD] = 0.6 if has_saffron_header(image) else 0.3
+
+    if pytesseract is not None:
+        for document_type, score in classify_text(pytesseract.image_to_string(gray)).items():
+            scores[document_type] = combine_scores(scores.get(document_type, 0.0), score)
+    return scores
+
+
+# Pluggable list of callables taking the document bytes and returning {document type: score}
+LOCAL_CLASSIFIERS = [pdf_text_classifier, image_layout_classifier]
+
+
+def register_local_classifier(classifier):
+    LOCAL_CLASSIFIERS.append(classifier)
+    return classifier
+
+
+def pre_classify(content, classifiers=None):
+    """Guess the document type offline.
+
+    Returns ``(document_type, confidence)``; the type is None when no local
+    signal fired at all.
+    """
+    scores = {}
+    for classifier in LOCAL_CLASSIFIERS if classifiers is None else classifiers:
+        for document_type, score in classifier(content).items():
+            scores[document_type] = combine_scores(scores.get(document_type, 0.0), score)
+    return best_guess(scores)
@@ -0,0 +1,254 @@
+import bisect
+import glob
+import json
+import os
+import threading
+import time
+
+# Directory where every process serving /metrics (gunicorn workers) writes a snapshot of its
+# samples; a scrape sums them all, so it sees the whole server whichever worker answers it.
+# Unset, /metrics reports the process that answers it
+METRICS_DIR = os.getenv("METRICS_DIR")
+# Seconds between snapshots; a scrape always writes its own worker's first
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))
+# Samples of workers that have exited, folded together so counters survive worker recycling
+RETIRED_SNAPSHOT = "metrics-retired.json"
+
+# Seconds; Azure polls and LLM calls run from a few hundred ms to well over ten seconds
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 40.0, 80.0)
+
+# Every metric defined below, in the order /metrics prints them
+REGISTRY = []
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in (*zip(names, values), *extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """Monotonic counter with labels, rendered in the Prometheus text format."""
+
+    kind = "counter"
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(label, "")) for label in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def values(self):
+        with self._lock:
+            return dict(self._values)
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+    @staticmethod
+    def merge(value, other):
+        return value + other
+
+    def samples(self, values=None):
+        values = self.values() if values is None else values
+        for key, value in sorted(values.items()):
+            yield f"{self.name}{_format_labels(self.labels, key)} {value}"
+
+
+class Histogram:
+    """Cumulative-bucket histogram with labels, rendered in the Prometheus text format."""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(label, "")) for label in self.labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    def values(self):
+        with self._lock:
+            return {key: (list(counts), total) for key, (counts, total) in self._values.items()}
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+    @staticmethod
+    def merge(value, other):
+        return [a + b for a, b in zip(value[0], other[0])], value[1] + other[1]
+
+    def samples(self, values=None):
+        values = self.values() if values is None else values
+        for key, (counts, total) in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                yield f"{self.name}_bucket{_format_labels(self.labels, key, [('le', bound)])} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labels, key)} {total}"
+            yield f"{self.name}_count{_format_labels(self.labels, key)} {cumulative}"
+
+
+def _snapshot_path(pid=None):
+    return os.path.join(METRICS_DIR, f"metrics-{pid or os.getpid()}.json")
+
+
+def _read_snapshot(path):
+    # ({metric name: {label values: value}}, pid last folded in); a snapshot removed meanwhile reads as empty
+    try:
+        with open(path) as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError):
+        return {}, None
+    metrics = {name: {tuple(key): value for key, value in items} for name, items in snapshot["metrics"].items()}
+    return metrics, snapshot.get("retired")
+
+
+def _write_snapshot(path, metrics, retired=None):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump({"metrics": {name: [[list(key), value] for key, value in values.items()]
+                               for name, values in metrics.items()},
+                   "retired": retired}, f)
+    os.replace(tmp, path)
+
+
+def _merge_snapshots(snapshots):
+    merged = {metric.name: {} for metric in REGISTRY}
+    kinds = {metric.name: metric for metric in REGISTRY}
+    for snapshot in snapshots:
+        for name, values in snapshot.items():
+            if name not in kinds:
+                continue
+            for key, value in values.items():
+                current = merged[name].get(key)
+                merged[name][key] = value if current is None else kinds[name].merge(current, value)
+    return merged
+
+
+def flush_metrics():
+    """Write this process's samples to METRICS_DIR, replacing its previous snapshot."""
+    if METRICS_DIR:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        _write_snapshot(_snapshot_path(), {metric.name: metric.values() for metric in REGISTRY})
+
+
+def start_metrics_flusher(interval=METRICS_FLUSH_INTERVAL):
+    """Start counting from zero in a freshly forked worker and snapshot it every ``interval`` seconds."""
+    if not METRICS_DIR:
+        return
+    # Samples inherited from the master would otherwise be counted once per worker
+    for metric in REGISTRY:
+        metric.reset()
+
+    def flush_forever():
+        while True:
+            time.sleep(interval)
+            flush_metrics()
+
+    threading.Thread(target=flush_forever, name="metrics-flusher", daemon=True).start()
+
+
+def clear_metrics_dir():
+    """Forget every snapshot; the gunicorn master calls this once before it forks the first workers."""
+    if METRICS_DIR:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        for path in glob.glob(os.path.join(METRICS_DIR, "metrics-*")):
+            os.remove(path)
+
+
+def retire_metrics(pid):
+    """Fold an exited worker's snapshot into the retired totals; run by the gunicorn master only."""
+    if not METRICS_DIR:
+        return
+    path = _snapshot_path(pid)
+    if not os.path.exists(path):
+        return
+    retired = os.path.join(METRICS_DIR, RETIRED_SNAPSHOT)
+    # The retired totals name the pid they took in, so a scrape between the two steps skips its snapshot
+    _write_snapshot(retired, _merge_snapshots([_read_snapshot(retired)[0], _read_snapshot(path)[0]]), pid)
+    os.remove(path)
+
+
+def render_metrics():
+    """All registered metrics in the Prometheus text exposition format.
+
+    With METRICS_DIR set these are the sums over every worker snapshot there,
+    including workers that have since exited.
+    """
+    merged = None
+    if METRICS_DIR:
+        flush_metrics()
+        retired, retired_pid = _read_snapshot(os.path.join(METRICS_DIR, RETIRED_SNAPSHOT))
+        skip = {os.path.join(METRICS_DIR, RETIRED_SNAPSHOT), retired_pid and _snapshot_path(retired_pid)}
+        snapshots = [_read_snapshot(path)[0] for path in glob.glob(os.path.join(METRICS_DIR, "metrics-*.json"))
+                     if path not in skip]
+        merged = _merge_snapshots([retired, *snapshots])
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.samples(None if merged is None else merged[metric.name]))
+    return "\n".join(lines) + "\n"
+
+
+# Content type Prometheus expects for the text format
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DOCUMENTS = Counter(
+    "extraction_documents_total", "Documents analysed, by detected type and outcome",
+    ("document_type", "outcome"),
+)
+DOCUMENT_SECONDS = Histogram(
+    "extraction_document_seconds", "Wall time to analyse one document, by detected type",
+    ("document_type",),
+)
+STAGE_SECONDS = Histogram(
+    "extraction_stage_seconds", "Time spent per pipeline stage and backend model",
+    ("stage", "model"),
+)
+AZURE_CALLS = Counter(
+    "extraction_azure_calls_total", "Form Recognizer analyze calls actually sent, by document type and model",
+    ("document_type", "model"),
+)
+LLM_TOKENS = Counter(
+    "extraction_llm_tokens_total", "Chat completion tokens billed, by document type, model and kind",
+    ("document_type", "model", "kind"),
+)
+MODEL_TIERS = Counter(
+    "extraction_model_tier_total", "Routed LLM answers per task, ladder tier and model, by outcome",
+    ("task", "tier", "model", "outcome"),
+)
+SPECULATIVE_TASKS = Counter(
+    "extraction_speculative_tasks_total", "Backend calls the async engine started before classification, by outcome",
+    ("outcome",),
+)
+CACHE_LOOKUPS = Counter(
+    "extraction_result_cache_lookups_total", "Result cache lookups, by outcome (hit or miss)",
+    ("outcome",),
+)
+REJECTIONS = Counter(
+    "extraction_rejected_total", "Work refused with a 503 by admission control or an exhausted backend quota",
+    ("reason",),
+)
@@ -0,0 +1,88 @@
+import io
+
+from PIL import Image
+
+from .document_context import DocumentContext
+from .document_types import UNKNOWN
+
+# Pages with less extractable text than this are treated as scans
+SCANNED_TEXT_CHARS = 20
+
+
+def is_pdf(content):
+    return content.startswith(b"%PDF")
+
+
+def scanned_page_image(page):
+    # The largest embedded image of a scanned page, None if it is not one we can hand on
+    if len((page.extract_text() or "").strip()) >= SCANNED_TEXT_CHARS:
+        return None
+    try:
+        images = page.images
+    except Exception:  # PyPDF2 cannot decode every image filter; fall back to the page PDF
+        return None
+    if not images:
+        return None
+    data = max(images, key=lambda image: len(image.data)).data
+    try:
+        Image.open(io.BytesIO(data)).verify()
+    except (OSError, SyntaxError):
+        return None
+    return data
+
+
+def single_page_pdf(page):
+    from PyPDF2 import PdfWriter
+
+    writer = PdfWriter()
+    writer.add_page(page)
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def split_pdf(content):
+    """Split a PDF into one ``bytes`` per page.
+
+    Scanned pages become their embedded image, which both Azure and the
+    vision prompts accept; pages with real text stay single-page PDFs.
+    """
+    # PyPDF2 is only imported for PDFs
+    from PyPDF2 import PdfReader
+
+    reader = PdfReader(io.BytesIO(content))
+    return [scanned_page_image(page) or single_page_pdf(page) for page in reader.pages]
+
+
+def page_documents(document):
+    """The documents to analyse for ``document``: itself, or one per PDF page."""
+    if not is_pdf(document.content):
+        return [document]
+    try:
+        pages = split_pdf(document.content)
+    except Exception:  # a PDF PyPDF2 cannot read still goes to Azure whole, as before the split
+        return [document]
+    return [
+        DocumentContext(f"{document.url}#page={number}" if document.url else None,
+                        document.client, content=content, cache=document.cache)
+        for number, content in enumerate(pages, 1)
+    ]
+
+
+def merge_page_results(page_results):
+    """Fold per-page ``(document_type, details)`` results, or exceptions, into one.
+
+    Returns the distinct page types joined in page order and a list with one
+    entry per page.
+    """
+    pages = []
+    document_types = []
+    for number, result in enumerate(page_results, 1):
+        if isinstance(result, BaseException):
+            pages.append({"page": number, "error": str(result)})
+            continue
+        document_type, document_details = result
+        pages.append({"page": number, "document_type": document_type, "document_details": document_details})
+        if document_type != UNKNOWN and document_type not in document_types:
+            document_types.append(document_type)
+    return ", ".join(document_types) or UNKNOWN, pages
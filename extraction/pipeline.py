@@ -0,0 +1,114 @@
+import contextvars
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from .chat import get_chat_completion
+from .classification import AUTO, identify_document_type
+from .clients import get_document_analysis_client
+from .document_context import DocumentContext
+from .field_rules import missing_cheque_fields, resolve_cheque_fields
+from .pdf_pages import merge_page_results, page_documents
+from .records import cheque_record, parse_record
+from .registry import CHEQUE_TEXT, IMAGE, UNKNOWN_DOCUMENT_DETAILS, cheque_prompt, get_document_type, vision_prompt
+from .routing import route
+from .tracing import request_trace, set_document_type
+
+# Separate pool for the pages of multi-page PDFs, so documents waiting on their pages never starve them
+PAGE_WORKERS = int(os.getenv("PAGE_WORKERS", "8"))
+page_executor = ThreadPoolExecutor(max_workers=PAGE_WORKERS, thread_name_prefix="page")
+
+
+def analyze_document(document_url, mode=AUTO):
+    # Download the document once; every analyze call and prompt below reuses the bytes
+    document = DocumentContext(document_url, get_document_analysis_client())
+    return analyze_document_context(document, mode)
+
+
+def analyze_document_context(document, mode=AUTO):
+    # mode is one of extraction.classification.CLASSIFICATION_MODES.
+    # Every span, Azure call and token below is attributed to this document
+    with request_trace(document.url) as trace:
+        document_type, document_details = analyze_pages(document, mode)
+        trace.document_type = document_type
+    return document_type, document_details
+
+
+def analyze_pages(document, mode=AUTO):
+    # KYC bundles arrive as one PDF with a page per document; those pages are analysed in parallel
+    pages = page_documents(document)
+    if len(pages) == 1:
+        return analyze_page(pages[0], mode)
+
+    # Page threads run in a copy of this context so they report into the same trace
+    futures = [page_executor.submit(contextvars.copy_context().run, analyze_page, page, mode) for page in pages]
+    page_results = []
+    for future in futures:
+        try:
+            page_results.append(future.result())
+        except Exception as exc:
+            page_results.append(exc)
+    return merge_page_results(page_results)
+
+
+def analyze_page(document, mode=AUTO):
+    # prebuilt-read alone for cheques, else one pass over prebuilt-document, escalating to
+    # prebuilt-idDocument only if needed
+    document_type = identify_document_type(document, mode)
+    set_document_type(document_type)
+
+    spec = get_document_type(document_type)
+    if spec is None:
+        print("Document type is unknown")
+        return document_type, dict(UNKNOWN_DOCUMENT_DETAILS)
+    print(f"Given document is {spec.description}")
+    return document_type, extract_details(document, spec)
+
+
+def extract_details(document, spec, api_key=None):
+    """Run the registered extraction for ``spec`` and return its record."""
+    api_key = api_key or os.getenv("OPENAI_API_KEY")
+    return EXTRACTORS[spec.source](document, spec, api_key)
+
+
+def extract_from_image(document, spec, api_key):
+    # data: URL of the already downloaded document, base64-encoded as the request is sent
+    image_url = document.data_url()
+    prompt = spec.render_prompt()
+
+    # Walk the model ladder until the answer passes the type's validation
+    def attempt(rung):
+        message_content = get_chat_completion(spec.payload(prompt, rung.model, image_url), api_key, document, prompt)
+        return parse_record(spec.record_type, message_content)
+
+    return route(spec.task, spec.models, attempt, spec.accepted) or spec.record_type()
+
+
+def extract_cheque(document, spec, api_key):
+    extracted_text = document.analyze("prebuilt-read").content
+
+    # IFSC, account number and MICR line are read by rules; the LLM only fills the gaps
+    # and bank / branch names come from the offline IFSC index when it is built
+    fields = resolve_cheque_fields(extracted_text)
+    missing_fields = missing_cheque_fields(fields)
+    if not missing_fields:
+        return cheque_record(fields)
+
+    prompt = cheque_prompt(spec, extracted_text, fields, missing_fields)
+
+    # Cheapest model first, on the text alone; the image is only sent on a vision rung
+    def attempt(rung):
+        if not rung.vision:
+            llm_details = get_chat_completion(spec.payload(prompt, rung.model), api_key, document, prompt)
+        else:
+            try:
+                image_url = document.data_url()
+            except ValueError:  # text-only PDF page, nothing to show the model
+                return None
+            llm_details = get_chat_completion(spec.payload(vision_prompt(prompt), rung.model, image_url),
+                                              api_key, document, vision_prompt(prompt))
+        return cheque_record(fields, parse_record(spec.record_type, llm_details))
+
+    return route(spec.task, spec.models, attempt, spec.accepted) or cheque_record(fields)
+
+
+EXTRACTORS = {IMAGE: extract_from_image, CHEQUE_TEXT: extract_cheque}
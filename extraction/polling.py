@@ -0,0 +1,151 @@
+import io
+import os
+import threading
+import time
+
+from azure.core.polling.async_base_polling import AsyncLROBasePolling
+from azure.core.polling.base_polling import LROBasePolling
+from azure.core.utils import case_insensitive_dict
+from PyPDF2 import PdfReader
+
+# Set AZURE_ADAPTIVE_POLLING=0 to fall back to the SDK's fixed interval (5 s unless Retry-After)
+AZURE_ADAPTIVE_POLLING = os.getenv("AZURE_ADAPTIVE_POLLING", "1") == "1"
+# First poll when nothing is known about the model yet, and the start of the backoff after it
+AZURE_POLL_FIRST = float(os.getenv("AZURE_POLL_FIRST", "0.25"))
+AZURE_POLL_MIN = float(os.getenv("AZURE_POLL_MIN", "0.1"))
+AZURE_POLL_MAX = float(os.getenv("AZURE_POLL_MAX", "5"))
+AZURE_POLL_BACKOFF = float(os.getenv("AZURE_POLL_BACKOFF", "1.5"))
+# Weight of the newest observation in the per-model completion time average
+AZURE_POLL_SMOOTHING = float(os.getenv("AZURE_POLL_SMOOTHING", "0.2"))
+# With history, the first poll lands just before the expected completion
+FIRST_POLL_FRACTION = 0.9
+# Page counts above this share one estimate
+MAX_PAGE_BUCKET = 8
+
+
+class CompletionTimes:
+    """Moving average of how long analyses take, per model id and page count."""
+
+    def __init__(self, smoothing=AZURE_POLL_SMOOTHING):
+        self.smoothing = smoothing
+        self._estimates = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(model_id, pages):
+        return model_id, min(max(pages, 1), MAX_PAGE_BUCKET)
+
+    def estimate(self, model_id, pages=1):
+        with self._lock:
+            return self._estimates.get(self._key(model_id, pages))
+
+    def observe(self, model_id, pages, seconds):
+        key = self._key(model_id, pages)
+        with self._lock:
+            previous = self._estimates.get(key)
+            self._estimates[key] = seconds if previous is None else (
+                previous + self.smoothing * (seconds - previous)
+            )
+
+    def snapshot(self):
+        with self._lock:
+            return {f"{model_id}/{pages}": seconds for (model_id, pages), seconds in self._estimates.items()}
+
+
+# Shared by every poller in the process
+completion_times = CompletionTimes()
+
+
+def _retry_after(pipeline_response):
+    headers = case_insensitive_dict(pipeline_response.http_response.headers)
+    value = headers.get("retry-after")
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+class _AdaptiveDelay:
+    """Poll schedule shared by the sync and async polling methods.
+
+    The first poll waits for the expected completion time of this model and
+    page count (``AZURE_POLL_FIRST`` without history); later polls back off
+    exponentially from ``AZURE_POLL_FIRST`` up to ``AZURE_POLL_MAX``. A
+    Retry-After from the service caps the delay but never stretches it.
+    """
+
+    def _setup(self, model_id, pages, times):
+        self._model_id = model_id
+        self._pages = pages
+        self._times = times if times is not None else completion_times
+        self._polls = 0
+        self._started = None
+
+    def _start_clock(self):
+        self._started = time.monotonic()
+
+    def _extract_delay(self):
+        if self._polls == 0:
+            estimate = self._times.estimate(self._model_id, self._pages)
+            delay = AZURE_POLL_FIRST if estimate is None else estimate * FIRST_POLL_FRACTION
+        else:
+            delay = AZURE_POLL_FIRST * AZURE_POLL_BACKOFF ** (self._polls - 1)
+        self._polls += 1
+        retry_after = _retry_after(self._pipeline_response)
+        if retry_after:
+            delay = min(delay, retry_after)
+        return min(max(delay, AZURE_POLL_MIN), AZURE_POLL_MAX)
+
+    def _record_completion(self):
+        if self._started is not None and self.status().lower() == "succeeded":
+            self._times.observe(self._model_id, self._pages, time.monotonic() - self._started)
+
+
+class AdaptivePolling(_AdaptiveDelay, LROBasePolling):
+    """``polling=`` method for DocumentAnalysisClient.begin_analyze_document*."""
+
+    def __init__(self, model_id, pages=1, times=None, **kwargs):
+        super().__init__(timeout=AZURE_POLL_FIRST, **kwargs)
+        self._setup(model_id, pages, times)
+
+    def initialize(self, client, initial_response, deserialization_callback):
+        super().initialize(client, initial_response, deserialization_callback)
+        self._start_clock()
+
+    def run(self):
+        super().run()
+        self._record_completion()
+
+
+class AsyncAdaptivePolling(_AdaptiveDelay, AsyncLROBasePolling):
+    """``polling=`` method for the aio DocumentAnalysisClient."""
+
+    def __init__(self, model_id, pages=1, times=None, **kwargs):
+        super().__init__(timeout=AZURE_POLL_FIRST, **kwargs)
+        self._setup(model_id, pages, times)
+
+    def initialize(self, client, initial_response, deserialization_callback):
+        super().initialize(client, initial_response, deserialization_callback)
+        self._start_clock()
+
+    async def run(self):
+        await super().run()
+        self._record_completion()
+
+
+def page_count(content):
+    # Images are one page; PDFs are counted without parsing their content streams
+    if not content or not content.startswith(b"%PDF"):
+        return 1
+    try:
+        return len(PdfReader(io.BytesIO(content)).pages)
+    except Exception:  # a PDF PyPDF2 cannot read still gets analysed; just estimate it as one page
+        return 1
+
+
+def polling_options(model_id, content=None, asynchronous=False):
+    """Keyword arguments to pass to ``begin_analyze_document*`` for adaptive polling."""
+    if not AZURE_ADAPTIVE_POLLING:
+        return {}
+    polling_type = AsyncAdaptivePolling if asynchronous else AdaptivePolling
+    return {"polling": polling_type(model_id, page_count(content))}
@@ -0,0 +1,51 @@
+# Prompt templates and chat completions payloads; extraction.registry binds them to document types
+AADHAR_PAN_PROMPT = "Extract the Aadhaar / PAN card fields from the image. Use null for anything not printed on the card and DD/MM/YYYY for dates."
+RATION_CARD_PROMPT = "Extract the ration card fields and every listed family member from the image. Use null for anything not printed on the card."
+CHEQUE_PROMPT = """Fill in {requested_fields} from the cheque text in triple quotes. Already known: {known_fields}. Use null for anything not in the text.
+
+'''{extracted_text}'''
+"""
+# Appended when a text prompt escalates to a model that is also shown the document image
+VISION_HINT = " The document image is attached; read it where the text is unclear."
+
+# Output budgets for the structured records; the schemas leave no room for preamble
+IDENTITY_MAX_TOKENS = 200
+RATION_CARD_MAX_TOKENS = 400
+CHEQUE_MAX_TOKENS = 150
+
+
+def structured(payload, response_format, max_tokens):
+    # Schema-constrained, deterministic output of at most max_tokens
+    payload["response_format"] = response_format
+    payload["max_tokens"] = max_tokens
+    payload["temperature"] = 0
+    return payload
+
+
+def vision_payload(prompt, image_url, model="gpt-4o", max_tokens=500):
+    # image_url is usually DocumentContext.data_url(), streamed when the request is sent
+    return {
+        "model": model,
+        "messages": [
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "text",
+                        "text": prompt
+                    },
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": image_url
+                        }
+                    }
+                ]
+            }
+        ],
+        "max_tokens": max_tokens
+    }
+
+
+def text_payload(prompt, model="gpt-4o"):
+    return {"model": model, "messages": [{"role": "user", "content": prompt}]}
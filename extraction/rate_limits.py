@@ -0,0 +1,402 @@
+import asyncio
+import collections
+import contextlib
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+from .metrics import REJECTIONS
+from .tracing import span
+
+# Quotas as "model=limit,..."; "*" is shared by every call to that backend, and a model without
+# its own entry only draws on "*". Every process on the host using RATE_LIMIT_PATH draws on the
+# same buckets; divide the resource quotas by the number of hosts sharing them.
+# Form Recognizer S0 allows 15 analyze requests per second per resource; 12 plus the burst stays under it
+AZURE_RATE_LIMITS = os.getenv("AZURE_RATE_LIMITS", "*=12")
+# Chat completion requests and tokens per minute, per model, e.g. "gpt-4o=30000,gpt-4o-mini=200000".
+# They depend on the account's usage tier, so they are left unlimited unless configured
+OPENAI_REQUEST_LIMITS = os.getenv("OPENAI_REQUEST_LIMITS", "")
+OPENAI_TOKEN_LIMITS = os.getenv("OPENAI_TOKEN_LIMITS", "")
+# Seconds of quota that may be spent at once after an idle spell
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", "0.25"))
+# A call that would have to wait longer than this for quota fails with RateLimited instead
+RATE_LIMIT_MAX_WAIT = float(os.getenv("RATE_LIMIT_MAX_WAIT", "30"))
+RATE_LIMITING = os.getenv("RATE_LIMITING", "1") == "1"
+# SQLite file holding the bucket balances shared by gunicorn workers and worker.py processes;
+# set it empty to give each process its own buckets
+RATE_LIMIT_PATH = os.getenv("RATE_LIMIT_PATH", os.path.join(".cache", "rate_limits.sqlite3"))
+
+# Documents analysed at once by the HTTP endpoints, per process; further requests queue per tenant.
+# A queued request waits in one of gunicorn's WEB_THREADS, so by default half of them run documents
+# and the other half hold the fair queue; with as many slots as threads nothing would ever queue here
+MAX_IN_FLIGHT = int(os.getenv("MAX_IN_FLIGHT", str(max(1, int(os.getenv("WEB_THREADS", "8")) // 2))))
+# Requests a single tenant may have waiting for a slot; the next one is answered 503 straight away
+TENANT_QUEUE_LIMIT = int(os.getenv("TENANT_QUEUE_LIMIT", "16"))
+# Seconds a queued request waits for a slot before it is answered 503
+ADMISSION_TIMEOUT = float(os.getenv("ADMISSION_TIMEOUT", "10"))
+
+# What gpt-4o bills for one high-detail image, near enough for a 1-2 MP scan
+IMAGE_TOKENS = 765
+
+
+class Overloaded(RuntimeError):
+    """Raised instead of queueing work that cannot start soon; answered 503 with Retry-After."""
+
+    def __init__(self, message, retry_after=1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class RateLimited(Overloaded):
+    """A backend quota is spent for longer than RATE_LIMIT_MAX_WAIT."""
+
+
+class BucketStore:
+    """SQLite file of token bucket balances, so several processes draw on one quota."""
+
+    def __init__(self, path=RATE_LIMIT_PATH):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = self._connect()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+        )
+        return conn
+
+    def close(self):
+        # SQLite connections must not cross fork(): close before forking, reopen() in the child
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def reopen(self):
+        with self._lock:
+            if self._conn is None:
+                self._conn = self._connect()
+
+    def update(self, name, rate, capacity, change):
+        """Refill bucket ``name``, replace its balance with ``change(tokens) -> (tokens, result)``, return result."""
+        # Wall-clock time, since the balance is shared with other processes
+        now = time.time()
+        with self._lock:
+            # IMMEDIATE takes the write lock up front, so two processes never spend the same tokens
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT tokens, updated FROM buckets WHERE name = ?", (name,)).fetchone()
+                tokens = capacity if row is None else min(capacity, row[0] + max(0.0, now - row[1]) * rate)
+                tokens, result = change(tokens)
+                self._conn.execute("INSERT OR REPLACE INTO buckets (name, tokens, updated) VALUES (?, ?, ?)",
+                                   (name, tokens, now))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return result
+
+
+class TokenBucket:
+    """Token bucket refilled at ``rate`` per second, holding at most ``capacity``.
+
+    ``reserve`` takes the tokens straight away, letting the balance go
+    negative, and returns how long the caller must wait before using them;
+    callers are therefore served in the order they reserved. With a
+    ``store`` the balance lives there under ``name`` instead of in memory.
+    """
+
+    def __init__(self, rate, capacity=None, store=None, name=None):
+        self.rate = rate
+        self.capacity = max(capacity or rate, 1.0)
+        self.store = store
+        self.name = name
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _update(self, change):
+        if self.store is not None:
+            return self.store.update(self.name, self.rate, self.capacity, change)
+        with self._lock:
+            now = time.monotonic()
+            tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._tokens, result = change(tokens)
+            self._updated = now
+            return result
+
+    def _wait(self, amount, tokens):
+        return max(0.0, (min(amount, self.capacity) - tokens) / self.rate)
+
+    def reserve(self, amount, max_wait):
+        # Seconds to wait before ``amount`` may be spent, or None (nothing taken) beyond ``max_wait``.
+        # More than ``capacity`` goes through once the bucket is full and is paid off afterwards
+        def take(tokens):
+            wait = self._wait(amount, tokens)
+            if wait > max_wait:
+                return tokens, None
+            return tokens - amount, wait
+
+        return self._update(take)
+
+    def refund(self, amount):
+        self._update(lambda tokens: (min(self.capacity, tokens + amount), None))
+
+    def wait_time(self, amount=1):
+        return self._update(lambda tokens: (tokens, self._wait(amount, tokens)))
+
+
+def parse_limits(spec, period):
+    """``"gpt-4o=30000,*=100000"`` -> {model: limit per second}, for limits given per ``period`` seconds."""
+    limits = {}
+    for item in spec.split(","):
+        if item.strip():
+            model, limit = item.split("=")
+            limits[model.strip()] = float(limit) / period
+    return limits
+
+
+def estimate_tokens(payload):
+    # OpenAI counts prompt tokens plus max_tokens against the quota when the request arrives
+    tokens = payload.get("max_tokens") or 0
+    for message in payload["messages"]:
+        content = message["content"]
+        for part in [content] if isinstance(content, str) else content:
+            if isinstance(part, str):
+                tokens += len(part) // 4 + 1
+            elif part.get("type") == "text":
+                tokens += len(part["text"]) // 4 + 1
+            elif part.get("type") == "image_url":
+                tokens += IMAGE_TOKENS
+    return tokens
+
+
+class RateLimiter:
+    """Token buckets for every Azure model and OpenAI model quota, kept in ``store`` if given."""
+
+    def __init__(self, azure=AZURE_RATE_LIMITS, openai_requests=OPENAI_REQUEST_LIMITS,
+                 openai_tokens=OPENAI_TOKEN_LIMITS, burst=RATE_LIMIT_BURST, max_wait=RATE_LIMIT_MAX_WAIT,
+                 store=None):
+        self.max_wait = max_wait
+        self.store = store
+        self._buckets = {
+            (backend, model): TokenBucket(rate, rate * burst, store, f"{backend}:{model}")
+            for backend, spec, period in (("azure", azure, 1), ("openai_requests", openai_requests, 60),
+                                          ("openai_tokens", openai_tokens, 60))
+            for model, rate in parse_limits(spec, period).items()
+        }
+
+    def _reserve(self, backend, model, amount):
+        buckets = [bucket for bucket in (self._buckets.get((backend, "*")), self._buckets.get((backend, model)))
+                   if bucket is not None]
+        reserved = []
+        longest = 0.0
+        for bucket in buckets:
+            wait = bucket.reserve(amount, self.max_wait)
+            if wait is None:
+                # All or nothing, so a refused call does not eat into the other quota
+                for taken in reserved:
+                    taken.refund(amount)
+                REJECTIONS.inc(reason=f"{backend}_quota")
+                raise RateLimited(f"{backend} quota for {model} exhausted", bucket.wait_time(amount))
+            reserved.append(bucket)
+            longest = max(longest, wait)
+        return longest
+
+    def azure_delay(self, model_id):
+        """Seconds to wait before the next analyze call to ``model_id``; raises RateLimited past max_wait."""
+        return self._reserve("azure", model_id, 1)
+
+    def openai_delay(self, model, tokens):
+        """Seconds to wait before a completion of about ``tokens`` tokens; raises RateLimited past max_wait."""
+        wait = self._reserve("openai_requests", model, 1)
+        try:
+            return max(wait, self._reserve("openai_tokens", model, tokens))
+        except RateLimited:
+            self.refund("openai_requests", model, 1)
+            raise
+
+    def refund(self, backend, model, amount):
+        for key in ((backend, "*"), (backend, model)):
+            if key in self._buckets:
+                self._buckets[key].refund(amount)
+
+    def close(self):
+        if self.store is not None:
+            self.store.close()
+
+    def reopen(self):
+        if self.store is not None:
+            self.store.reopen()
+
+    def settle_tokens(self, model, estimated, usage):
+        # Hand back what the estimate over-reserved once the real usage is known
+        actual = (usage or {}).get("total_tokens")
+        if actual is not None and actual < estimated:
+            self.refund("openai_tokens", model, estimated - actual)
+
+
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    """Process-wide RateLimiter, sharing RATE_LIMIT_PATH with other processes; None with RATE_LIMITING=0."""
+    global _rate_limiter
+    if not RATE_LIMITING:
+        return None
+    if _rate_limiter is None:
+        with _rate_limiter_lock:
+            if _rate_limiter is None:
+                _rate_limiter = RateLimiter(store=BucketStore(RATE_LIMIT_PATH) if RATE_LIMIT_PATH else None)
+    return _rate_limiter
+
+
+def throttle_azure(model_id):
+    # Blocks until the Azure quota allows one more analyze call
+    limiter = get_rate_limiter()
+    if limiter is not None:
+        wait = limiter.azure_delay(model_id)
+        if wait:
+            with span("azure_throttle", model_id):
+                time.sleep(wait)
+
+
+async def athrottle_azure(model_id):
+    limiter = get_rate_limiter()
+    if limiter is not None:
+        # A shared bucket is a SQLite write, kept off the event loop
+        wait = await asyncio.to_thread(limiter.azure_delay, model_id)
+        if wait:
+            with span("azure_throttle", model_id):
+                await asyncio.sleep(wait)
+
+
+def throttle_openai(payload):
+    """Block until the model's request and token quotas allow ``payload``; returns the tokens reserved."""
+    limiter = get_rate_limiter()
+    if limiter is None:
+        return 0
+    tokens = estimate_tokens(payload)
+    wait = limiter.openai_delay(payload["model"], tokens)
+    if wait:
+        with span("llm_throttle", payload["model"]):
+            time.sleep(wait)
+    return tokens
+
+
+async def athrottle_openai(payload):
+    limiter = get_rate_limiter()
+    if limiter is None:
+        return 0
+    tokens = estimate_tokens(payload)
+    wait = await asyncio.to_thread(limiter.openai_delay, payload["model"], tokens)
+    if wait:
+        with span("llm_throttle", payload["model"]):
+            await asyncio.sleep(wait)
+    return tokens
+
+
+def settle_openai(payload, reserved, usage):
+    limiter = get_rate_limiter()
+    if limiter is not None and reserved:
+        limiter.settle_tokens(payload["model"], reserved, usage)
+
+
+def refund_openai(payload, reserved):
+    # A rejected attempt (429, 5xx) spent no tokens, so its whole reservation goes back
+    settle_openai(payload, reserved, {"total_tokens": 0})
+
+
+def tenant_key(tenant_id=None, api_key=None):
+    # API keys are hashed so they never end up in logs or error messages
+    if tenant_id:
+        return tenant_id
+    if api_key:
+        return "key:" + hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:12]
+    return "anonymous"
+
+
+class FairAdmission:
+    """Admission control for the HTTP endpoints: ``slots`` requests run at once.
+
+    Requests beyond that queue per tenant and are let in round-robin across
+    tenants, so one client's burst cannot starve the others. A tenant with
+    ``queue_limit`` requests already waiting, or a request still waiting
+    after ``timeout`` seconds, gets Overloaded (a 503) instead.
+    """
+
+    def __init__(self, slots=MAX_IN_FLIGHT, queue_limit=TENANT_QUEUE_LIMIT, timeout=ADMISSION_TIMEOUT):
+        self.slots = slots
+        self.queue_limit = queue_limit
+        self.timeout = timeout
+        self.active = 0
+        self._waiting = {}
+        # Tenants with waiting requests, in the order they are next served
+        self._turns = collections.deque()
+        self._lock = threading.Lock()
+
+    def _reject(self, tenant, message):
+        REJECTIONS.inc(reason="admission")
+        raise Overloaded(f"{message} for tenant {tenant}", retry_after=max(1.0, self.timeout / 2))
+
+    def _acquire(self, tenant):
+        with self._lock:
+            if self.active < self.slots and not self._turns:
+                self.active += 1
+                return
+            queue = self._waiting.setdefault(tenant, collections.deque())
+            if len(queue) >= self.queue_limit:
+                self._reject(tenant, "Too many queued requests")
+            admitted = threading.Event()
+            queue.append(admitted)
+            if len(queue) == 1:
+                self._turns.append(tenant)
+
+        with span("admission_queue"):
+            granted = admitted.wait(self.timeout)
+        if granted:
+            return
+        with self._lock:
+            # The slot may have been handed over between the timeout and taking the lock
+            if admitted.is_set():
+                return
+            queue = self._waiting[tenant]
+            queue.remove(admitted)
+            if not queue:
+                del self._waiting[tenant]
+                self._turns.remove(tenant)
+        self._reject(tenant, "Timed out waiting for capacity")
+
+    def _release(self):
+        with self._lock:
+            if not self._turns:
+                self.active -= 1
+                return
+            # The slot passes straight to the next tenant in turn, which goes to the back of the line
+            tenant = self._turns.popleft()
+            queue = self._waiting[tenant]
+            queue.popleft().set()
+            if queue:
+                self._turns.append(tenant)
+            else:
+                del self._waiting[tenant]
+
+    @contextlib.contextmanager
+    def admit(self, tenant):
+        self._acquire(tenant)
+        try:
+            yield
+        finally:
+            self._release()
+
+    def stats(self):
+        with self._lock:
+            return {"active": self.active, "slots": self.slots,
+                    "queued": {tenant: len(queue) for tenant, queue in self._waiting.items()}}
@@ -0,0 +1,175 @@
+import dataclasses
+import functools
+import json
+import re
+import typing
+from dataclasses import dataclass, field
+
+from .field_rules import is_valid_aadhar, is_valid_ifsc, is_valid_pan
+
+
+class RecordValidationError(ValueError):
+    pass
+
+
+@dataclass(slots=True)
+class IdentityRecord:
+    """Aadhaar / PAN card fields."""
+    name: str | None = None
+    aadhar_number: str | None = None
+    pan_number: str | None = None
+    date_of_birth: str | None = None
+    fathers_name: str | None = None
+    address: str | None = None
+
+
+@dataclass(slots=True)
+class RationCardMember:
+    name: str | None = None
+    relationship: str | None = None
+    age: str | None = None
+
+
+@dataclass(slots=True)
+class RationCardRecord:
+    ration_card_number: str | None = None
+    fsc_reference_number: str | None = None
+    consumer_number: str | None = None
+    card_type: str | None = None
+    fps_shop_number: str | None = None
+    members: list[RationCardMember] = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class ChequeRecord:
+    bank_name: str | None = None
+    branch_name: str | None = None
+    ifsc_code: str | None = None
+    account_number: str | None = None
+    cheque_number: str | None = None
+    micr_code: str | None = None
+    transaction_code: str | None = None
+
+
+# Labels used by extraction.field_rules for the cheque record fields
+CHEQUE_RULE_FIELDS = {
+    "Bank Name": "bank_name",
+    "Branch Name": "branch_name",
+    "IFSC Code": "ifsc_code",
+    "Account Number": "account_number",
+    "Cheque Number": "cheque_number",
+    "MICR Code": "micr_code",
+    "Transaction Code": "transaction_code",
+}
+
+
+@functools.cache
+def _record_fields(record_type):
+    # Resolved once per record type, the validator runs on every completion
+    hints = typing.get_type_hints(record_type)
+    return [(record_field.name, hints[record_field.name]) for record_field in dataclasses.fields(record_type)]
+
+
+def _member_type(annotation):
+    # list[Record] -> Record, anything else -> None
+    if typing.get_origin(annotation) is list:
+        return typing.get_args(annotation)[0]
+    return None
+
+
+def json_schema(record_type):
+    """Strict JSON schema for a record: every key required, unknown values as null."""
+    properties = {}
+    for name, annotation in _record_fields(record_type):
+        member_type = _member_type(annotation)
+        if member_type is not None:
+            properties[name] = {"type": "array", "items": json_schema(member_type)}
+        else:
+            properties[name] = {"type": ["string", "null"]}
+    return {
+        "type": "object",
+        "properties": properties,
+        "required": list(properties),
+        "additionalProperties": False,
+    }
+
+
+def response_format(record_type):
+    # Structured outputs: the model can only produce JSON matching the schema
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": record_type.__name__, "strict": True, "schema": json_schema(record_type)},
+    }
+
+
+def _build(record_type, data):
+    if not isinstance(data, dict):
+        raise RecordValidationError(f"{record_type.__name__}: expected an object")
+    values = {}
+    for name, annotation in _record_fields(record_type):
+        value = data.get(name)
+        member_type = _member_type(annotation)
+        if member_type is not None:
+            if not isinstance(value or [], list):
+                raise RecordValidationError(f"{record_type.__name__}.{name}: expected a list")
+            values[name] = [_build(member_type, item) for item in value or []]
+        elif value is None or value == "":
+            values[name] = None
+        elif isinstance(value, (str, int, float)):
+            values[name] = str(value).strip()
+        else:
+            raise RecordValidationError(f"{record_type.__name__}.{name}: expected a string")
+    return record_type(**values)
+
+
+def _checked(value, is_valid, normalise=lambda value: value):
+    # Identifiers that fail their checksum / format are dropped rather than passed on misread
+    if value is None:
+        return None
+    value = normalise(value)
+    return value if is_valid(value) else None
+
+
+def _compact(value):
+    return re.sub(r"[\s-]", "", value).upper()
+
+
+def validate_record(record):
+    """Normalise identifier fields and drop the ones that fail their format checks."""
+    if isinstance(record, IdentityRecord):
+        record.aadhar_number = _checked(record.aadhar_number, is_valid_aadhar, _compact)
+        record.pan_number = _checked(record.pan_number, is_valid_pan, _compact)
+    elif isinstance(record, ChequeRecord):
+        record.ifsc_code = _checked(record.ifsc_code, is_valid_ifsc, _compact)
+        record.account_number = _checked(
+            record.account_number, lambda value: value.isdigit() and 9 <= len(value) <= 18, _compact
+        )
+    return record
+
+
+def parse_record(record_type, text):
+    """Parse a structured-output completion into a validated ``record_type``.
+
+    Raises RecordValidationError when the text is not JSON of the right shape.
+    """
+    try:
+        data = json.loads(text)
+    except (TypeError, ValueError) as exc:
+        raise RecordValidationError(f"{record_type.__name__}: not JSON ({exc})") from exc
+    return validate_record(_build(record_type, data))
+
+
+def cheque_record(fields, llm_record=None):
+    """Cheque record from rule fields, with LLM values only where the rules found nothing."""
+    record = llm_record or ChequeRecord()
+    for label, name in CHEQUE_RULE_FIELDS.items():
+        if fields.get(label):
+            setattr(record, name, fields[label])
+    return validate_record(record)
+
+
+def record_to_dict(record):
+    # Also serves as json.dumps(default=record_to_dict)
+    if not dataclasses.is_dataclass(record):
+        raise TypeError(f"Object of type {type(record).__name__} is not JSON serializable")
+    return dataclasses.asdict(record)
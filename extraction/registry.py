@@ -0,0 +1,142 @@
+import re
+from dataclasses import dataclass, field
+
+from .document_types import AADHAR_CARD, BANK_CHEQUE, PAN_CARD, RATION_CARD
+from .field_rules import CHEQUE_FIELDS, PAN_PATTERN, find_aadhar, find_ifsc, format_fields
+from .prompts import (
+    AADHAR_PAN_PROMPT, CHEQUE_MAX_TOKENS, CHEQUE_PROMPT, IDENTITY_MAX_TOKENS, RATION_CARD_MAX_TOKENS,
+    RATION_CARD_PROMPT, VISION_HINT, structured, text_payload, vision_payload,
+)
+from .records import ChequeRecord, IdentityRecord, RationCardRecord, response_format
+from .routing import (
+    CHEQUE_MODEL_LADDER, IDENTITY_MODEL_LADDER, RATION_CARD_MODEL_LADDER, any_answer, cheque_accepted,
+    identity_accepted, parse_ladder,
+)
+
+# What the extraction reads: the document image, or the prebuilt-read text of a cheque
+IMAGE, CHEQUE_TEXT = "image", "cheque_text"
+
+
+@dataclass(slots=True)
+class DocumentTypeSpec:
+    """Everything the pipeline knows about one document type.
+
+    ``key_signals`` are prebuilt-document key fragments, ``id_number`` the
+    pattern a prebuilt-idDocument DocumentNumber must match and
+    ``text_signals`` the (pattern or predicate, weight) hints of the local
+    classifier; one valid identifier is weighted to reach its threshold.
+    ``task`` names the extraction: types sharing a task share one
+    extraction, prompt and model ladder. Schema, ladder and patterns are
+    compiled once, when the registry is built.
+    """
+    name: str
+    description: str
+    task: str
+    source: str
+    record_type: type
+    prompt: str
+    max_tokens: int
+    ladder: str
+    accepted: object = any_answer
+    key_signals: tuple = ()
+    id_number: str | None = None
+    text_signals: tuple = ()
+    models: list = field(init=False)
+    response_format: dict = field(init=False)
+    id_number_pattern: re.Pattern | None = field(init=False)
+
+    def __post_init__(self):
+        self.models = parse_ladder(self.ladder)
+        self.response_format = response_format(self.record_type)
+        self.id_number_pattern = re.compile(self.id_number) if self.id_number else None
+
+    def render_prompt(self, **values):
+        return self.prompt.format(**values) if values else self.prompt
+
+    def payload(self, prompt, model, image_url=None):
+        # Text-only unless an image is passed, which also suits text prompts escalated to a vision rung
+        if image_url is None:
+            return structured(text_payload(prompt, model), self.response_format, self.max_tokens)
+        return structured(vision_payload(prompt, image_url, model), self.response_format, self.max_tokens)
+
+
+# In classification precedence: when prebuilt-document keys point at several types, the first wins
+DOCUMENT_TYPES = {}
+
+
+def register_document_type(spec):
+    DOCUMENT_TYPES[spec.name] = spec
+    return spec
+
+
+def get_document_type(name):
+    # None for Unknown and anything else without an extractor
+    return DOCUMENT_TYPES.get(name)
+
+
+def cheque_prompt(spec, extracted_text, fields, missing_fields):
+    return spec.render_prompt(
+        requested_fields=", ".join(missing_fields),
+        known_fields=format_fields(fields, CHEQUE_FIELDS).replace("\n", "; ") or "nothing",
+        extracted_text=extracted_text,
+    )
+
+
+def vision_prompt(prompt):
+    return prompt + VISION_HINT
+
+
+UNKNOWN_DOCUMENT_DETAILS = {
+    "Name": "",
+    "Aadhar Number": "",
+    "Pan Number": "",
+    "Fathers Name": "",
+    "DateOfBirth": "",
+    "Ration_card_details": "",
+    "Bank_Cheque_details": ""
+}
+
+register_document_type(DocumentTypeSpec(
+    name=RATION_CARD, description="a Ration Card", task="ration_card", source=IMAGE,
+    record_type=RationCardRecord, prompt=RATION_CARD_PROMPT, max_tokens=RATION_CARD_MAX_TOKENS,
+    ladder=RATION_CARD_MODEL_LADDER,
+    key_signals=("New Ration Card No", "Old RationCard No", "Old RCNo"),
+    text_signals=(
+        (re.compile(r"Ration\s*Card|\bRC\s*No\b|\bFPS\b|FP\s*SHOP", re.I), 0.6),
+        (re.compile(r"Civil\s+Supplies|Consumer\s+No", re.I), 0.3),
+    ),
+))
+register_document_type(DocumentTypeSpec(
+    name=BANK_CHEQUE, description="a Bank Cheque", task="cheque", source=CHEQUE_TEXT,
+    record_type=ChequeRecord, prompt=CHEQUE_PROMPT, max_tokens=CHEQUE_MAX_TOKENS,
+    ladder=CHEQUE_MODEL_LADDER, accepted=cheque_accepted,
+    key_signals=("A/C No", "A/c No.", "A/C. No.", "A/c. No.", "Pay", "PAY", "BEARER", "Bearer",
+                 "account No", "IFSCCode", "IFSC Code", "IFS Code"),
+    text_signals=(
+        (find_ifsc, 0.8),
+        (re.compile(r"\b(?:IFSC|IFS Code|A/C\.? No|or bearer|bearer)\b", re.I), 0.3),
+        (re.compile(r"\b(?:Pay|Rupees|Please sign above)\b", re.I), 0.2),
+    ),
+))
+register_document_type(DocumentTypeSpec(
+    name=AADHAR_CARD, description="an Aadhar card", task="identity", source=IMAGE,
+    record_type=IdentityRecord, prompt=AADHAR_PAN_PROMPT, max_tokens=IDENTITY_MAX_TOKENS,
+    ladder=IDENTITY_MODEL_LADDER, accepted=identity_accepted,
+    key_signals=("Your Aadhaar No.",),
+    # Aadhaar numbers are 12 digits, PAN numbers follow AAAAA9999A
+    id_number=r"\d{12}",
+    text_signals=(
+        (find_aadhar, 0.8),
+        (re.compile(r"\bAadhaar\b|Unique\s+Identification|\bVID\b", re.I), 0.6),
+    ),
+))
+register_document_type(DocumentTypeSpec(
+    name=PAN_CARD, description="a PAN card", task="identity", source=IMAGE,
+    record_type=IdentityRecord, prompt=AADHAR_PAN_PROMPT, max_tokens=IDENTITY_MAX_TOKENS,
+    ladder=IDENTITY_MODEL_LADDER, accepted=identity_accepted,
+    id_number=r"[A-Za-z]{5}\d{4}[A-Za-z]",
+    text_signals=(
+        (PAN_PATTERN, 0.8),
+        (re.compile(r"INCOME\s+TAX\s+DEPARTMENT|Permanent\s+Account\s+Number", re.I), 0.6),
+    ),
+))
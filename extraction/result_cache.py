@@ -0,0 +1,158 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from .metrics import CACHE_LOOKUPS
+
+# Location and bounds of the on-disk cache, overridable from the .env file
+CACHE_PATH = os.getenv("RESULT_CACHE_PATH", os.path.join(".cache", "results.sqlite3"))
+CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", str(30 * 24 * 3600)))
+
+
+def cache_key(document_sha256, model_id, prompt=""):
+    # Content addressed: the same scan re-uploaded under another URL hits the same entry
+    digest = hashlib.sha256()
+    for part in (document_sha256, model_id, prompt or ""):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """SQLite backed cache for Form Recognizer results and LLM completions.
+
+    Entries expire after ``ttl`` seconds and the least recently used ones are
+    evicted once the stored values exceed ``max_bytes``.
+    """
+
+    def __init__(self, path=CACHE_PATH, max_bytes=CACHE_MAX_BYTES, ttl=CACHE_TTL):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = self._connect()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL,"
+            " created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+        # Running total of the stored sizes, kept by triggers so every worker process sharing the
+        # file sees the same figure without summing the table on each write. Seeded once for
+        # caches written before the total existed
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        conn.execute("INSERT OR IGNORE INTO meta SELECT 'bytes', COALESCE(SUM(size), 0) FROM entries")
+        conn.execute(
+            "CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries BEGIN"
+            " UPDATE meta SET value = value + new.size WHERE name = 'bytes'; END"
+        )
+        conn.execute(
+            "CREATE TRIGGER IF NOT EXISTS entries_update AFTER UPDATE OF size ON entries BEGIN"
+            " UPDATE meta SET value = value + new.size - old.size WHERE name = 'bytes'; END"
+        )
+        conn.execute(
+            "CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries BEGIN"
+            " UPDATE meta SET value = value - old.size WHERE name = 'bytes'; END"
+        )
+        conn.execute("COMMIT")
+        return conn
+
+    def close(self):
+        # SQLite connections must not cross fork(): close before forking, reopen() in the child
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def reopen(self):
+        with self._lock:
+            if self._conn is None:
+                self._conn = self._connect()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                if row is not None:
+                    self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self.misses += 1
+                CACHE_LOOKUPS.inc(outcome="miss")
+                return None
+            self._conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            CACHE_LOOKUPS.inc(outcome="hit")
+            return json.loads(row[0])
+
+    def set(self, key, value):
+        data = json.dumps(value).encode("utf-8")
+        now = time.time()
+        with self._lock:
+            # An upsert rather than INSERT OR REPLACE: REPLACE's implicit delete skips the delete trigger
+            self._conn.execute(
+                "INSERT INTO entries (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT (key) DO UPDATE SET value = excluded.value, size = excluded.size,"
+                " created = excluded.created, accessed = excluded.accessed",
+                (key, data, len(data), now, now),
+            )
+            self._evict()
+
+    def _total_bytes(self):
+        return self._conn.execute("SELECT value FROM meta WHERE name = 'bytes'").fetchone()[0]
+
+    def _evict(self):
+        total = self._total_bytes()
+        while total > self.max_bytes:
+            # Oldest entries first, a few at a time so eviction never loads the whole table
+            rows = self._conn.execute(
+                "SELECT key, size FROM entries ORDER BY accessed LIMIT 32"
+            ).fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                if total <= self.max_bytes:
+                    break
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                total -= size
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            size = self._total_bytes()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": size,
+        }
+
+
+_result_cache = None
+_result_cache_lock = threading.Lock()
+
+
+def get_result_cache():
+    # One cache per process, opened on first use
+    global _result_cache
+    with _result_cache_lock:
+        if _result_cache is None:
+            _result_cache = ResultCache()
+    return _result_cache
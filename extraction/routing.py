@@ -0,0 +1,83 @@
+import os
+
+from .metrics import MODEL_TIERS
+from .records import RecordValidationError
+
+# Comma separated, cheapest first; a "vision:" prefix sends the document image along with the text
+CHEQUE_MODEL_LADDER = os.getenv("CHEQUE_MODEL_LADDER", "gpt-4o-mini,gpt-4o,vision:gpt-4o")
+IDENTITY_MODEL_LADDER = os.getenv("IDENTITY_MODEL_LADDER", "gpt-4o-mini,gpt-4o")
+# Ration cards carry no number that can be checked, so there is nothing to escalate on
+RATION_CARD_MODEL_LADDER = os.getenv("RATION_CARD_MODEL_LADDER", "gpt-4o")
+
+# Cheque fields a routed answer must carry, after the format checks in records.validate_record
+REQUIRED_CHEQUE_FIELDS = ("bank_name", "ifsc_code", "account_number")
+
+class Rung:
+    """One step of a ladder: a chat model, optionally shown the document image."""
+
+    def __init__(self, spec):
+        spec = spec.strip()
+        self.vision = spec.startswith("vision:")
+        self.model = spec[len("vision:"):] if self.vision else spec
+
+    def __repr__(self):
+        return f"vision:{self.model}" if self.vision else self.model
+
+
+def parse_ladder(spec):
+    return [Rung(part) for part in spec.split(",") if part.strip()]
+
+
+def any_answer(record):
+    return True
+
+
+def cheque_accepted(record):
+    return all(getattr(record, name) for name in REQUIRED_CHEQUE_FIELDS)
+
+
+def identity_accepted(record):
+    # validate_record has already nulled an Aadhaar failing Verhoeff or a malformed PAN
+    return bool(record.name and (record.aadhar_number or record.pan_number))
+
+
+def _outcome(task, tier, rung, record, accepted, last):
+    if record is not None and accepted(record):
+        outcome = "accepted"
+    else:
+        outcome = "exhausted" if last else "escalated"
+    MODEL_TIERS.inc(task=task, tier=tier, model=repr(rung), outcome=outcome)
+    return outcome
+
+
+def route(task, ladder, attempt, accepted):
+    """Walk ``ladder`` until ``accepted(record)``, returning the last record.
+
+    ``attempt(rung)`` sends one completion and returns the parsed record; a
+    RecordValidationError counts as a failed answer. When every rung fails
+    the last record (possibly None) is returned as the best available.
+    """
+    record = None
+    for tier, rung in enumerate(ladder):
+        try:
+            candidate = attempt(rung)
+        except RecordValidationError:
+            candidate = None
+        record = candidate if candidate is not None else record
+        if _outcome(task, tier, rung, candidate, accepted, tier == len(ladder) - 1) == "accepted":
+            break
+    return record
+
+
+async def aroute(task, ladder, attempt, accepted):
+    # route() for coroutine attempts
+    record = None
+    for tier, rung in enumerate(ladder):
+        try:
+            candidate = await attempt(rung)
+        except RecordValidationError:
+            candidate = None
+        record = candidate if candidate is not None else record
+        if _outcome(task, tier, rung, candidate, accepted, tier == len(ladder) - 1) == "accepted":
+            break
+    return record
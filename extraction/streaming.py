@@ -0,0 +1,129 @@
+import base64
+import json
+import os
+import uuid
+
+# Largest document accepted from a URL or upload; bigger ones are refused mid-download
+MAX_DOCUMENT_BYTES = int(os.getenv("MAX_DOCUMENT_BYTES", str(25 * 1024 * 1024)))
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+# Raw bytes per base64 chunk; a multiple of 3 so chunks encode without padding
+BASE64_CHUNK_SIZE = 48 * 1024
+
+
+class DocumentTooLarge(ValueError):
+    pass
+
+
+def check_declared_length(headers, limit=MAX_DOCUMENT_BYTES):
+    # Refuse before reading a byte when the host tells us the size up front
+    declared = headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > limit:
+        raise DocumentTooLarge(f"document is {declared} bytes, limit is {limit}")
+
+
+def read_capped(chunks, limit=MAX_DOCUMENT_BYTES):
+    """Join byte chunks into one ``bytes``, raising DocumentTooLarge past ``limit``."""
+    buffer = bytearray()
+    for chunk in chunks:
+        buffer += chunk
+        if len(buffer) > limit:
+            raise DocumentTooLarge(f"document exceeds {limit} bytes")
+    return bytes(buffer)
+
+
+async def aread_capped(chunks, limit=MAX_DOCUMENT_BYTES):
+    buffer = bytearray()
+    async for chunk in chunks:
+        buffer += chunk
+        if len(buffer) > limit:
+            raise DocumentTooLarge(f"document exceeds {limit} bytes")
+    return bytes(buffer)
+
+
+def download_document(session, url, timeout, limit=MAX_DOCUMENT_BYTES):
+    """Stream ``url`` into memory in chunks, never holding more than ``limit`` bytes."""
+    with session.get(url, timeout=timeout, stream=True) as response:
+        response.raise_for_status()
+        check_declared_length(response.headers, limit)
+        return read_capped(response.iter_content(DOWNLOAD_CHUNK_SIZE), limit)
+
+
+async def adownload_document(client, url, timeout, limit=MAX_DOCUMENT_BYTES):
+    async with client.stream("GET", url, timeout=timeout) as response:
+        response.raise_for_status()
+        check_declared_length(response.headers, limit)
+        return await aread_capped(response.aiter_bytes(DOWNLOAD_CHUNK_SIZE), limit)
+
+
+def base64_length(size):
+    return 4 * ((size + 2) // 3)
+
+
+def iter_base64(data, chunk_size=BASE64_CHUNK_SIZE):
+    """Yield the base64 encoding of ``data`` a chunk at a time."""
+    view = memoryview(data)
+    for start in range(0, len(view), chunk_size):
+        yield base64.b64encode(view[start:start + chunk_size])
+
+
+class DataURL:
+    """``data:`` URL for an image, encoded lazily while the request body is sent.
+
+    Only the raw image bytes are kept; the base64 text is produced chunk by
+    chunk by ``StreamingJSONBody`` and never exists as a whole string.
+    """
+
+    def __init__(self, data, mime_type="image/jpeg"):
+        self.data = data
+        self.prefix = f"data:{mime_type};base64,".encode("ascii")
+
+    def __len__(self):
+        return len(self.prefix) + base64_length(len(self.data))
+
+    def __iter__(self):
+        yield self.prefix
+        yield from iter_base64(self.data)
+
+    def __str__(self):
+        return b"".join(self).decode("ascii")
+
+
+class StreamingJSONBody:
+    """JSON request body whose ``DataURL`` values are streamed instead of serialized.
+
+    Everything else in the payload goes through ``json.dumps`` as usual. The
+    body has a known length, so it is sent with Content-Length rather than
+    chunked encoding, and can be iterated again when a request is retried.
+    Iterate it directly for requests; httpx's AsyncClient wants ``aiter()``.
+    """
+
+    def __init__(self, payload):
+        marker = f"stream-{uuid.uuid4().hex}"
+        streams = []
+
+        def placeholder(value):
+            if not isinstance(value, DataURL):
+                raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+            streams.append(value)
+            return marker
+
+        text = json.dumps(payload, default=placeholder).encode("utf-8")
+        # Base64 and the data: prefix never need JSON escaping, so the quotes around the marker stay put
+        literals = text.split(marker.encode("ascii"))
+        self.parts = [literals[0]]
+        for stream, literal in zip(streams, literals[1:]):
+            self.parts.extend((stream, literal))
+
+    def __len__(self):
+        return sum(len(part) for part in self.parts)
+
+    def __iter__(self):
+        for part in self.parts:
+            if isinstance(part, DataURL):
+                yield from part
+            else:
+                yield part
+
+    async def aiter(self):
+        for chunk in self:
+            yield chunk
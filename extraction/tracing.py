@@ -0,0 +1,128 @@
+import contextlib
+import contextvars
+import json
+import logging
+import threading
+import time
+
+from .document_types import UNKNOWN
+from .metrics import AZURE_CALLS, DOCUMENT_SECONDS, DOCUMENTS, LLM_TOKENS, STAGE_SECONDS
+
+logger = logging.getLogger("extraction.requests")
+
+_current_trace = contextvars.ContextVar("extraction_trace", default=None)
+
+
+class RequestTrace:
+    """Timings, Azure calls and token usage gathered while one document is analysed.
+
+    Spans are aggregated per stage and model; Azure calls and tokens are
+    attributed to the document type once it is known, at ``finish``.
+    """
+
+    def __init__(self, document_url=None):
+        self.document_url = document_url
+        self.document_type = None
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.azure_calls = {}
+        self.tokens = {}
+        self._lock = threading.Lock()
+
+    def add_span(self, stage, model, seconds):
+        name = f"{stage}:{model}" if model else stage
+        with self._lock:
+            count, total = self.stages.get(name, (0, 0.0))
+            self.stages[name] = (count + 1, total + seconds)
+
+    def add_azure_call(self, model):
+        with self._lock:
+            self.azure_calls[model] = self.azure_calls.get(model, 0) + 1
+
+    def add_usage(self, model, usage):
+        with self._lock:
+            tokens = self.tokens.setdefault(model, {"prompt": 0, "completion": 0})
+            tokens["prompt"] += usage.get("prompt_tokens", 0)
+            tokens["completion"] += usage.get("completion_tokens", 0)
+
+    def finish(self, outcome):
+        seconds = time.perf_counter() - self.started
+        document_type = self.document_type or UNKNOWN
+        DOCUMENTS.inc(document_type=document_type, outcome=outcome)
+        DOCUMENT_SECONDS.observe(seconds, document_type=document_type)
+        for model, calls in self.azure_calls.items():
+            AZURE_CALLS.inc(calls, document_type=document_type, model=model)
+        for model, tokens in self.tokens.items():
+            for kind, count in tokens.items():
+                LLM_TOKENS.inc(count, document_type=document_type, model=model, kind=kind)
+
+        # One JSON line per document, for log pipelines to slice by type, stage and spend
+        logger.info(json.dumps({
+            "event": "document_analysed",
+            "document_url": self.document_url,
+            "document_type": document_type,
+            "outcome": outcome,
+            "seconds": round(seconds, 4),
+            "stages": {name: {"count": count, "seconds": round(total, 4)}
+                       for name, (count, total) in self.stages.items()},
+            "azure_calls": self.azure_calls,
+            "tokens": self.tokens,
+        }))
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+@contextlib.contextmanager
+def request_trace(document_url=None):
+    """Trace everything analysed inside the block as one document.
+
+    Threads and tasks started from the block only see the trace if they run
+    in a copy of the current context (``contextvars.copy_context().run``);
+    asyncio tasks and ``asyncio.to_thread`` do that already.
+    """
+    trace = RequestTrace(document_url)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    except BaseException:
+        trace.finish("error")
+        raise
+    else:
+        trace.finish("ok")
+    finally:
+        _current_trace.reset(token)
+
+
+@contextlib.contextmanager
+def span(stage, model=""):
+    # Times the block into extraction_stage_seconds and the current request trace
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        STAGE_SECONDS.observe(seconds, stage=stage, model=model)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add_span(stage, model, seconds)
+
+
+def set_document_type(document_type):
+    trace = _current_trace.get()
+    if trace is not None and trace.document_type is None:
+        trace.document_type = document_type
+
+
+def record_azure_call(model):
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_azure_call(model)
+
+
+def record_usage(model, usage):
+    # usage is the "usage" object of a chat completions response
+    trace = _current_trace.get()
+    if trace is not None and usage:
+        trace.add_usage(model, usage)
@@ -0,0 +1,48 @@
+import multiprocessing
+import os
+import tempfile
+
+# gunicorn -c gunicorn.conf.py
+wsgi_app = "wsgi:application"
+bind = os.getenv("BIND", "0.0.0.0:8000")
+
+# Workers snapshot their metrics here so /metrics adds up the whole server; give every
+# gunicorn server on a host its own directory
+os.environ.setdefault("METRICS_DIR", os.path.join(tempfile.gettempdir(), "extraction-metrics"))
+
+# Requests spend most of their time waiting on Azure and OpenAI, so each process runs several threads
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count() * 2 + 1)))
+worker_class = "gthread"
+threads = int(os.getenv("WEB_THREADS", "8"))
+
+# Import the app, IFSC index and clients once in the master, then fork warm workers
+preload_app = True
+
+# Recycle a worker after this many requests (jittered so they do not all restart together)
+max_requests = int(os.getenv("MAX_REQUESTS", "1000"))
+max_requests_jitter = int(os.getenv("MAX_REQUESTS_JITTER", "100"))
+
+# A multi-page document can take minutes; on SIGTERM, in-flight requests get graceful_timeout to finish
+timeout = int(os.getenv("WEB_TIMEOUT", "300"))
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "60"))
+keepalive = 5
+
+
+def when_ready(server):
+    import wsgi
+    wsgi.before_fork()
+
+
+def post_fork(server, worker):
+    import wsgi
+    wsgi.after_fork()
+
+
+def worker_exit(server, worker):
+    import wsgi
+    wsgi.shutdown(graceful_timeout)
+
+
+def child_exit(server, worker):
+    import wsgi
+    wsgi.worker_exited(worker.pid)
@@ -1,67 +1,21 @@
-import openai
-import json
-from azure.core.credentials import AzureKeyCredential
-from azure.ai.formrecognizer import DocumentAnalysisClient
-from datetime import datetime
 import os
 from dotenv import load_dotenv
-from openai import OpenAI
+from extraction import DocumentContext
+from extraction.clients import get_document_analysis_client
+from extraction.document_types import BANK_CHEQUE
+from extraction.pipeline import extract_details
+from extraction.registry import get_document_type
 
 load_dotenv()
 
-# Get the endpoint and key from environment variables
-endpoint = os.getenv("ENDPOINT")
-key = os.getenv("KEY")
+# The Form Recognizer endpoint and key are read by extraction.clients; only the OpenAI key is needed here
 api_key = os.getenv("OPENAI_API_KEY")
 
-client = OpenAI(api_key=api_key)
-
-def analyze_read_and_return():
+if __name__ == "__main__":
     # sample document
     formUrl = "https://quadz.blob.core.windows.net/newpoc/91.jpeg"
-    document_analysis_client = DocumentAnalysisClient(
-        endpoint=endpoint, credential=AzureKeyCredential(key)
-    )
-    
-    poller = document_analysis_client.begin_analyze_document_from_url(
-            "prebuilt-read", formUrl)
-    result = poller.result()
-
-    # Extracted text
-    extracted_text = result.content
-
-    return extracted_text
-
-if __name__ == "__main__":
-    extracted_text = analyze_read_and_return()
-    # print(extracted_text)  # or do whatever you want with the extracted text variable
-
-
-def get_completion(prompt, model="gpt-3.5-turbo"):
-    messages = [{"role": "user", "content": prompt}]
-    client = OpenAI(api_key=api_key)
-    completion = client.chat.completions.create(
-        model=model,
-        messages=messages,
-        temperature=0, # this is the degree of randomness of the model's output
-    )
-    return completion.choices[0].message
-
-details1 = f"""
-You will be provided with the cheque details in triple quotes.
-
-extract below details
-
-- Bank Name
-- Branch Name
-- IFSC Code / IFSCCode
-- Account Number
-
-'''{extracted_text}'''
-
-"""
-
-bank_details = get_completion(details1)
-print(bank_details.content)
-
+    document = DocumentContext(formUrl, get_document_analysis_client())
 
+    # Same cheque extraction as app.py and app1.py, through extraction.registry
+    bank_details = extract_details(document, get_document_type(BANK_CHEQUE), api_key)
+    print(bank_details)
@@ -0,0 +1,96 @@
+from extraction.field_rules import (
+    extract_cheque_fields, find_account_number, find_ifsc, is_valid_aadhar, is_valid_ifsc, parse_micr_line,
+    verhoeff_valid,
+)
+
+CHEQUE_TEXT = ("STATE BANK OF INDIA\nMG ROAD BRANCH\nIFSC SBIN0001234\nPay ____ or Bearer\n"
+               "A/c No. 12345678901\nPlease sign above\n⑈123456⑈ 400002001⑆ 000010⑈ 31")
+
+
+def test_find_ifsc_reads_letter_o_as_zero():
+    assert find_ifsc("IFSC: SBINO001234") == "SBIN0001234"
+    assert find_ifsc("ifsc code hdfc0000123") == "HDFC0000123"
+
+
+def test_find_ifsc_needs_a_whole_code():
+    assert find_ifsc("SBIN000123") is None
+    assert find_ifsc("XSBIN0001234") is None
+
+
+def test_find_ifsc_prefers_the_labelled_code():
+    assert find_ifsc("BANKOFINDIA MAIN BRANCH IFSC: BKID0001234") == "BKID0001234"
+    assert find_ifsc("BANK OF INDIA IFS Code BKIDO001234") == "BKID0001234"
+
+
+def test_find_ifsc_letter_o_needs_a_digit_in_the_branch_code():
+    assert find_ifsc("BANKOFINDIA MAIN BRANCH") is None
+
+
+def test_is_valid_ifsc():
+    assert is_valid_ifsc("SBIN0001234")
+    assert not is_valid_ifsc("SBINO001234")
+
+
+def test_parse_micr_line():
+    assert parse_micr_line("⑈123456⑈ 400002001⑆ 000010⑈ 31") == {
+        "Cheque Number": "123456", "MICR Code": "400002001", "Transaction Code": "31",
+    }
+    assert parse_micr_line("|654321| 110240002| 29") == {
+        "Cheque Number": "654321", "MICR Code": "110240002", "Transaction Code": "29",
+    }
+
+
+def test_parse_micr_line_without_band():
+    assert parse_micr_line("A/c No. 12345678901") == {}
+
+
+def test_account_number_from_label():
+    assert find_account_number("A/c No. 12345678901") == "12345678901"
+    assert find_account_number("Account Number: 1234 5678 9012") == "123456789012"
+    assert find_account_number("SB 31234567890") == "31234567890"
+
+
+def test_account_label_must_be_a_whole_word():
+    # "ca" in "Indica" is not a label, so the phone number must not be taken
+    assert find_account_number("Indica 9876543210 Phone, A/C No 12345678901") == "12345678901"
+
+
+def test_explicit_account_label_beats_scheme_prefix():
+    assert find_account_number("DSCA 04842345678 CA 55512345678 A/C No 12345678901") == "12345678901"
+
+
+def test_account_number_skips_micr_values():
+    micr = parse_micr_line(CHEQUE_TEXT)
+    assert find_account_number("⑈123456⑈ 400002001⑆ 000010⑈ 31", micr) is None
+
+
+def test_unlabeled_account_number_only_when_unambiguous():
+    assert find_account_number("Pay 12345678901") == "12345678901"
+    assert find_account_number("12345678901 98765432109") is None
+
+
+def test_extract_cheque_fields():
+    assert extract_cheque_fields(CHEQUE_TEXT) == {
+        "IFSC Code": "SBIN0001234", "Account Number": "12345678901",
+        "Cheque Number": "123456", "MICR Code": "400002001", "Transaction Code": "31",
+    }
+
+
+def test_verhoeff():
+    assert verhoeff_valid("234567890124")
+    assert not verhoeff_valid("234567890125")
+    # A swap of adjacent digits is caught too
+    assert not verhoeff_valid("234567890142")
+
+
+def test_is_valid_aadhar():
+    assert is_valid_aadhar("2345 6789 0124")
+    assert not is_valid_aadhar("2345 6789 0125")
+    assert not is_valid_aadhar("1345 6789 0124")
+    assert not is_valid_aadhar("2345 6789 012")
+
+
+def test_account_number_stops_before_a_following_date():
+    assert find_account_number("Account No. 123456789012345 05/06/2024") == "123456789012345"
+    assert find_account_number("SB A/c 50100123456789 16/05/2024") == "50100123456789"
+    assert find_account_number("A/C No 1234 5678 9012 05/06/2024") == "123456789012"
@@ -0,0 +1,46 @@
+import pytest
+
+from extraction.ifsc_index import IFSCIndex, write_index
+
+ROWS = [
+    ("SBIN0001234", "State Bank of India", "MG Road"),
+    ("HDFC0000123", "HDFC Bank", "Fort"),
+    ("SBIN0005678", "State Bank of India", "Andheri"),
+]
+
+
+def test_lookup(tmp_path):
+    path = str(tmp_path / "ifsc.idx")
+    assert write_index(ROWS, path) == 3
+    index = IFSCIndex(path)
+    assert index.lookup("SBIN0001234") == {"Bank Name": "State Bank of India", "Branch Name": "MG Road"}
+    assert index.lookup(" hdfc0000123 ") == {"Bank Name": "HDFC Bank", "Branch Name": "Fort"}
+    assert index.lookup("SBIN0005678")["Branch Name"] == "Andheri"
+
+
+def test_unknown_code(tmp_path):
+    path = str(tmp_path / "ifsc.idx")
+    write_index(ROWS, path)
+    assert IFSCIndex(path).lookup("ICIC0000001") is None
+
+
+def test_malformed_codes_are_skipped_and_duplicates_keep_the_last_row(tmp_path):
+    path = str(tmp_path / "ifsc.idx")
+    rows = ROWS + [("SBIN000", "Broken", "Row"), ("SBIN0001234", "State Bank of India", "MG Road (New)")]
+    assert write_index(rows, path) == 4
+    assert IFSCIndex(path).lookup("SBIN0001234")["Branch Name"] == "MG Road (New)"
+
+
+def test_many_codes_survive_probing(tmp_path):
+    path = str(tmp_path / "ifsc.idx")
+    rows = [(f"BANK{number:07d}", f"Bank {number % 7}", f"Branch {number}") for number in range(2000)]
+    write_index(rows, path)
+    index = IFSCIndex(path)
+    assert all(index.lookup(code) == {"Bank Name": bank, "Branch Name": branch} for code, bank, branch in rows)
+
+
+def test_not_an_index(tmp_path):
+    path = tmp_path / "ifsc.idx"
+    path.write_bytes(b"\0" * 64)
+    with pytest.raises(ValueError):
+        IFSCIndex(str(path))
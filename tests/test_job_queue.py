@@ -0,0 +1,53 @@
+import time
+
+from extraction.job_queue import DONE, QUEUED, JobQueue, JobWorkerPool, callback_allowed
+
+HOSTS = ["hooks.example.com", ".partner.example"]
+
+
+def test_callback_allowed_only_for_listed_hosts():
+    assert callback_allowed("https://hooks.example.com/done", HOSTS, ["https"])
+    assert callback_allowed("https://a.partner.example/done", HOSTS, ["https"])
+    assert not callback_allowed("https://169.254.169.254/latest/meta-data", HOSTS, ["https"])
+    assert not callback_allowed("https://evilpartner.example/done", HOSTS, ["https"])
+    assert not callback_allowed("http://hooks.example.com/done", HOSTS, ["https"])
+    assert not callback_allowed("https://hooks.example.com@10.0.0.1/done", HOSTS, ["https"])
+
+
+def test_no_configured_hosts_refuses_callbacks():
+    assert not callback_allowed("https://hooks.example.com/done", [], ["https"])
+
+
+def test_claim_and_complete(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"))
+    job_id = queue.submit("https://example.com/cheque.jpg")
+    assert queue.claim() == (job_id, "https://example.com/cheque.jpg", None)
+    assert queue.claim() is None
+    queue.complete(job_id, {"document_type": "Bank Cheque"})
+    assert queue.get(job_id)["status"] == DONE
+
+
+def test_failed_job_is_retried(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), max_attempts=2)
+    job_id = queue.submit("https://example.com/cheque.jpg")
+    queue.claim()
+    assert queue.fail(job_id, "boom") == QUEUED
+    assert queue.claim()[0] == job_id
+
+
+def test_running_job_renews_its_lease(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), lease_seconds=0.3)
+    job_id = queue.submit("https://example.com/cheque.jpg")
+    claimed_twice = []
+
+    def handler(document_url):
+        # While this runs past its lease, nobody else may claim the job
+        deadline = time.time() + 0.9
+        while time.time() < deadline:
+            claimed_twice.append(queue.claim())
+            time.sleep(0.05)
+        return {}
+
+    JobWorkerPool(queue, handler).run_job(*queue.claim())
+    assert not any(claimed_twice)
+    assert queue.get(job_id)["status"] == DONE
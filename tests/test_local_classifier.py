@@ -0,0 +1,57 @@
+from extraction import local_classifier
+from extraction.classification import identify_document_type
+from extraction.document_types import AADHAR_CARD, BANK_CHEQUE, PAN_CARD
+from extraction.local_classifier import (
+    LAYOUT_MAX_SCORE, LOCAL_CONFIDENCE_THRESHOLD, best_guess, classify_text, pre_classify,
+)
+
+
+class OfflineDocument:
+    """Document stand-in that fails the test on any Azure call."""
+
+    def __init__(self, content):
+        self.content = content
+
+    def analyze(self, model_id):
+        raise AssertionError(f"{model_id} was requested")
+
+
+def text_classifier(content):
+    return classify_text(content.decode("utf-8"))
+
+
+def test_one_identifier_is_confident():
+    assert best_guess(classify_text("IFSC SBIN0001234"))[0] == BANK_CHEQUE
+    assert best_guess(classify_text("2345 6789 0124"))[0] == AADHAR_CARD
+    assert best_guess(classify_text("ABCPE1234F"))[0] == PAN_CARD
+    for text in ("IFSC SBIN0001234", "2345 6789 0124", "ABCPE1234F"):
+        assert best_guess(classify_text(text))[1] >= LOCAL_CONFIDENCE_THRESHOLD
+
+
+def test_aadhar_number_must_pass_verhoeff():
+    assert classify_text("2345 6789 0125") == {}
+
+
+def test_labels_without_an_identifier_are_not_confident():
+    _, confidence = best_guess(classify_text("Pay Rupees or bearer Please sign above"))
+    assert 0 < confidence < LOCAL_CONFIDENCE_THRESHOLD
+    _, confidence = best_guess(classify_text("Ration Card FP SHOP Consumer No 1234"))
+    assert confidence < LOCAL_CONFIDENCE_THRESHOLD
+
+
+def test_layout_alone_is_not_confident():
+    assert LAYOUT_MAX_SCORE < LOCAL_CONFIDENCE_THRESHOLD
+
+
+def test_pre_classify_combines_classifiers():
+    document_type, confidence = pre_classify(b"", [lambda content: {BANK_CHEQUE: 0.5},
+                                                   lambda content: {BANK_CHEQUE: 0.5}])
+    assert document_type == BANK_CHEQUE
+    assert abs(confidence - 0.75) < 1e-9
+
+
+def test_confident_local_guess_skips_azure(monkeypatch):
+    monkeypatch.setattr(local_classifier, "LOCAL_CLASSIFIERS", [text_classifier])
+    cheque = OfflineDocument(b"STATE BANK OF INDIA\nIFSC SBIN0001234\nPay ____ or Bearer")
+    assert identify_document_type(cheque) == BANK_CHEQUE
+    assert identify_document_type(OfflineDocument(b"INCOME TAX DEPARTMENT\nABCPE1234F")) == PAN_CARD
@@ -0,0 +1,144 @@
+import threading
+import time
+
+import pytest
+
+from extraction import rate_limits
+from extraction.rate_limits import (
+    BucketStore, FairAdmission, Overloaded, RateLimited, RateLimiter, TokenBucket, parse_limits, refund_openai,
+    settle_openai,
+)
+
+PAYLOAD = {"model": "gpt-4o", "messages": [{"role": "user", "content": "x"}], "max_tokens": 499}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_parse_limits():
+    assert parse_limits("gpt-4o=600, *=60", 60) == {"gpt-4o": 10.0, "*": 1.0}
+    assert parse_limits("", 60) == {}
+
+
+def test_bucket_refills_at_its_rate(clock):
+    bucket = TokenBucket(rate=2, capacity=4)
+    assert bucket.reserve(4, max_wait=10) == 0
+    assert bucket.reserve(2, max_wait=10) == 1.0
+    # Two tokens owed; half a second refills one of them
+    clock[0] += 0.5
+    assert bucket.wait_time(1) == 1.0
+    clock[0] += 100
+    assert bucket.wait_time(4) == 0
+
+
+def test_bucket_refuses_beyond_max_wait_without_taking(clock):
+    bucket = TokenBucket(rate=1, capacity=1)
+    bucket.reserve(1, max_wait=0)
+    assert bucket.reserve(1, max_wait=0.5) is None
+    assert bucket.wait_time(1) == 1.0
+
+
+def test_refund_is_capped_at_capacity(clock):
+    bucket = TokenBucket(rate=1, capacity=2)
+    bucket.refund(10)
+    assert bucket.reserve(3, max_wait=10) == 0
+    assert bucket.wait_time(1) == 2.0
+
+
+def test_refusal_refunds_the_other_quota(clock):
+    limiter = RateLimiter(azure="*=100,prebuilt-read=1", burst=1, max_wait=0)
+    assert limiter.azure_delay("prebuilt-read") == 0
+    with pytest.raises(RateLimited):
+        limiter.azure_delay("prebuilt-read")
+    # The shared bucket got its token back when the model's own one refused
+    assert limiter.azure_delay("prebuilt-document") == 0
+    assert limiter._buckets[("azure", "*")].wait_time(98) == 0
+
+
+def openai_limiter():
+    # 600 tokens a minute with a one minute burst: a full bucket holds 600
+    return RateLimiter(azure="", openai_tokens="gpt-4o=600", burst=60, max_wait=120)
+
+
+def test_settle_hands_back_the_unused_estimate(clock, monkeypatch):
+    limiter = openai_limiter()
+    monkeypatch.setattr(rate_limits, "get_rate_limiter", lambda: limiter)
+    reserved = rate_limits.estimate_tokens(PAYLOAD)
+    assert limiter.openai_delay("gpt-4o", reserved) == 0
+    settle_openai(PAYLOAD, reserved, {"total_tokens": reserved - 400})
+    assert limiter.openai_delay("gpt-4o", 400) == 0
+
+
+def test_settle_without_usage_keeps_the_reservation(clock, monkeypatch):
+    limiter = openai_limiter()
+    monkeypatch.setattr(rate_limits, "get_rate_limiter", lambda: limiter)
+    limiter.openai_delay("gpt-4o", 500)
+    settle_openai(PAYLOAD, 500, None)
+    assert limiter.openai_delay("gpt-4o", 100) == 0
+    assert limiter.openai_delay("gpt-4o", 100) > 0
+
+
+def test_refund_returns_the_whole_reservation(clock, monkeypatch):
+    limiter = openai_limiter()
+    monkeypatch.setattr(rate_limits, "get_rate_limiter", lambda: limiter)
+    limiter.openai_delay("gpt-4o", 600)
+    refund_openai(PAYLOAD, 600)
+    assert limiter.openai_delay("gpt-4o", 600) == 0
+
+
+def test_processes_sharing_a_store_share_the_quota(tmp_path):
+    path = str(tmp_path / "rate_limits.sqlite3")
+    first = RateLimiter(azure="*=1", burst=1, max_wait=0, store=BucketStore(path))
+    second = RateLimiter(azure="*=1", burst=1, max_wait=0, store=BucketStore(path))
+    assert first.azure_delay("prebuilt-read") == 0
+    with pytest.raises(RateLimited):
+        second.azure_delay("prebuilt-read")
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def test_admission_is_round_robin_across_tenants():
+    admission = FairAdmission(slots=1, queue_limit=8, timeout=5)
+    order = []
+
+    def request(tenant):
+        with admission.admit(tenant):
+            order.append(tenant)
+
+    threads = []
+    with admission.admit("holder"):
+        # "a" queues two requests before "b" queues one; "b" must not wait behind both
+        for tenant, queued in (("a", 1), ("a", 2), ("b", 1)):
+            threads.append(threading.Thread(target=request, args=(tenant,)))
+            threads[-1].start()
+            wait_until(lambda: admission.stats()["queued"].get(tenant) == queued)
+    for thread in threads:
+        thread.join(5)
+    assert order == ["a", "b", "a"]
+    assert admission.stats() == {"active": 0, "slots": 1, "queued": {}}
+
+
+def test_admission_rejects_a_full_tenant_queue():
+    admission = FairAdmission(slots=1, queue_limit=0, timeout=5)
+    with admission.admit("holder"):
+        with pytest.raises(Overloaded):
+            with admission.admit("a"):
+                pass
+
+
+def test_admission_times_out():
+    admission = FairAdmission(slots=1, queue_limit=8, timeout=0.05)
+    with admission.admit("holder"):
+        with pytest.raises(Overloaded):
+            with admission.admit("a"):
+                pass
+    assert admission.stats()["queued"] == {}
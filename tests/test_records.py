@@ -0,0 +1,72 @@
+import json
+
+import pytest
+
+from extraction.records import (
+    ChequeRecord, IdentityRecord, RationCardMember, RationCardRecord, RecordValidationError, cheque_record,
+    json_schema, parse_record, record_to_dict, response_format,
+)
+
+
+def test_schema_is_strict():
+    schema = json_schema(ChequeRecord)
+    assert schema["additionalProperties"] is False
+    assert schema["required"] == list(schema["properties"])
+    assert schema["properties"]["ifsc_code"] == {"type": ["string", "null"]}
+
+
+def test_nested_schema():
+    members = json_schema(RationCardRecord)["properties"]["members"]
+    assert members["type"] == "array"
+    assert members["items"] == json_schema(RationCardMember)
+
+
+def test_response_format():
+    assert response_format(IdentityRecord)["json_schema"]["strict"] is True
+    assert response_format(IdentityRecord)["json_schema"]["name"] == "IdentityRecord"
+
+
+def test_parse_record_normalises_identifiers():
+    record = parse_record(IdentityRecord, json.dumps({
+        "name": " Test Person ", "aadhar_number": "2345 6789 0124", "pan_number": "abcpe1234f",
+        "date_of_birth": "", "fathers_name": None, "address": None,
+    }))
+    assert record == IdentityRecord(name="Test Person", aadhar_number="234567890124", pan_number="ABCPE1234F")
+
+
+def test_parse_record_drops_invalid_identifiers():
+    record = parse_record(ChequeRecord, json.dumps({"ifsc_code": "SBINO001234", "account_number": "12-34"}))
+    assert record.ifsc_code is None
+    assert record.account_number is None
+    record = parse_record(IdentityRecord, json.dumps({"aadhar_number": "2345 6789 0125"}))
+    assert record.aadhar_number is None
+
+
+def test_parse_record_builds_members():
+    record = parse_record(RationCardRecord, json.dumps({"members": [{"name": "A", "age": 34}]}))
+    assert record.members == [RationCardMember(name="A", age="34")]
+
+
+def test_parse_record_rejects_the_wrong_shape():
+    with pytest.raises(RecordValidationError):
+        parse_record(ChequeRecord, "Bank Name: State Bank of India")
+    with pytest.raises(RecordValidationError):
+        parse_record(ChequeRecord, "[]")
+    with pytest.raises(RecordValidationError):
+        parse_record(RationCardRecord, json.dumps({"members": "none"}))
+    with pytest.raises(RecordValidationError):
+        parse_record(ChequeRecord, json.dumps({"bank_name": {"name": "SBI"}}))
+
+
+def test_rule_fields_override_the_llm():
+    llm_record = ChequeRecord(bank_name="SBI", ifsc_code="SBIN0009999", account_number="11111111111")
+    record = cheque_record({"IFSC Code": "SBIN0001234", "Account Number": "12345678901"}, llm_record)
+    assert record.bank_name == "SBI"
+    assert record.ifsc_code == "SBIN0001234"
+    assert record.account_number == "12345678901"
+
+
+def test_record_to_dict():
+    assert json.loads(json.dumps(ChequeRecord(bank_name="SBI"), default=record_to_dict))["bank_name"] == "SBI"
+    with pytest.raises(TypeError):
+        record_to_dict(object())
@@ -0,0 +1,56 @@
+import time
+
+from extraction.result_cache import ResultCache, cache_key
+
+
+def make_cache(tmp_path, **kwargs):
+    return ResultCache(str(tmp_path / "results.sqlite3"), **kwargs)
+
+
+def test_cache_key_is_content_addressed():
+    assert cache_key("abc", "prebuilt-read") == cache_key("abc", "prebuilt-read", "")
+    assert cache_key("abc", "prebuilt-read") != cache_key("abc", "prebuilt-document")
+    assert cache_key("abc", "gpt-4o", "prompt") != cache_key("abc", "gpt-4o", "other prompt")
+
+
+def test_hit_and_miss_counters(tmp_path):
+    cache = make_cache(tmp_path)
+    assert cache.get("missing") is None
+    cache.set("key", {"content": "IFSC SBIN0001234"})
+    assert cache.get("key") == {"content": "IFSC SBIN0001234"}
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_expired_entries_are_misses(tmp_path, monkeypatch):
+    cache = make_cache(tmp_path, ttl=60)
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now)
+    cache.set("key", "value")
+    monkeypatch.setattr(time, "time", lambda: now + 61)
+    assert cache.get("key") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, monkeypatch):
+    # Each value is 12 bytes of JSON, so three fit and a fourth evicts one
+    cache = make_cache(tmp_path, max_bytes=36)
+    clock = iter(range(1000, 2000))
+    monkeypatch.setattr(time, "time", lambda: next(clock))
+    for key in ("a", "b", "c"):
+        cache.set(key, "x" * 10)
+    cache.get("a")
+    cache.set("d", "x" * 10)
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["bytes"] == 36
+
+
+def test_running_total_follows_replacements_and_reopen(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.set("key", "x" * 10)
+    cache.set("key", "x")
+    assert cache.stats()["bytes"] == len('"x"')
+    cache.close()
+    assert make_cache(tmp_path).stats()["bytes"] == len('"x"')
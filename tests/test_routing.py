@@ -0,0 +1,59 @@
+import asyncio
+
+from extraction.records import ChequeRecord, IdentityRecord, RecordValidationError
+from extraction.routing import aroute, cheque_accepted, identity_accepted, parse_ladder, route
+
+COMPLETE_CHEQUE = ChequeRecord(bank_name="SBI", ifsc_code="SBIN0001234", account_number="12345678901")
+
+
+def test_parse_ladder():
+    ladder = parse_ladder("gpt-4o-mini, gpt-4o,vision:gpt-4o,")
+    assert [repr(rung) for rung in ladder] == ["gpt-4o-mini", "gpt-4o", "vision:gpt-4o"]
+    assert [rung.vision for rung in ladder] == [False, False, True]
+    assert ladder[2].model == "gpt-4o"
+
+
+def test_acceptance_rules():
+    assert cheque_accepted(COMPLETE_CHEQUE)
+    assert not cheque_accepted(ChequeRecord(bank_name="SBI", ifsc_code="SBIN0001234"))
+    assert identity_accepted(IdentityRecord(name="Test Person", pan_number="ABCPE1234F"))
+    assert not identity_accepted(IdentityRecord(name="Test Person"))
+
+
+def test_route_stops_at_the_first_accepted_answer():
+    calls = []
+
+    def attempt(rung):
+        calls.append(rung.model)
+        return COMPLETE_CHEQUE
+
+    assert route("cheque", parse_ladder("gpt-4o-mini,gpt-4o"), attempt, cheque_accepted) is COMPLETE_CHEQUE
+    assert calls == ["gpt-4o-mini"]
+
+
+def test_route_escalates_on_a_rejected_or_invalid_answer():
+    answers = iter([ChequeRecord(bank_name="SBI"), RecordValidationError("not JSON"), COMPLETE_CHEQUE])
+
+    def attempt(rung):
+        answer = next(answers)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+    ladder = parse_ladder("gpt-4o-mini,gpt-4o,vision:gpt-4o")
+    assert route("cheque", ladder, attempt, cheque_accepted) is COMPLETE_CHEQUE
+
+
+def test_route_keeps_the_last_answer_when_exhausted():
+    partial = ChequeRecord(bank_name="SBI")
+    answers = iter([partial, None])
+    assert route("cheque", parse_ladder("gpt-4o-mini,gpt-4o"), lambda rung: next(answers),
+                 cheque_accepted) is partial
+
+
+def test_aroute_matches_route():
+    async def attempt(rung):
+        return COMPLETE_CHEQUE if rung.model == "gpt-4o" else ChequeRecord()
+
+    ladder = parse_ladder("gpt-4o-mini,gpt-4o,vision:gpt-4o")
+    assert asyncio.run(aroute("cheque", ladder, attempt, cheque_accepted)) is COMPLETE_CHEQUE
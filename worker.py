@@ -0,0 +1,21 @@
+import os
+import signal
+import threading
+
+# Importing app1 starts JOB_WORKERS threads on the shared job queue. Web processes start none
+# unless JOB_WORKERS is set; scale these on the /jobs/stats queue depth
+os.environ.setdefault("JOB_WORKERS", "4")
+
+from app1 import job_workers
+
+stopping = threading.Event()
+signal.signal(signal.SIGTERM, lambda *_: stopping.set())
+
+if __name__ == "__main__":
+    print(f"Working the job queue with {job_workers.workers} threads")
+    try:
+        stopping.wait()
+    except KeyboardInterrupt:
+        pass
+    # Let jobs in progress finish; anything cut off is retried when its lease expires
+    job_workers.stop()
@@ -0,0 +1,56 @@
+import os
+
+# Job threads are started per worker in after_fork(), never in the preloading master
+os.environ.setdefault("DEFER_JOB_WORKERS", "1")
+
+import app1
+from extraction import get_result_cache
+from extraction.clients import get_document_analysis_client, get_http_session, reset_connections
+from extraction.ifsc_index import get_ifsc_index
+from extraction.metrics import clear_metrics_dir, flush_metrics, retire_metrics, start_metrics_flusher
+from extraction.rate_limits import get_rate_limiter
+
+# gunicorn entry point: gunicorn -c gunicorn.conf.py
+application = app1.app
+
+
+def warm():
+    # Loaded once in the master and shared copy-on-write by every worker
+    get_http_session()
+    get_document_analysis_client()
+    get_ifsc_index()
+    get_result_cache()
+
+
+def before_fork():
+    # Nothing that holds a socket or a SQLite handle may be inherited by the workers
+    app1.job_queue.close()
+    get_result_cache().close()
+    if get_rate_limiter() is not None:
+        get_rate_limiter().close()
+    # Counters start again from zero with each master; snapshots of a previous one must not add up
+    clear_metrics_dir()
+
+
+def after_fork():
+    reset_connections()
+    app1.job_queue.reopen()
+    get_result_cache().reopen()
+    if get_rate_limiter() is not None:
+        get_rate_limiter().reopen()
+    app1.job_workers.start()
+    start_metrics_flusher()
+
+
+def shutdown(timeout):
+    # Jobs cut off here are retried once their lease expires
+    app1.job_workers.stop(timeout)
+    flush_metrics()
+
+
+def worker_exited(pid):
+    # Runs in the master, so only one process at a time folds snapshots into the retired totals
+    retire_metrics(pid)
+
+
+warm()